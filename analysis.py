@@ -3,123 +3,161 @@ import pandas as pd
 import numpy as np
 from datetime import timedelta
 
-def calculate_retention_matrix(order_level_df: pd.DataFrame) -> pd.DataFrame:
-    df = order_level_df.copy()
+from dimensions import iso3_codes
+from rankings import top_indices
+
+# pandas Period frequency of each cohort granularity
+GRANULARITIES = {"day": "D", "week": "W", "month": "M", "quarter": "Q"}
+
+
+def period_codes(timestamps: pd.Series, granularity: str = "month") -> np.ndarray:
+    """
+    Integer bucket of each timestamp: the ordinal of its pandas Period at the
+    granularity, so consecutive periods differ by 1. timestamps must not hold NaT.
+    """
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    values = timestamps.to_numpy(dtype="datetime64[ns]")
+    if granularity == "day":
+        return values.astype("datetime64[D]").astype(np.int64)
+    if granularity == "week":
+        # Weeks run Monday to Sunday (W-SUN); day -10 (1969-12-22) starts week 0
+        return (values.astype("datetime64[D]").astype(np.int64) + 10) // 7
+    if granularity in ("month", "quarter"):
+        months = values.astype("datetime64[M]").astype(np.int64)
+        return months if granularity == "month" else months // 3
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def _periods(codes, granularity: str, name: str) -> pd.PeriodIndex:
+    return pd.PeriodIndex.from_ordinals(codes, freq=GRANULARITIES[granularity]).rename(name)
+
+
+def _cohort_codes(df: pd.DataFrame, granularity: str) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    # Rows with a customer and a date, each with its period and its customer's first period
+    df = df[df['customer_id'].notna() & df['processed_at'].notna()]
+    order_codes = period_codes(df['processed_at'], granularity)
+    cohort_codes = pd.Series(order_codes, index=df.index).groupby(df['customer_id']).transform('min').to_numpy()
+    return df, cohort_codes, order_codes
+
+
+def calculate_retention_matrix(order_level_df: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
+    df = order_level_df[['customer_id', 'processed_at']].copy()
     df['processed_at'] = pd.to_datetime(df['processed_at'], errors='coerce')
-    df['cohort_month'] = df.groupby('customer_id')['processed_at'].transform('min').dt.to_period('M')
-    df['order_month'] = df['processed_at'].dt.to_period('M')
+    df, cohort_codes, order_codes = _cohort_codes(df, granularity)
 
-    cohort_pivot = (
-        df.groupby(['cohort_month', 'order_month'])['customer_id']
-        .nunique()
-        .unstack(fill_value=0)
-    )
+    # Distinct customers per (cohort, period): drop repeat orders in a period, then count rows
+    active = pd.DataFrame({'customer_id': df['customer_id'].to_numpy(), 'cohort': cohort_codes, 'period': order_codes})
+    counts = active.drop_duplicates().groupby(['cohort', 'period']).size()
+    cohort_pivot = counts.unstack(fill_value=0)
 
-    cohort_sizes = pd.Series({
-        cohort: cohort_pivot.loc[cohort, cohort]
-        for cohort in cohort_pivot.index
-    })
+    # Customers are counted in their first period, so the cohort size sits where period == cohort
+    diagonal = counts[counts.index.get_level_values('cohort') == counts.index.get_level_values('period')]
+    cohort_sizes = diagonal.droplevel('period').reindex(cohort_pivot.index)
 
     retention_matrix = cohort_pivot.divide(cohort_sizes, axis=0).round(3)
+    retention_matrix.index = _periods(retention_matrix.index, granularity, 'cohort_month')
+    retention_matrix.columns = _periods(retention_matrix.columns, granularity, 'order_month')
     retention_matrix.replace([np.inf, -np.inf], np.nan, inplace=True)
     retention_matrix.dropna(how="all", inplace=True)
 
     return retention_matrix
 
-def calculate_retention_matrix(order_level_df: pd.DataFrame) -> pd.DataFrame:
-    df = order_level_df.copy()
-    df['processed_at'] = pd.to_datetime(df['processed_at'], errors='coerce')
-    df['cohort_month'] = df.groupby('customer_id')['processed_at'].transform('min').dt.to_period('M')
-    df['order_month'] = df['processed_at'].dt.to_period('M')
 
-    cohort_pivot = (
-        df.groupby(['cohort_month', 'order_month'])['customer_id']
-        .nunique()
-        .unstack(fill_value=0)
-    )
-
-    cohort_sizes = pd.Series({
-        cohort: cohort_pivot.loc[cohort, cohort]
-        for cohort in cohort_pivot.index
-    })
-
-    retention_matrix = cohort_pivot.divide(cohort_sizes, axis=0).round(3)
-    retention_matrix.replace([np.inf, -np.inf], np.nan, inplace=True)
-    retention_matrix.dropna(how="all", inplace=True)
-
-    return retention_matrix
+def retention_offsets(retention_matrix: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The retention matrix indexed by offset instead of calendar period: (rates, columns), both
+    cohort x periods since the cohort's first period (at least two offsets). columns holds each
+    cell's column position in retention_matrix, -1 where the matrix has no such period; rates is
+    NaN there. Month-N retention is rates[:, N].
+    """
+    offsets = retention_matrix.columns.asi8[None, :] - retention_matrix.index.asi8[:, None]
+    n_offsets = max(int(offsets.max()) + 1 if offsets.size else 0, 2)
+    columns = np.full((len(retention_matrix), n_offsets), -1, dtype=np.int64)
+    cohort_pos, column_pos = np.nonzero(offsets >= 0)
+    columns[cohort_pos, offsets[cohort_pos, column_pos]] = column_pos
+    values = retention_matrix.to_numpy(dtype=float)
+    rates = np.where(columns >= 0, values[np.arange(len(values))[:, None], np.maximum(columns, 0)], np.nan)
+    return rates, columns
 
 
 def calculate_month1_retention(retention_matrix: pd.DataFrame) -> pd.DataFrame:
-    month_1_retention_clean = []
-
-    for cohort in retention_matrix.index:
-        cohort_period = pd.Period(cohort, freq='M')
-        month_1 = str(cohort_period + 1)
-
-        if month_1 in retention_matrix.columns:
-            rate = retention_matrix.loc[cohort, month_1]
-        else:
-            rate = None
-
-        month_1_retention_clean.append({
-            'cohort_month': str(cohort),
-            'month_1_retention': None if pd.isna(rate) else round(rate * 100, 1)
-        })
-
-    month_1_retention_df = pd.DataFrame(month_1_retention_clean)
+    # Retention one period after each cohort's first period, at the matrix's granularity
+    rates, _ = retention_offsets(retention_matrix)
+    month_1_retention_df = pd.DataFrame({
+        'cohort_month': retention_matrix.index.astype(str),
+        'month_1_retention': np.round(rates[:, 1] * 100, 1),
+    })
     return month_1_retention_df.sort_values('cohort_month')
 
-def prepare_retention_curves(retention_matrix: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, str, str]:
-    retention_long = retention_matrix.reset_index().melt(
-        id_vars='cohort_month',
-        var_name='order_month',
-        value_name='retention'
-    )
-
-    retention_long['cohort_month_ts'] = pd.PeriodIndex(retention_long['cohort_month'], freq='M').to_timestamp()
-    retention_long['order_month_ts'] = pd.PeriodIndex(retention_long['order_month'], freq='M').to_timestamp()
-
-
-    retention_long['month_offset'] = (
-        (retention_long['order_month_ts'].dt.year - retention_long['cohort_month_ts'].dt.year) * 12 +
-        (retention_long['order_month_ts'].dt.month - retention_long['cohort_month_ts'].dt.month)
-    )
-
-    retention_long = retention_long[retention_long['month_offset'] >= 0].copy()
+def _retention_rows(retention_matrix: pd.DataFrame, cohort_pos: np.ndarray, column_pos: np.ndarray) -> pd.DataFrame:
+    # Cells of the matrix in long format, labelled by their position in the column-by-column melt
+    cohorts, periods = retention_matrix.index, retention_matrix.columns
+    return pd.DataFrame({
+        'cohort_month': cohorts.take(cohort_pos),
+        'order_month': periods.take(column_pos),
+        'retention': retention_matrix.to_numpy()[cohort_pos, column_pos],
+        'cohort_month_ts': cohorts.to_timestamp().take(cohort_pos),
+        'order_month_ts': periods.to_timestamp().take(column_pos),
+        'month_offset': periods.asi8[column_pos] - cohorts.asi8[cohort_pos],
+    }, index=column_pos * len(cohorts) + cohort_pos)
 
-    avg_retention = (
-        retention_long.groupby('month_offset')['retention']
-        .mean()
-        .reset_index()
-    )
+def prepare_retention_curves(retention_matrix: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, str, str]:
+    # Everything is read off the cohort x offset array; month_offset counts periods of the matrix's granularity
+    rates, columns = retention_offsets(retention_matrix)
+    present = columns >= 0
+
+    # Long format in melt order (column by column), cells before their cohort's first period left out
+    cohort_pos, offset = np.nonzero(present)
+    column_pos = columns[cohort_pos, offset]
+    order = np.argsort(column_pos * len(retention_matrix) + cohort_pos)
+    retention_long = _retention_rows(retention_matrix, cohort_pos[order], column_pos[order])
+
+    # Mean over the cohorts that reached each offset (NaN cells skipped)
+    avg_retention = pd.Series(rates[cohort_pos, offset], name='retention').groupby(offset).mean()
+    avg_retention = avg_retention.rename_axis('month_offset').reset_index()
     avg_retention['retention'] = (avg_retention['retention'] * 100).round(2)
 
-    month1_ret = retention_long[retention_long['month_offset'] == 1].copy()
-    best_row = month1_ret.loc[month1_ret['retention'].idxmax()]
-    worst_row = month1_ret.loc[month1_ret['retention'].idxmin()]
-    best_cohort = best_row['cohort_month']
-    worst_cohort = worst_row['cohort_month']
-
-    best_curve = retention_long[retention_long['cohort_month'] == best_cohort].copy()
-    worst_curve = retention_long[retention_long['cohort_month'] == worst_cohort].copy()
+    # First cohort with the highest / lowest month-1 retention; the first cohort when none has a month 1
+    # (a single customer's orders, say)
+    month1 = rates[:, 1]
+    best, worst = (np.nanargmax(month1), np.nanargmin(month1)) if not np.isnan(month1).all() else (0, 0)
+    best_cohort = retention_matrix.index[best]
+    worst_cohort = retention_matrix.index[worst]
 
+    best_curve = _retention_rows(retention_matrix, np.full(present[best].sum(), best), columns[best][present[best]])
+    worst_curve = _retention_rows(retention_matrix, np.full(present[worst].sum(), worst), columns[worst][present[worst]])
     best_curve['retention'] = (best_curve['retention'] * 100).round(2)
     worst_curve['retention'] = (worst_curve['retention'] * 100).round(2)
 
     return avg_retention, best_curve, worst_curve, best_cohort, worst_cohort, retention_long
 
-def calculate_cohort_sizes(order_level_df: pd.DataFrame) -> pd.DataFrame:
+def cohort_labels(order_level_df: pd.DataFrame, granularity: str = "month") -> pd.Series:
+    """Each order's customer cohort as a string label at the granularity."""
+    if granularity == "month":
+        return order_level_df['cohort_month'].astype(str)
+    # first_order_at comes from add_customer_columns; older frames fall back to the first order in the frame
+    if 'first_order_at' in order_level_df.columns:
+        first_order = order_level_df['first_order_at']
+    else:
+        first_order = order_level_df.groupby('customer_id')['processed_at'].transform('min')
+    labels = pd.Series('NaT', index=order_level_df.index)
+    known = first_order.notna()
+    labels[known] = _periods(period_codes(first_order[known], granularity), granularity, None).astype(str)
+    return labels
+
+
+def calculate_cohort_sizes(order_level_df: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
     df = order_level_df.copy()
-    df['cohort_month'] = df['cohort_month'].astype(str)
+    df['cohort_month'] = cohort_labels(df, granularity)
     cohort_sizes = df.groupby('cohort_month')['customer_id'].nunique().reset_index()
     cohort_sizes.columns = ['cohort_month', 'n_customers']
     return cohort_sizes
 
 
-def calculate_avg_revenue_by_cohort(order_level_df: pd.DataFrame) -> pd.DataFrame:
+def calculate_avg_revenue_by_cohort(order_level_df: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
     df = order_level_df.copy()
-    df['cohort_month'] = df['cohort_month'].astype(str)
+    df['cohort_month'] = cohort_labels(df, granularity)
     revenue_by_cohort = df.groupby('cohort_month')['net_revenue'].mean().reset_index()
     revenue_by_cohort.columns = ['cohort_month', 'avg_revenue']
     return revenue_by_cohort
@@ -139,14 +177,35 @@ def calculate_days_to_second_order(order_level_df: pd.DataFrame) -> pd.DataFrame
 
     return second_orders[['customer_id', 'days_to_second_order']]
 
+def _key_totals(keys: pd.Series, values: pd.Series | None = None) -> pd.DataFrame:
+    """
+    Row count, non-null value count and value sum per category of a
+    Categorical column that occurs, as bincounts over its integer codes.
+    Indexed by category name in sorted order, like a groupby.
+    """
+    if not isinstance(keys.dtype, pd.CategoricalDtype):
+        keys = keys.astype("category")
+    codes = keys.cat.codes.to_numpy()
+    known = codes >= 0
+    codes = codes[known]
+    n_keys = len(keys.cat.categories)
+
+    rows = np.bincount(codes, minlength=n_keys)
+    present = rows > 0
+    totals = pd.DataFrame({"rows": rows[present]}, index=keys.cat.categories[present].astype(str))
+    if values is not None:
+        values = values.to_numpy(np.float64, na_value=np.nan)[known]
+        valid = ~np.isnan(values)
+        totals["count"] = np.bincount(codes[valid], minlength=n_keys)[present]
+        totals["sum"] = np.bincount(codes[valid], weights=values[valid], minlength=n_keys)[present]
+    return totals
+
+
 def get_top_products_by_revenue(product_level_df: pd.DataFrame, top_n: int = 10) -> pd.DataFrame:
-    top_products = (
-        product_level_df.groupby("product_title")["net_price"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(top_n)
-        .reset_index()
-    )
+    # Totals per integer product key; only the top_n are selected (argpartition) and decoded
+    totals = _key_totals(product_level_df["product_title"], product_level_df["net_price"])
+    top = top_indices(totals["sum"].to_numpy(), top_n)
+    top_products = pd.DataFrame({"product_title": totals.index[top], "net_price": totals["sum"].to_numpy()[top]})
     return top_products
 
 def get_category_revenue_trend(product_level_df):
@@ -159,35 +218,29 @@ def get_category_revenue_trend(product_level_df):
         .sum()
         .reset_index()
     )
+    # Decode the (categorical) category keys back to names
+    category_trend["product_category"] = category_trend["product_category"].astype(str)
     return category_trend
 
 def get_avg_price_per_category(product_level_df):
-    avg_price_per_category = (
-        product_level_df.groupby("product_category")["product_price"]
-        .mean()
-        .sort_values(ascending=False)
-        .reset_index()
-    )
+    totals = _key_totals(product_level_df["product_category"], product_level_df["product_price"])
+    avg_price = (totals["sum"] / totals["count"]).to_numpy()
+    # Every category is returned, so this is a full (stable) ranking of the per-category means only
+    order = top_indices(avg_price, len(avg_price))
+    avg_price_per_category = pd.DataFrame({"product_category": totals.index[order], "product_price": avg_price[order]})
     return avg_price_per_category
 
 def get_top_categories_by_units_sold(product_level_df, top_n=10):
-    units_per_category = (
-        product_level_df.groupby("product_category")
-        .size()
-        .sort_values(ascending=False)
-        .head(top_n)
-        .reset_index(name="units_sold")
-    )
+    units = _key_totals(product_level_df["product_category"])["rows"]
+    top = top_indices(units.to_numpy(), top_n)
+    units_per_category = pd.DataFrame({"product_category": units.index[top], "units_sold": units.to_numpy()[top]})
     return units_per_category
 
 
 def get_geo_revenue(product_level_df: pd.DataFrame) -> pd.DataFrame:
-    return (
-        product_level_df.groupby("billing_address_country")["net_price"]
-        .sum()
-        .reset_index()
-        .rename(columns={"billing_address_country": "country", "net_price": "revenue"})
-    )
+    # Revenue per integer country key, ordered by country
+    totals = _key_totals(product_level_df["billing_address_country"], product_level_df["net_price"])
+    return pd.DataFrame({"country": totals.index, "iso3": iso3_codes(totals.index), "revenue": totals["sum"].to_numpy()})
 
 def get_new_vs_returning_user_counts(order_level_df: pd.DataFrame) -> pd.DataFrame:
     df = order_level_df.copy()
@@ -313,6 +366,7 @@ def calculate_monthly_category_trends(product_level_df: pd.DataFrame) -> pd.Data
         .sum()
         .reset_index()
     )
+    monthly_category_trends['product_category'] = monthly_category_trends['product_category'].astype(str)
 
     return monthly_category_trends
 
@@ -337,22 +391,37 @@ def perform_rfm_segmentation(order_level_df: pd.DataFrame) -> pd.DataFrame:
         .reset_index()
     )
 
-    rfm['R_Score'] = pd.qcut(rfm['Recency'], 4, labels=[4, 3, 2, 1]).astype(int)
-    rfm['F_Score'] = pd.qcut(rfm['Frequency'].rank(method='first'), 4, labels=[1, 2, 3, 4]).astype(int)
-    rfm['M_Score'] = pd.qcut(rfm['Monetary'], 4, labels=[1, 2, 3, 4]).astype(int)
-    rfm['RFM_Score'] = rfm[['R_Score', 'F_Score', 'M_Score']].sum(axis=1)
+    return score_rfm(rfm)
+
+
+def _rfm_segment(score: int) -> str:
+    if score >= 9:
+        return 'Champions'
+    elif score >= 6:
+        return 'Potential Loyalists'
+    elif score >= 3:
+        return 'At Risk'
+    else:
+        return 'Hibernating'
 
-    def segment_customer(score):
-        if score >= 9:
-            return 'Champions'
-        elif score >= 6:
-            return 'Potential Loyalists'
-        elif score >= 3:
-            return 'At Risk'
-        else:
-            return 'Hibernating'
-
-    rfm['Segment'] = rfm['RFM_Score'].apply(segment_customer)
+
+def _quartile_scores(values: pd.Series, scores: list[int]) -> pd.Series:
+    # Quartile bins; tied values or selections too small for four distinct edges keep the bins that remain
+    # (scored from the start of scores), and a single distinct value (one customer, say) is all in the first
+    if values.nunique() < 2:
+        bins = pd.Series(0, index=values.index)
+    else:
+        bins = pd.qcut(values, 4, labels=False, duplicates='drop').astype(int)
+    return pd.Series(np.asarray(scores)[bins.to_numpy()], index=values.index)
+
+
+def score_rfm(rfm: pd.DataFrame) -> pd.DataFrame:
+    """Quartile R/F/M scores, RFM_Score and Segment for a customer_id-sorted Recency/Frequency/Monetary frame."""
+    rfm['R_Score'] = _quartile_scores(rfm['Recency'], [4, 3, 2, 1])
+    rfm['F_Score'] = _quartile_scores(rfm['Frequency'].rank(method='first'), [1, 2, 3, 4])
+    rfm['M_Score'] = _quartile_scores(rfm['Monetary'], [1, 2, 3, 4])
+    rfm['RFM_Score'] = rfm[['R_Score', 'F_Score', 'M_Score']].sum(axis=1)
+    rfm['Segment'] = rfm['RFM_Score'].apply(_rfm_segment)
     return rfm
 
 
@@ -361,24 +430,17 @@ def get_rfm_segment_counts(rfm_df: pd.DataFrame) -> pd.DataFrame:
     segment_counts.columns = ["Segment", "Customer Count"]
     return segment_counts
 
-def get_retention_by_discount_level(order_df: pd.DataFrame) -> pd.DataFrame:
-    import numpy as np
+def get_retention_by_discount_level(order_df: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
     df = order_df.copy()
+    df['processed_at'] = pd.to_datetime(df['processed_at'], errors='coerce')
 
-    # Parse dates and remove timezone
-    df['processed_at'] = pd.to_datetime(df['processed_at'], errors='coerce').dt.tz_localize(None)
-    
-    # Add cohort and order month
-    df['first_order_month'] = df.groupby('customer_id')['processed_at'].transform('min').dt.tz_localize(None)
-    df['cohort_month'] = df['first_order_month'].dt.to_period('M').astype(str)
-    df['order_month'] = df['processed_at'].dt.to_period('M').astype(str)
-
-    # Period number (0 = first month)
-    df['period_number'] = ((df['processed_at'] - df['first_order_month']).dt.days // 30)
-    df = df[df['period_number'] >= 0]  # remove any bad data
+    # Cohort and period as integer period codes; period_number counts calendar periods (0 = first period)
+    df, cohort_codes, order_codes = _cohort_codes(df, granularity)
+    df['cohort_month'] = cohort_codes
+    df['period_number'] = order_codes - cohort_codes
 
     # Tag discount level
-    df['discount_level'] = df['discount_rate'].apply(lambda x: 'High Discount' if x > 0.05 else 'Low Discount')
+    df['discount_level'] = np.where(df['discount_rate'] > 0.05, 'High Discount', 'Low Discount')
 
     # Initial cohort size
     cohort_sizes = df[df['period_number'] == 0].groupby(
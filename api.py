@@ -0,0 +1,381 @@
+# api.py
+"""
+Read-only HTTP API over the dashboard metrics, on the standard library's
+asyncio (no web framework needed).
+
+    python api.py --port 8502
+
+    GET /metrics                 metric names, filters and formats
+    GET /metrics/<name>?countries=Germany&countries=France&start=2020-01-01&end=2020-06-30
+    GET /health                  dataset rows, result-cache and body-cache statistics
+    GET /export/<products|orders>?format=parquet&columns=order_number&columns=net_revenue&countries=Germany
+
+Filters are the sidebar's (the filters.apply_filters keywords products,
+categories, types, countries, statuses, orders and customers, repeated for
+several values), start and end for the date range, and granularity for the
+cohort metrics. Results are JSON records, or an Arrow IPC stream with
+format=arrow or "Accept: application/vnd.apache.arrow.stream".
+retention_curves holds several frames: pick one with part=avg|best|worst|long.
+/export streams the filtered rows of a cleaned frame as CSV (default) or
+Parquet with chunked transfer encoding, one chunk of rows at a time
+(export.iter_export), optionally only the given columns.
+
+The event loop only parses requests and writes responses. Metrics are
+computed and encoded on a thread pool, identical concurrent requests share
+one computation; metric results go through a ResultCache and encoded bodies
+through a byte-bounded BodyCache of their own.
+With FITLYTICS_API_PORT set, app.py serves the API from the dashboard
+process, on the same datasets and result cache as the dashboard sessions,
+and switches it to each new dataset version (MetricsAPI.use_dataset).
+"""
+import argparse
+import asyncio
+import json
+import threading
+import traceback
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import NamedTuple
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+from analysis import GRANULARITIES
+from cache import BodyCache, ResultCache, selection_key
+from config import API_WORKERS
+from export import EXPORT_FORMATS, iter_export
+from filters import apply_filters, filter_rows
+from lazycolumns import LazyColumns
+from scheduler import METRICS
+from store import load_datasets
+
+LIST_FILTERS = ("products", "categories", "types", "countries", "statuses", "orders", "customers")
+# Id filters and the order-frame columns they match: values are parsed as the column's dtype
+ID_FILTERS = {"orders": "order_number", "customers": "customer_id"}
+# Frames of the prepare_retention_curves tuple, by position
+CURVE_PARTS = {"avg": 0, "best": 1, "worst": 2, "long": 5}
+EXPORT_FRAMES = ("products", "orders")
+FORMATS = {"json": "application/json", "arrow": "application/vnd.apache.arrow.stream"}
+
+
+class RequestError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_ids(name: str, values: list[str], dtype) -> list:
+    # Integer ids unless the frame says otherwise; string ids are matched as given
+    if dtype is not None and not pd.api.types.is_numeric_dtype(dtype):
+        return values
+    try:
+        if dtype is not None and pd.api.types.is_float_dtype(dtype):
+            return [float(v) for v in values]
+        return [int(v) for v in values]
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"{name} must be numbers") from None
+
+
+def parse_selection(query: dict, id_dtypes: dict | None = None) -> tuple[dict, str]:
+    """
+    (apply_filters keywords, granularity) from parsed query parameters.
+    id_dtypes maps the id filters (orders, customers) to their column's
+    dtype; ids are parsed as integers when it is not given.
+    """
+    filters = {}
+    for name in LIST_FILTERS:
+        values = query.get(name)
+        if values:
+            filters[name] = _parse_ids(name, values, (id_dtypes or {}).get(name)) if name in ID_FILTERS else values
+    start, end = query.get("start", [None])[0], query.get("end", [None])[0]
+    if bool(start) != bool(end):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "start and end must be given together")
+    if start:
+        try:
+            filters["date_range"] = (pd.Timestamp(start).date(), pd.Timestamp(end).date())
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "start and end must be dates (YYYY-MM-DD)") from None
+
+    granularity = query.get("granularity", ["month"])[0]
+    if granularity not in GRANULARITIES:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"granularity must be one of {', '.join(GRANULARITIES)}")
+    return filters, granularity
+
+
+def to_frame(result, part: str | None = None) -> pd.DataFrame:
+    """A metric result as a flat frame with string column names and no Period values."""
+    if isinstance(result, tuple):
+        if part not in CURVE_PARTS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"part must be one of {', '.join(CURVE_PARTS)}")
+        result = result[CURVE_PARTS[part]]
+    if isinstance(result, pd.Series):
+        result = result.to_frame()
+    df = result.reset_index(drop=not any(result.index.names))
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.PeriodDtype) or (
+                df[col].dtype == object and df[col].map(lambda v: isinstance(v, pd.Period)).any()):
+            df[col] = df[col].astype(str)
+    return df
+
+
+def encode(df: pd.DataFrame, fmt: str) -> bytes:
+    if fmt == "arrow":
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return df.to_json(orient="records", date_format="iso").encode()
+
+
+def _json_response(status: HTTPStatus, payload) -> tuple[HTTPStatus, str, bytes]:
+    return status, FORMATS["json"], json.dumps(payload, default=str).encode()
+
+
+class _Served(NamedTuple):
+    """One version of the dataset the API serves, with its caches: requests read one snapshot throughout."""
+    product_level_df: pd.DataFrame
+    order_level_df: pd.DataFrame
+    cache: ResultCache
+    bodies: BodyCache
+    # Cold order columns an export may ask for, read on first use
+    cold: LazyColumns | None
+    id_dtypes: dict
+    # Body computations in flight, by body key
+    pending: dict
+
+
+class MetricsAPI:
+    """
+    Serves metric results for filter selections over HTTP/1.1 from one pair
+    of cleaned frames; use_dataset switches it to a newer pair.
+    """
+
+    def __init__(
+        self,
+        product_level_df: pd.DataFrame,
+        order_level_df: pd.DataFrame,
+        cache: ResultCache | None = None,
+        workers: int = API_WORKERS,
+        cold: LazyColumns | None = None,
+    ):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metrics-api")
+        self.use_dataset(product_level_df, order_level_df, cache, cold)
+
+    def use_dataset(
+        self,
+        product_level_df: pd.DataFrame,
+        order_level_df: pd.DataFrame,
+        cache: ResultCache | None = None,
+        cold: LazyColumns | None = None,
+    ) -> None:
+        """Serve these frames (and cache) from the next request on; requests in progress finish on the old ones."""
+        self.served = _Served(
+            product_level_df, order_level_df, cache if cache is not None else ResultCache(), BodyCache(), cold,
+            {name: order_level_df[column].dtype for name, column in ID_FILTERS.items()}, {},
+        )
+
+    def _body(self, served: _Served, body_key: tuple, name: str, filters: dict, granularity: str, part,
+              fmt: str) -> bytes:
+        # Runs on the pool: filter, compute (reusing cached metrics) and encode
+        key = body_key[0]
+        result = served.cache.get((key, name))
+        if result is None:
+            product_df, order_df = apply_filters(served.product_level_df, served.order_level_df, **filters)
+            result = served.cache.run_metrics(key, [name], order_df, product_df,
+                                              executor="serial", granularity=granularity)[name]
+        body = encode(to_frame(result, part), fmt)
+        served.bodies.put(body_key, body)
+        return body
+
+    async def metric_body(self, served: _Served, name: str, filters: dict, granularity: str, part,
+                          fmt: str) -> bytes:
+        body_key = (selection_key(granularity=granularity, **filters), name, part, fmt)
+        body = served.bodies.get(body_key)
+        if body is not None:
+            return body
+        # Concurrent requests for the same body wait on one computation
+        if body_key not in served.pending:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.pool, self._body, served, body_key, name, filters, granularity, part, fmt)
+            served.pending[body_key] = future
+            future.add_done_callback(lambda _: served.pending.pop(body_key, None))
+        # Shielded: a client that disconnects does not cancel the work others are waiting for
+        return await asyncio.shield(served.pending[body_key])
+
+    async def export_body(self, served: _Served, frame: str, filters: dict, fmt: str,
+                          columns) -> AsyncIterator[bytes]:
+        # Filter and encode on the pool, one chunk per step, so only one encoded chunk is in memory at a time
+        loop = asyncio.get_running_loop()
+        product_rows, order_rows = await loop.run_in_executor(
+            self.pool, partial(filter_rows, served.product_level_df, served.order_level_df, **filters))
+        df, rows = ((served.product_level_df, product_rows) if frame == "products"
+                    else (served.order_level_df, order_rows))
+        if served.cold is not None and columns:
+            df = await loop.run_in_executor(
+                self.pool, served.cold.attach, df, [c for c in columns if c in served.cold.names])
+        pieces = iter_export(df, rows, fmt, columns)
+        while (piece := await loop.run_in_executor(self.pool, next, pieces, None)) is not None:
+            yield piece
+
+    def _export(self, served: _Served, frame: str, query: dict):
+        if frame not in EXPORT_FRAMES:
+            raise RequestError(HTTPStatus.NOT_FOUND, f"export one of {', '.join(EXPORT_FRAMES)}")
+        fmt = query.get("format", ["csv"])[0]
+        if fmt not in EXPORT_FORMATS:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        df = served.product_level_df if frame == "products" else served.order_level_df
+        columns = [c for value in query.get("columns", []) for c in value.split(",") if c]
+        known = [*df.columns, *(served.cold.names if served.cold is not None else [])]
+        unknown = [c for c in columns if c not in known]
+        if unknown:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"unknown columns: {', '.join(unknown)}")
+        filters, _ = parse_selection(query, served.id_dtypes)
+        return HTTPStatus.OK, EXPORT_FORMATS[fmt], self.export_body(served, frame, filters, fmt, columns or None)
+
+    async def dispatch(self, method: str, target: str, headers: dict) -> tuple[HTTPStatus, str, bytes | AsyncIterator]:
+        if method not in ("GET", "HEAD"):
+            return _json_response(HTTPStatus.METHOD_NOT_ALLOWED, {"error": "read-only API: use GET"})
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        query = parse_qs(url.query)
+        served = self.served
+        try:
+            if path in ("", "/metrics"):
+                return _json_response(HTTPStatus.OK, {
+                    "metrics": list(METRICS),
+                    "filters": [*LIST_FILTERS, "start", "end", "granularity"],
+                    "formats": list(FORMATS),
+                    "exports": {"frames": list(EXPORT_FRAMES), "formats": list(EXPORT_FORMATS)},
+                })
+            if path == "/health":
+                return _json_response(HTTPStatus.OK, {
+                    "status": "ok",
+                    "rows": {"products": len(served.product_level_df), "orders": len(served.order_level_df)},
+                    "cache": served.cache.stats(),
+                    "bodies": served.bodies.stats(),
+                })
+            if path.startswith("/export/"):
+                return self._export(served, path[len("/export/"):], query)
+            if not path.startswith("/metrics/"):
+                raise RequestError(HTTPStatus.NOT_FOUND, f"no such path: {url.path}")
+
+            name = path[len("/metrics/"):]
+            if name not in METRICS:
+                raise RequestError(HTTPStatus.NOT_FOUND, f"unknown metric: {name}")
+            default = "arrow" if FORMATS["arrow"] in headers.get("accept", "") else "json"
+            fmt = query.get("format", [default])[0]
+            if fmt not in FORMATS:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"format must be one of {', '.join(FORMATS)}")
+            filters, granularity = parse_selection(query, served.id_dtypes)
+            part = query.get("part", [None])[0]
+            body = await self.metric_body(served, name, filters, granularity, part, fmt)
+            return HTTPStatus.OK, FORMATS[fmt], body
+        except RequestError as exc:
+            return _json_response(exc.status, {"error": str(exc)})
+        except Exception as exc:
+            traceback.print_exc()
+            return _json_response(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"})
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # One connection: HTTP/1.1 requests in sequence until the client closes or asks to
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    field, _, value = line.decode("latin-1").partition(":")
+                    headers[field.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0) or 0):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    status, content_type, body = _json_response(HTTPStatus.BAD_REQUEST, {"error": "malformed request"})
+                    method, version = "GET", "HTTP/1.0"
+                else:
+                    status, content_type, body = await self.dispatch(method, target, headers)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if isinstance(body, bytes):
+                    length = f"Content-Length: {len(body)}\r\n"
+                else:
+                    # Streamed export: chunked for HTTP/1.1, delimited by closing the connection for HTTP/1.0
+                    length = "Transfer-Encoding: chunked\r\n" if version == "HTTP/1.1" else ""
+                    keep_alive = keep_alive and bool(length)
+                head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                        f"Content-Type: {content_type}\r\n"
+                        f"{length}"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+                if isinstance(body, bytes):
+                    writer.write(head.encode("latin-1") + (body if method != "HEAD" else b""))
+                    await writer.drain()
+                elif not await self._stream(writer, head, body, chunked=bool(length), send=method != "HEAD"):
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer: asyncio.StreamWriter, head: str, body: AsyncIterator[bytes],
+                      chunked: bool, send: bool = True) -> bool:
+        # Write a streamed body, waiting for the client to drain each chunk; False if it could not be finished
+        writer.write(head.encode("latin-1"))
+        try:
+            # HEAD: the headers only, without chunks or the terminating chunk
+            if send:
+                async for piece in body:
+                    if piece:
+                        writer.write(b"%x\r\n%s\r\n" % (len(piece), piece) if chunked else piece)
+                        await writer.drain()
+                if chunked:
+                    writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception:
+            # The status line is already sent: cut the response short so the client sees it incomplete
+            traceback.print_exc()
+            return False
+        finally:
+            await body.aclose()
+        return True
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8502) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def serve_in_thread(api: MetricsAPI, host: str = "127.0.0.1", port: int = 8502) -> threading.Thread:
+    """Run api's event loop on a daemon thread, e.g. inside the Streamlit process."""
+    thread = threading.Thread(target=asyncio.run, args=(api.serve(host, port),), name="metrics-api", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the dashboard metrics as JSON / Arrow over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Threads computing metrics")
+    args = parser.parse_args(argv)
+
+    # The memory-mapped store: a standalone API shares the dataset pages with the dashboard processes
+    product_level_df, order_level_df = load_datasets()
+    api = MetricsAPI(product_level_df, order_level_df, workers=args.workers, cold=LazyColumns())
+    print(f"Serving metrics on http://{args.host}:{args.port}/metrics")
+    asyncio.run(api.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,23 @@
 # app.py
 
 import streamlit as st
-from transform import prepare_cleaned_datasets
+from store import load_datasets, load_rollups, source_version
+from datastore import SharedDataset, frame_nbytes, rows_nbytes
+from lazycolumns import LazyColumns
+from instrumentation import RerunProfiler, StageRecorder
+from config import API_PORT, EXPORT_MAX_ROWS, METRIC_EXECUTOR, PROFILE_DIR, PROFILE_RERUNS
+import os
+import tempfile
+import time
+from functools import partial
+from urllib.parse import urlencode
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-import plotly.express as px
-from analysis import (
-    calculate_retention_matrix, 
-    calculate_month1_retention,
-    prepare_retention_curves,
-    calculate_cohort_sizes, 
-    calculate_avg_revenue_by_cohort,
-    calculate_days_to_second_order,
-    get_top_products_by_revenue,
-    get_category_revenue_trend,
-    get_avg_price_per_category,
-    get_top_categories_by_units_sold,
-    get_geo_revenue,
-    get_new_vs_returning_user_counts,
-    get_monthly_net_revenue,
-    get_discount_rate_trend,
-    get_monthly_aov,
-    get_revenue_by_order_type,
-    calculate_monthly_summary_table,
-    calculate_month1_churn,
-    perform_rfm_segmentation,
-    get_rfm_segment_counts,
-    get_retention_by_discount_level
-    
-)
+from scheduler import run_metrics
+from sketches import CustomerSketches, relative_error
+from rollups import REVENUE_VIEWS, RevenueRollups, revenue_metrics
+from cache import ResultCache, selection_key
+from export import EXPORT_FORMATS, write_export
 from visualization import(
     plot_retention_matrix, 
     plot_month1_retention,
@@ -48,8 +38,18 @@ from visualization import(
     plot_monthly_summary_table,
     plot_month1_churn_rate,
     plot_rfm_segmentation_bar,
-    plot_retention_by_discount_level
+    plot_retention_by_discount_level,
+    plot_rerun_profile
+)
+
+# Opt-in rerun profiling: records filtering, every metric and every plot call of this rerun
+profiler = RerunProfiler(
+    enabled=st.session_state.get("profile_reruns", PROFILE_RERUNS),
+    cprofile=st.session_state.get("profile_cprofile", False),
 )
+for _name, _func in list(globals().items()):
+    if _name.startswith("plot_"):
+        globals()[_name] = profiler.wrap("plot", _name, _func)
 
 
 # Page setup
@@ -92,9 +92,58 @@ Let’s get into it and uncover some actionable insights!
 
 
 
-# Load and transform data
+@st.cache_resource(show_spinner=False)
+def shared_dataset(version: tuple, _track_memory: bool) -> SharedDataset:
+    # Loaded once per process and source data version; every session reads these same frames
+    recorder = StageRecorder(track_memory=_track_memory)
+    return SharedDataset(*load_datasets(recorder=recorder), version=version, recorder=recorder, cold=LazyColumns())
+
+
+@st.cache_resource(show_spinner=False)
+def result_cache(version: tuple) -> ResultCache:
+    # One LRU of metric results per process and dataset version, shared by all sessions (and the metrics API)
+    return ResultCache()
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_api(_dataset: SharedDataset, _cache: ResultCache, port: int):
+    # Started once per process, on the port; imported here so dashboards without the API never load it
+    from api import MetricsAPI, serve_in_thread
+    api = MetricsAPI(_dataset.product_level_df, _dataset.order_level_df, _cache, cold=_dataset.cold)
+    serve_in_thread(api, host="0.0.0.0", port=port)
+    return api
+
+
+def serve_current_dataset(api, dataset: SharedDataset, cache: ResultCache) -> None:
+    # The server outlives dataset versions: point it at the frames, cold columns and result cache sessions use
+    if api.served.order_level_df is not dataset.order_level_df or api.served.cache is not cache:
+        api.use_dataset(dataset.product_level_df, dataset.order_level_df, cache, cold=dataset.cold)
+
+
+@st.cache_resource(show_spinner=False)
+def load_customer_sketches(_order_level_df: pd.DataFrame, rows: int, last_order) -> CustomerSketches:
+    # Built once per dataset version (row count and latest order) and shared by all sessions
+    return CustomerSketches(_order_level_df)
+
+
+@st.cache_resource(show_spinner=False)
+def revenue_rollups(version: tuple, _dataset: SharedDataset) -> RevenueRollups:
+    # Read from the store (or built from the shared frames) once per dataset version and shared by all sessions
+    return load_rollups(_dataset.product_level_df, _dataset.order_level_df)
+
+
+# Load the memory-mapped, processed_at-sorted store (built by the transform pipeline when missing or stale)
+# once per process: sessions share the frames and keep only their filter selection and row positions.
+# Stage timings of the load are always recorded; memory tracking only if the performance panel was open
 with st.spinner("Loading and transforming data..."):
-    product_level_df, order_level_df = prepare_cleaned_datasets()
+    profiler.phase = "load"
+    dataset = profiler.run("load_datasets", shared_dataset, source_version(),
+                           st.session_state.get("show_performance", False))
+product_level_df, order_level_df = dataset.product_level_df, dataset.order_level_df
+recorder = dataset.recorder
+metric_cache = result_cache(dataset.version)
+if API_PORT:
+    serve_current_dataset(start_metrics_api(dataset, metric_cache, API_PORT), dataset, metric_cache)
 
 with st.sidebar:
     st.header("🔍 Filters")
@@ -104,54 +153,192 @@ with st.sidebar:
     selected_country = st.multiselect("Country", options=order_level_df['billing_address_country'].unique())
     selected_status = st.multiselect("Order Status", options=order_level_df['order_status'].unique())
     selected_orders = st.multiselect("Order Number", options=order_level_df['order_number'].unique())
-    selected_customers = st.multiselect("Customer ID", options=order_level_df['customer_id'].unique())
+    selected_customers = st.multiselect("Customer ID", options=dataset.customers.ids)
     selected_date = st.date_input("Date Range", value=(order_level_df['processed_at'].min(), order_level_df['processed_at'].max()))
     st.caption("Data available from **2019-12-03** to **2021-03-08**")
+    selected_granularity = st.selectbox("Cohort Granularity", options=["month", "week", "day", "quarter"],
+                                        format_func=str.capitalize)
+    approximate_counts = st.checkbox(
+        "≈ Approximate customer counts", key="approximate_counts",
+        help=f"HyperLogLog estimates (±{relative_error():.1%} standard error) for cohort, retention and "
+             "new/returning customer counts, with the date range applied by whole months. "
+             "Monthly cohorts only; order and customer filters switch back to exact counts.",
+    )
+    revenue_view = st.radio(
+        "Revenue view", options=list(REVENUE_VIEWS), horizontal=True, key="revenue_view",
+        format_func=lambda view: "All orders" if view == "all" else f"{view.capitalize()} only",
+        help="Orders counted by the revenue, AOV, discount, category and country charts. "
+             "Served from precomputed daily rollups split by order status, without rescanning the line items.",
+    )
+
+    if st.checkbox("⏱️ Show performance", key="show_performance"):
+        st.header("⏱️ Performance")
+        stage_events = recorder.to_frame()
+        st.metric("Pipeline wall time", f"{stage_events['wall_s'].sum():.2f}s")
+        st.dataframe(
+            stage_events[['stage', 'wall_s', 'cpu_s', 'rows_in', 'rows_out', 'peak_mem_delta_mb', 'arrow_mem_delta_mb']],
+            hide_index=True,
+        )
+        st.download_button("Stage events (JSON)", recorder.to_json(), file_name="stage_events.json")
+        st.download_button("Stage metrics (Prometheus)", recorder.to_prometheus(), file_name="stage_metrics.prom")
+
+    if st.checkbox("🔬 Profile this rerun", value=PROFILE_RERUNS, key="profile_reruns"):
+        st.checkbox("Collect cProfile stats", key="profile_cprofile",
+                    help="Runs the metrics serially so cProfile sees them. One session collects cProfile "
+                         "stats at a time; others profile the rerun without them meanwhile.")
 
 
 
 # Apply filters
-filtered_product_df = product_level_df.copy()
-filtered_order_df = order_level_df.copy()
-
-if selected_products:
-    filtered_product_df = filtered_product_df[filtered_product_df['product_title'].isin(selected_products)]
-if selected_categories:
-    filtered_product_df = filtered_product_df[filtered_product_df['product_category'].isin(selected_categories)]
-if selected_types:
-    filtered_product_df = filtered_product_df[filtered_product_df['product_type'].isin(selected_types)]
-if selected_country:
-    filtered_order_df = filtered_order_df[filtered_order_df['billing_address_country'].isin(selected_country)]
-if selected_status:
-    filtered_order_df = filtered_order_df[filtered_order_df['order_status'].isin(selected_status)]
-if selected_orders:
-    filtered_order_df = filtered_order_df[filtered_order_df['order_number'].isin(selected_orders)]
+profiler.phase = "filter"
+selected_filters = dict(
+    products=selected_products,
+    categories=selected_categories,
+    types=selected_types,
+    countries=selected_country,
+    statuses=selected_status,
+    orders=selected_orders,
+    customers=selected_customers,
+    date_range=selected_date,
+)
+# Row positions are recomputed only when this session's selection (or the dataset) changes
+selection = (dataset.version, selection_key(**selected_filters))
+if st.session_state.get("selection") != selection:
+    st.session_state["selection"] = selection
+    st.session_state["selected_rows"] = profiler.run("filter_rows", dataset.select, **selected_filters)
+product_rows, order_rows = st.session_state["selected_rows"]
+filtered_product_df, filtered_order_df = dataset.take(product_rows, order_rows)
+
+# Per-session memory: row positions kept in the session plus the filtered frames this rerun builds
+session_ctx = get_script_run_ctx()
+session_bytes = (rows_nbytes(product_rows) + rows_nbytes(order_rows)
+                 + frame_nbytes(filtered_product_df, product_rows) + frame_nbytes(filtered_order_df, order_rows))
+dataset.record_session(session_ctx.session_id if session_ctx else "local", session_bytes)
+if st.session_state.get("show_performance"):
+    with st.sidebar:
+        st.subheader("🧠 Memory")
+        memory = dataset.memory_report()
+        sessions = memory[memory["scope"] == "session"]
+        st.metric("Shared dataset (once per process)", f"{dataset.nbytes / 2**20:.1f} MB")
+        st.metric("This session", f"{session_bytes / 2**20:.2f} MB")
+        st.caption(f"{len(sessions)} active session(s): {memory['mb'].sum():.1f} MB in total, "
+                   f"about {sessions['mb'].mean():.2f} MB per additional session")
+        st.dataframe(memory, hide_index=True)
+
+with st.sidebar:
+    st.header("📤 Export")
+    export_frame = st.radio("Rows", options=["orders", "products"], format_func=str.capitalize,
+                            horizontal=True, key="export_frame")
+    export_df, export_rows, export_count = ((order_level_df, order_rows, len(filtered_order_df))
+                                            if export_frame == "orders"
+                                            else (product_level_df, product_rows, len(filtered_product_df)))
+    export_format = st.radio("Format", options=list(EXPORT_FORMATS), format_func=str.upper,
+                             horizontal=True, key="export_format")
+    # Cold order columns are offered too; they are read from parquet only when an export asks for them
+    export_columns = st.multiselect("Columns", options=[*export_df.columns, *dataset.cold.names],
+                                    key="export_columns", placeholder="All columns")
+
+    def export_file():
+        # Written chunk by chunk from the shared frame when the button is clicked, not on every rerun;
+        # Streamlit then reads the whole file into memory to send it, hence EXPORT_MAX_ROWS
+        file = tempfile.TemporaryFile()
+        write_export(file, dataset.with_columns(export_df, export_columns), export_rows, export_format,
+                     export_columns or None)
+        file.seek(0)
+        return file
+
+    st.download_button(
+        f"Download filtered {export_frame} ({export_format.upper()})", export_file,
+        file_name=f"{export_frame}.{export_format}", mime=EXPORT_FORMATS[export_format], on_click="ignore",
+        disabled=export_count > EXPORT_MAX_ROWS,
+    )
+    if API_PORT:
+        # The API's /export streams the same rows in chunks, without holding the file in memory
+        export_query = {name: values for name, values in selected_filters.items() if name != "date_range" and values}
+        if len(selected_date) == 2:
+            export_query.update(start=selected_date[0].isoformat(), end=selected_date[1].isoformat())
+        if export_columns:
+            export_query["columns"] = ",".join(export_columns)
+        export_query["format"] = export_format
+        api_host = st.context.headers.get("Host", "localhost").rsplit(":", 1)[0]
+        st.link_button(f"Stream filtered {export_frame} ({export_format.upper()})",
+                       f"http://{api_host}:{API_PORT}/export/{export_frame}?{urlencode(export_query, doseq=True)}")
+    if export_count > EXPORT_MAX_ROWS:
+        st.caption(f"{export_count:,} rows: the download button is limited to {EXPORT_MAX_ROWS:,} "
+                   "(FITLYTICS_EXPORT_MAX_ROWS) because the file is buffered in memory. "
+                   + ("Stream it from the API instead." if API_PORT
+                      else "Set FITLYTICS_API_PORT to stream it from the metrics API."))
+
+# Customer drill-down: each selected customer's orders, line items and figures are slices of the shared
+# customer index (built once at load), so this panel never scans the frames
 if selected_customers:
-    filtered_order_df = filtered_order_df[filtered_order_df['customer_id'].isin(selected_customers)]
-if selected_date:
-    start_date, end_date = selected_date
-    start_date = pd.to_datetime(start_date).tz_localize("UTC")
-    end_date = pd.to_datetime(end_date).tz_localize("UTC")
-    filtered_order_df = filtered_order_df[
-        (filtered_order_df['processed_at'] >= start_date) &
-        (filtered_order_df['processed_at'] <= end_date)
-]
-    filtered_product_df = filtered_product_df[
-         (filtered_product_df['processed_at'] >= start_date) &
-         (filtered_product_df['processed_at'] <= end_date)
-]
-
-  
+    st.header("🔎 Customer Drill-down")
+    st.caption("Over all of the customer's orders, whatever the other filters; "
+               "RFM scores rank the customer among all customers.")
+    for tab, customer_id in zip(st.tabs([f"Customer {c}" for c in selected_customers]), selected_customers):
+        with tab:
+            profile = dataset.customers.profile(customer_id)
+            # An id with no orders, e.g. selected before the dataset was reloaded
+            if profile is None:
+                st.info(f"Customer {customer_id} has no orders in the current data.")
+                continue
+            columns = st.columns(5)
+            columns[0].metric("Lifetime revenue", f"€{profile['lifetime_revenue']:,.2f}")
+            columns[1].metric("Orders", int(profile['orders']))
+            columns[2].metric("Cohort", str(profile['cohort_month']))
+            columns[3].metric("Days to second order", "–" if pd.isna(profile['days_to_second_order'])
+                              else int(profile['days_to_second_order']))
+            columns[4].metric(f"RFM score ({profile['Segment']})", int(profile['RFM_Score']),
+                              help=f"Recency {profile['R_Score']} · Frequency {profile['F_Score']} · "
+                                   f"Monetary {profile['M_Score']} (quartiles, 4 is best); "
+                                   f"last order {profile['Recency']} days before the data ends")
+            st.dataframe(dataset.customers.orders(customer_id), hide_index=True)
+            with st.expander("Line items"):
+                st.dataframe(dataset.customers.line_items(customer_id), hide_index=True)
+
+# Compute every metric on this page concurrently; plots below read from the results
+profiler.phase = "analysis"
+precomputed = {}
+variants = []
+if approximate_counts and selected_granularity == "month" and not (selected_orders or selected_customers):
+    sketches = load_customer_sketches(order_level_df, len(order_level_df), order_level_df['processed_at'].max())
+    mask = sketches.cell_mask(countries=selected_country, statuses=selected_status, date_range=selected_date)
+    precomputed.update(profiler.run("customer_sketches", sketches.metrics, mask))
+    variants.append("approximate")
+# Revenue metrics in the selected view come from the rollups (they equal the exact metrics in the "all" view)
+precomputed.update(profiler.run("revenue_rollups", revenue_metrics, revenue_rollups(dataset.version, dataset),
+                                revenue_view, filtered_order_df, filtered_product_df, **selected_filters))
+if revenue_view != "all":
+    variants.append(revenue_view)
+# Metrics already computed for this selection (by any session or the API) come from the result cache;
+# a cProfile'd rerun computes everything so the profile covers the metrics
+cache_key = selection_key(granularity=selected_granularity, variant="+".join(variants) or None,
+                          **selected_filters)
+compute = partial(metric_cache.run_metrics, cache_key) if profiler.profile is None else run_metrics
+results = compute([
+    "retention_matrix", "month1_retention", "retention_curves", "month1_churn",
+    "cohort_sizes", "days_to_second_order", "rfm_segment_counts",
+    "avg_revenue_by_cohort", "revenue_by_order_type", "monthly_aov",
+    "top_products", "avg_price_per_category", "top_categories_by_units",
+    "category_revenue_trend", "geo_revenue",
+    "new_vs_returning", "monthly_net_revenue", "discount_rate_trend", "monthly_summary",
+    "retention_by_discount",
+], filtered_order_df, filtered_product_df,
+    executor="serial" if profiler.profile is not None else METRIC_EXECUTOR,
+    recorder=profiler,
+    granularity=selected_granularity,
+    precomputed=precomputed,
+)
 
 # Generate retention matrix
-retention_matrix = calculate_retention_matrix(filtered_order_df)
+retention_matrix = results["retention_matrix"]
 
 # SECTION 1: Customer Behavior & Retention
 st.header(" 👥 SECTION 1: Customer Behavior & Retention")
 
 # Graph 1: heatmap for customer Retention by Cohort
 st.subheader("Customer Retention Trends by Acquisition Cohort")
-plot_retention_matrix(retention_matrix)
+st.plotly_chart(plot_retention_matrix(retention_matrix), use_container_width=True)
 st.markdown("""
 
 - **Y-axis:** Cohort Month (month of user acquisition)  
@@ -176,8 +363,8 @@ st.markdown("---")
 
 # Graph 2: Month 1 bar chart
 st.subheader("Month 1 Repurchase Rate")
-month1_df = calculate_month1_retention(retention_matrix)
-plot_month1_retention(month1_df)
+month1_df = results["month1_retention"]
+st.plotly_chart(plot_month1_retention(month1_df), use_container_width=True)
 st.markdown("""
 
 ### Observations
@@ -194,8 +381,8 @@ st.markdown("---")
 
 # Graph 3: avg vs best/worst retention curves
 st.subheader("Best vs Worst Cohorts Compared to Average")
-avg_ret, best_curve, worst_curve, best_cohort, worst_cohort,retention_long  = prepare_retention_curves(retention_matrix)
-plot_retention_curves(avg_ret, best_curve, worst_curve, best_cohort, worst_cohort)
+avg_ret, best_curve, worst_curve, best_cohort, worst_cohort,retention_long  = results["retention_curves"]
+st.plotly_chart(plot_retention_curves(avg_ret, best_curve, worst_curve, best_cohort, worst_cohort), use_container_width=True)
 st.markdown(""" 
 ### Observations
             
@@ -214,8 +401,8 @@ st.markdown("---")
 
 # Graph 4: Customer Acquisition Over Time
 st.subheader("Cohort Size: Customer Acquisition Over Time")
-cohort_sizes = calculate_cohort_sizes(filtered_order_df)
-plot_cohort_sizes(cohort_sizes)
+cohort_sizes = results["cohort_sizes"]
+st.plotly_chart(plot_cohort_sizes(cohort_sizes), use_container_width=True)
 
 st.markdown("""
 
@@ -235,8 +422,8 @@ st.markdown("---")
 
 # Graph 5: Days to second purchase
 st.subheader("Time to Second Purchase")
-days_to_second = calculate_days_to_second_order(filtered_order_df)
-plot_days_to_second_order_histogram(days_to_second)
+days_to_second = results["days_to_second_order"]
+st.plotly_chart(plot_days_to_second_order_histogram(days_to_second))
 st.markdown("""
 
 ### Observations
@@ -254,7 +441,7 @@ st.markdown("---")
 
 # Graph 6: Month 1 Churn Rate
 st.subheader("Month 1 Churn Rate by Cohort")
-month1_churn_df = calculate_month1_churn(retention_long)
+month1_churn_df = results["month1_churn"]
 st.plotly_chart(plot_month1_churn_rate(month1_churn_df), use_container_width=True, key="month1_churn")
 st.markdown("""
 
@@ -272,8 +459,7 @@ st.markdown("---")
 
 # Graph 7: RFM Segmentation
 st.subheader("RFM Segment Distribution")
-rfm_df = perform_rfm_segmentation(filtered_order_df)
-rfm_segment_counts = get_rfm_segment_counts(rfm_df)
+rfm_segment_counts = results["rfm_segment_counts"]
 st.plotly_chart(plot_rfm_segmentation_bar(rfm_segment_counts), use_container_width=True, key="rfm_segments")
 st.markdown("""
 
@@ -296,8 +482,8 @@ st.header("💰 SECTION 2: Revenue & Monetization Patterns")
 
 # Graph 8: Average Revenue per Customer by Cohort
 st.subheader("Average Revenue per Customer by Cohort")
-cohort_revenue = calculate_avg_revenue_by_cohort(filtered_order_df)
-plot_avg_revenue_by_cohort(cohort_revenue)
+cohort_revenue = results["avg_revenue_by_cohort"]
+st.plotly_chart(plot_avg_revenue_by_cohort(cohort_revenue), use_container_width=True)
 st.markdown("""
 
 ### Observations
@@ -314,7 +500,7 @@ st.markdown("---")
 
 # Graph 9: Revenue by Order Type
 st.subheader("First vs Repeat Order Revenue")
-revenue_by_type = get_revenue_by_order_type(filtered_order_df)
+revenue_by_type = results["revenue_by_order_type"]
 st.plotly_chart(plot_revenue_by_order_type(revenue_by_type), use_container_width=True, key="revenue_by_order_type_chart")
 st.markdown("""
 
@@ -331,7 +517,7 @@ st.markdown("---")
 
 # Graph 10: AOV over Time
 st.subheader("Average Order Value (AOV) Over Time")
-monthly_aov = get_monthly_aov(filtered_order_df)
+monthly_aov = results["monthly_aov"]
 st.plotly_chart(plot_monthly_aov(monthly_aov), use_container_width=True, key="aov_over_time")
 st.markdown("""
 
@@ -355,7 +541,7 @@ st.header("🛍️ SECTION 3: Product-Level Insights")
 
 # Graph 11: Top products by revenue
 st.subheader("Top Products by Revenue")
-top_products = get_top_products_by_revenue(filtered_product_df)
+top_products = results["top_products"]
 fig = plot_top_products_by_revenue(top_products)
 st.plotly_chart(fig, use_container_width=True, key="top_products_chart")
 st.sidebar.markdown(f"🎯 Filtered products: **{len(filtered_product_df)}** rows")
@@ -378,7 +564,7 @@ st.markdown("---")
 
 # Graph 12: Average Price per Category
 st.subheader("Average Product Price per Category")
-avg_price_df = get_avg_price_per_category(filtered_product_df)
+avg_price_df = results["avg_price_per_category"]
 st.plotly_chart(plot_avg_price_per_category(avg_price_df), use_container_width=True, key="avg_price_per_category")
 st.markdown("""
 
@@ -397,7 +583,7 @@ st.markdown("---")
 
 # Graph 13: Top Categories by Units Sold
 st.subheader("Top 10 Product Categories by Units Sold")
-units_df = get_top_categories_by_units_sold(filtered_product_df)
+units_df = results["top_categories_by_units"]
 st.plotly_chart(plot_top_categories_by_units(units_df), use_container_width=True, key="top_units_by_category")
 st.markdown("""
 
@@ -420,8 +606,8 @@ st.header("🌍 SECTION 4: Category & Geographic Trends")
 
 # Graph 14: Revenue Trend by Product Category
 st.subheader("Revenue Trend by Product Category")
-category_trend = get_category_revenue_trend(filtered_product_df)
-st.area(plot_category_revenue_trend(category_trend), use_container_width=True, key="cat_revenue_trend")
+category_trend = results["category_revenue_trend"]
+st.plotly_chart(plot_category_revenue_trend(category_trend), use_container_width=True, key="cat_revenue_trend")
 st.markdown("""
 
 ### Observations
@@ -441,7 +627,7 @@ st.markdown("---")
 
 # Graph 15: Revenue by Country
 st.subheader("Revenue by Country")
-geo_revenue = get_geo_revenue(filtered_product_df)
+geo_revenue = results["geo_revenue"]
 st.plotly_chart(plot_geo_revenue_map(geo_revenue), use_container_width=True, key="revenue_by_country")
 st.markdown("""
 
@@ -468,7 +654,7 @@ st.header(" 📈 SECTION 5:  Growth, Discounts, and Profitability")
 
 # Graph 16: New vs Returning Customers
 st.subheader("New vs Returning Customers Over Time")
-user_counts = get_new_vs_returning_user_counts(filtered_order_df)
+user_counts = results["new_vs_returning"]
 st.plotly_chart(plot_new_vs_returning_area(user_counts), use_container_width=True, key="user_retention_type")
 
 st.markdown("""
@@ -488,7 +674,7 @@ st.markdown("---")
 
 # Graph 17: Monthly Net Revenue Trend
 st.subheader("Monthly Net Revenue Trend")
-monthly_revenue = get_monthly_net_revenue(filtered_order_df)
+monthly_revenue = results["monthly_net_revenue"]
 st.plotly_chart(plot_monthly_revenue_trend(monthly_revenue), use_container_width=True, key="monthly_revenue")
 st.markdown("""
 
@@ -511,7 +697,7 @@ st.markdown("---")
 
 # Graph 18: Discount Rate Trend
 st.subheader("Discount Rate Trend")
-monthly_discount = get_discount_rate_trend(filtered_order_df)
+monthly_discount = results["discount_rate_trend"]
 st.plotly_chart(plot_discount_rate_trend(monthly_discount), use_container_width=True, key="discount_rate")
 st.markdown("""
 
@@ -536,7 +722,7 @@ st.markdown("---")
 
 # Graph 19: Monthly Summary Table
 st.subheader(" Monthly Business Summary Table")
-summary_table = calculate_monthly_summary_table(filtered_order_df)
+summary_table = results["monthly_summary"]
 st.plotly_chart(plot_monthly_summary_table(summary_table), use_container_width=True, key="summary_table")
 
 st.markdown("""
@@ -565,7 +751,7 @@ st.markdown("---")
 st.header("Discount Impact on Retention")
 
 st.subheader("Retention Curves by Discount Level")
-discount_retention_df = get_retention_by_discount_level(filtered_order_df)
+discount_retention_df = results["retention_by_discount"]
 st.plotly_chart(plot_retention_by_discount_level(discount_retention_df), use_container_width=True, key="retention_by_discount")
 
 st.markdown("""
@@ -625,6 +811,28 @@ Retention is where the real growth and profitability will come from.
 
 st.markdown("---") 
 
+if profiler.enabled:
+    profiler.stop()
+    st.header("🔬 Rerun Profile")
+    timeline = profiler.timeline()
+    st.plotly_chart(plot_rerun_profile(timeline), use_container_width=True, key="rerun_profile")
+    st.dataframe(
+        timeline.groupby('phase', sort=False)
+        .agg(calls=('stage', 'size'), wall_s=('wall_s', 'sum'), output_bytes=('output_bytes', 'sum'))
+        .reset_index()
+    )
+    if profiler.profile is not None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_path = os.path.join(PROFILE_DIR, f"rerun-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_cprofile(profile_path)
+        with st.expander("cProfile (top 30 by cumulative time)"):
+            st.code(profiler.cprofile_text())
+        with open(profile_path, "rb") as f:
+            st.download_button("Download cProfile stats", f.read(), file_name=os.path.basename(profile_path))
+    elif st.session_state.get("profile_cprofile"):
+        st.caption("cProfile stats were skipped: another session (or profiling tool) is collecting them.")
+    st.markdown("---")
+
 st.markdown(
     """
     <style>
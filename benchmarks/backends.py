@@ -0,0 +1,74 @@
+# benchmarks/backends.py
+"""
+Compare the NumPy and Arrow backends of prepare_cleaned_datasets on load
+time, transform time and memory.
+
+    python -m benchmarks.backends --scales 1e5 1e6 --output backends.json
+
+Memory is the deep size of the two output frames, the largest Python heap
+peak of any stage (tracemalloc) and the net growth of Arrow's memory pool.
+"""
+import argparse
+import json
+
+import pandas as pd
+
+from benchmarks.run import _best, benchmark_pipeline, dataset_dir
+from instrumentation import payload_size
+
+BACKENDS = ("numpy", "arrow")
+LOAD_STAGES = ("load_orders", "load_products")
+
+
+def summarize(stages: dict, product_level_df: pd.DataFrame, order_level_df: pd.DataFrame) -> dict:
+    return {
+        "wall_s": sum(stats["wall_s"] for stats in stages.values()),
+        "load_s": sum(stats["wall_s"] for name, stats in stages.items() if name in LOAD_STAGES),
+        "transform_s": sum(stats["wall_s"] for name, stats in stages.items() if name not in LOAD_STAGES),
+        "frames_mb": round(payload_size((product_level_df, order_level_df)) / 2**20, 3),
+        "peak_heap_mb": max((stats["peak_mem_delta_mb"] or 0.0) for stats in stages.values()),
+        "arrow_pool_mb": round(sum(stats["arrow_mem_delta_mb"] for stats in stages.values()), 3),
+        "stages": stages,
+    }
+
+
+def compare_backends(n_line_items: int, data_root: str, repeat: int = 1) -> dict:
+    data_dir = dataset_dir(n_line_items, data_root)
+    results = {}
+    for backend in BACKENDS:
+        runs = []
+        for _ in range(repeat):
+            # Timing and tracemalloc runs are separate: tracing slows the Python-object path far more
+            timed, product_level_df, order_level_df = benchmark_pipeline(data_dir, backend=backend)
+            traced, _, _ = benchmark_pipeline(data_dir, memory=True, backend=backend)
+            for name, stats in timed.items():
+                stats["peak_mem_delta_mb"] = traced[name]["peak_mem_delta_mb"]
+            runs.append(summarize(timed, product_level_df, order_level_df))
+        results[backend] = _best(runs)
+    return {"line_items": n_line_items, "data_dir": data_dir, "backends": results}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare the NumPy and Arrow pipeline backends.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1e5, 1e6], help="Line item counts to benchmark")
+    parser.add_argument("--data-root", default="benchmarks/data", help="Cache folder for generated datasets")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per backend; the fastest is reported")
+    parser.add_argument("--output", default="backends.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for scale in args.scales:
+        run = compare_backends(int(scale), args.data_root, args.repeat)
+        runs.append(run)
+        print(f"{int(scale):>12,} line items")
+        for backend, stats in run["backends"].items():
+            print(f"  {backend:<6} load {stats['load_s']:>7.3f}s  transform {stats['transform_s']:>7.3f}s  "
+                  f"frames {stats['frames_mb']:>9.1f} MB  heap peak {stats['peak_heap_mb']:>9.1f} MB  "
+                  f"arrow pool {stats['arrow_pool_mb']:>9.1f} MB")
+
+    with open(args.output, "w") as f:
+        json.dump({"runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
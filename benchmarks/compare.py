@@ -0,0 +1,63 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark reports and fail on regressions.
+
+    python -m benchmarks.compare baseline.json bench.json --threshold 0.2
+
+Exits with status 1 when any stage or metric got slower than the threshold
+(relative wall time) at a scale present in both reports.
+"""
+import argparse
+import json
+import sys
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.2, min_seconds: float = 0.01) -> list[dict]:
+    """Return one row per stage/metric measured in both reports. Tiny timings are never flagged."""
+    rows = []
+    baseline_runs = {run["line_items"]: run for run in baseline["runs"]}
+    for run in current["runs"]:
+        base = baseline_runs.get(run["line_items"])
+        if base is None:
+            continue
+        for section in ("stages", "metrics"):
+            for name, stats in run[section].items():
+                if name not in base[section]:
+                    continue
+                before, after = base[section][name]["wall_s"], stats["wall_s"]
+                change = (after - before) / before if before else 0.0
+                rows.append({
+                    "line_items": run["line_items"],
+                    "name": name,
+                    "before_s": before,
+                    "after_s": after,
+                    "change": change,
+                    "regression": change > threshold and after - before > min_seconds,
+                })
+    return rows
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare_reports(baseline, current, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['line_items']:>12,} {row['name']:<30} {row['before_s']:>9.3f}s {row['after_s']:>9.3f}s "
+              f"{row['change']:>+8.1%} {flag}")
+
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/export.py
+"""
+Throughput and memory of the filtered-data export (export.py): CSV and
+Parquet, all columns or a subset, streamed in chunks against building the
+whole filtered frame and file at once.
+
+    python -m benchmarks.export --scales 1e5 1e6 --output export.json
+
+Rows are exported to a counting sink, so the timings are encoding only.
+Peak memory is the Python heap peak (tracemalloc) and Arrow's memory pool
+high-water mark during the export.
+"""
+import argparse
+import io
+import json
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.run import _best, benchmark_pipeline, dataset_dir
+from export import DEFAULT_CHUNK_ROWS, EXPORT_FORMATS, write_export
+from filters import take_rows
+
+SUBSETS = {
+    "products": ["order_number", "processed_at", "product_title", "net_price"],
+    "orders": ["order_number", "customer_id", "processed_at", "net_revenue"],
+}
+
+
+class _CountingSink(io.RawIOBase):
+    def __init__(self):
+        self.written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.written += len(data)
+        return len(data)
+
+
+def _full_export(file, df: pd.DataFrame, rows, fmt: str, columns=None) -> None:
+    # The unchunked baseline: materialize the filtered frame, then encode it in one go
+    selected = take_rows(df, rows)
+    if columns:
+        selected = selected[columns]
+    if fmt == "csv":
+        file.write(selected.to_csv(index=False).encode())
+    else:
+        selected.to_parquet(file, index=False)
+
+
+def _measure(export, df: pd.DataFrame, rows, fmt: str, columns) -> dict:
+    sink = _CountingSink()
+    start = time.perf_counter()
+    export(sink, df, rows, fmt, columns)
+    wall_s = time.perf_counter() - start
+
+    # A second run for memory: traced (tracing slows the Python-object paths), and on a proxy of
+    # Arrow's pool whose high-water mark covers this run only
+    default_pool = pa.default_memory_pool()
+    pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(pool)
+    tracemalloc.start()
+    try:
+        export(_CountingSink(), df, rows, fmt, columns)
+        _, heap_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+    n_rows = len(range(len(df))[rows]) if isinstance(rows, slice) else len(rows)
+    return {
+        "wall_s": round(wall_s, 4),
+        "rows_per_s": round(n_rows / wall_s),
+        "mb_per_s": round(sink.written / 2**20 / wall_s, 2),
+        "output_mb": round(sink.written / 2**20, 2),
+        "peak_heap_mb": round(heap_peak / 2**20, 2),
+        "arrow_pool_peak_mb": round(pool.max_memory() / 2**20, 2),
+    }
+
+
+def benchmark_export(n_line_items: int, data_root: str, repeat: int = 1, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+    _, product_level_df, order_level_df = benchmark_pipeline(dataset_dir(n_line_items, data_root))
+    frames = {"products": product_level_df, "orders": order_level_df}
+    chunked = lambda file, df, rows, fmt, columns: write_export(file, df, rows, fmt, columns, chunk_rows)
+    results = []
+    for frame, df in frames.items():
+        # All but the first row, as positions: a full range would let pandas skip the take altogether
+        rows = np.arange(1, len(df))
+        for fmt in EXPORT_FORMATS:
+            for columns in (None, SUBSETS[frame]):
+                for mode, export in (("chunked", chunked), ("full", _full_export)):
+                    runs = [_measure(export, df, rows, fmt, columns) for _ in range(repeat)]
+                    results.append({"frame": frame, "format": fmt, "columns": "subset" if columns else "all",
+                                    "mode": mode, "rows": len(df), **_best(runs)})
+    return {"line_items": n_line_items, "chunk_rows": chunk_rows, "exports": results}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark chunked CSV / Parquet export of the filtered data.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1e5, 1e6], help="Line item counts to benchmark")
+    parser.add_argument("--data-root", default="benchmarks/data", help="Cache folder for generated datasets")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per export; the fastest is reported")
+    parser.add_argument("--output", default="export.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for scale in args.scales:
+        run = benchmark_export(int(scale), args.data_root, args.repeat, args.chunk_rows)
+        runs.append(run)
+        print(f"{int(scale):>12,} line items")
+        for stats in run["exports"]:
+            print(f"  {stats['frame']:<8} {stats['format']:<7} {stats['columns']:<6} {stats['mode']:<7} "
+                  f"{stats['rows_per_s']:>12,} rows/s  {stats['mb_per_s']:>8.1f} MB/s  "
+                  f"heap peak {stats['peak_heap_mb']:>8.1f} MB  arrow peak {stats['arrow_pool_peak_mb']:>8.1f} MB")
+
+    with open(args.output, "w") as f:
+        json.dump({"runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/imports.py
+"""
+Cold-start import time of the entry points (app.py, api.py, report.py),
+measured with python -X importtime.
+
+    python -m benchmarks.imports --entries app.py api.py report.py --output imports.json
+
+Each entry point's top-level imports are read from its source (the entry
+point itself is not run) and imported in a fresh interpreter; the fastest of
+repeat runs is reported with the self time summed per top-level package and
+the cumulative time of each module the entry imports directly. The run fails
+when this repo's modules import a module in DEFERRED at startup (third-party
+packages importing it, as streamlit does plotly.graph_objects, are outside
+our control), or when an entry point's imports take longer than --budget-ms,
+so heavy imports do not creep back into worker spin-up.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+# Loaded on first use only: chart rendering, the optional SQL engine and dataset scanning
+DEFERRED = ("plotly.express", "plotly.graph_objects", "duckdb", "pyarrow.dataset")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def entry_imports(path: str) -> list[str]:
+    """Modules imported by the module-level import statements of a source file, in order."""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """The -X importtime lines as {module, depth, self_us, cumulative_us}, in import-completion order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                     "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    return rows
+
+
+def _importers(rows: list[dict], i: int) -> list[str]:
+    # -X importtime lists a module before the one that imported it: each shallower row that follows is an ancestor
+    chain, depth = [], rows[i]["depth"]
+    for row in rows[i + 1:]:
+        if row["depth"] < depth:
+            chain.append(row["module"])
+            depth = row["depth"]
+    return chain
+
+
+def _is_local(module: str) -> bool:
+    top = module.split(".")[0]
+    return os.path.exists(os.path.join(ROOT, f"{top}.py")) or os.path.isdir(os.path.join(ROOT, top))
+
+
+def _import_once(modules: list[str]) -> tuple[float, list[dict]]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, parse_importtime(result.stderr)
+
+
+def benchmark_imports(entry: str, repeat: int = 5, top: int = 15) -> dict:
+    modules = entry_imports(os.path.join(ROOT, entry))
+    # The first run also warms the bytecode and OS file caches
+    runs = [_import_once(modules) for _ in range(repeat + 1)][1:]
+    wall_s, rows = min(runs, key=lambda run: sum(row["self_us"] for row in run[1]))
+
+    packages = defaultdict(int)
+    for row in rows:
+        packages[row["module"].split(".")[0]] += row["self_us"]
+    cumulative = {row["module"]: row["cumulative_us"] for row in rows}
+    return {
+        "entry": entry,
+        "imports_ms": round(sum(row["self_us"] for row in rows) / 1e3, 1),
+        "interpreter_wall_s": round(wall_s, 3),
+        "modules": len(rows),
+        "packages_ms": {name: round(us / 1e3, 1)
+                        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]},
+        # Cumulative where the module was first imported, possibly under an earlier import
+        "direct_ms": {name: round(cumulative.get(name, 0) / 1e3, 1) for name in modules},
+        "deferred_imported": sorted(
+            row["module"] for i, row in enumerate(rows)
+            if any(row["module"] == name or row["module"].startswith(name + ".") for name in DEFERRED)
+            # Imported by the entry point itself (depth 0) or by one of this repo's modules
+            and (row["depth"] == 0 or any(_is_local(module) for module in _importers(rows, i)))
+        ),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measure entry-point import time with python -X importtime.")
+    parser.add_argument("--entries", nargs="+", default=["app.py", "api.py", "report.py"])
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreter runs per entry; the fastest is reported")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail when an entry's imports take longer")
+    parser.add_argument("--output", default="imports.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    runs, failures = [], []
+    for entry in args.entries:
+        run = benchmark_imports(entry, args.repeat)
+        runs.append(run)
+        print(f"{entry:<12} {run['imports_ms']:>8.1f} ms imports  {run['interpreter_wall_s']:>6.3f} s wall  "
+              f"{run['modules']} modules")
+        for name, ms in run["packages_ms"].items():
+            print(f"    {name:<28} {ms:>8.1f} ms")
+        if run["deferred_imported"]:
+            failures.append(f"{entry} imports {', '.join(run['deferred_imported'])} at startup")
+        if args.budget_ms is not None and run["imports_ms"] > args.budget_ms:
+            failures.append(f"{entry} imports take {run['imports_ms']} ms (budget {args.budget_ms} ms)")
+
+    with open(args.output, "w") as f:
+        json.dump({"runs": runs, "failures": failures}, f, indent=2)
+    if failures:
+        parser.exit(1, "\n".join(failures) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/rankings.py
+"""
+Time top-N product rankings: a full sort of the aggregated totals against
+partial selection (rankings.top_indices), and the latency of refreshing a
+rankings.TopK after appending a small batch of line items.
+
+    python -m benchmarks.rankings --products 1000 100000 --items 2000000 --output rankings.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from rankings import TopK, top_indices
+
+
+def _median_ms(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return round(float(np.median(timings)) * 1e3, 4)
+
+
+def benchmark_rankings(
+    n_products: int, n_items: int, top_n: int = 10, batch: int = 100, repeat: int = 50, seed: int = 0
+) -> dict:
+    rng = np.random.default_rng(seed)
+    titles = np.array([f"product_{i}" for i in range(n_products)], dtype=object)
+    # Zipf-distributed sales: a few best sellers and a long tail
+    keys = titles[(rng.zipf(1.3, n_items) - 1) % n_products]
+    values = rng.exponential(40.0, n_items)
+    totals = pd.Series(values).groupby(keys).sum()
+
+    top = TopK(top_n)
+    top.add(keys, values)
+
+    def append():
+        picked = rng.integers(0, n_products, batch)
+        top.add(titles[picked], rng.exponential(40.0, batch))
+
+    return {
+        "products": n_products,
+        "items": n_items,
+        "sort_ms": _median_ms(lambda: totals.sort_values(ascending=False).head(top_n), repeat),
+        "argpartition_ms": _median_ms(lambda: top_indices(totals.to_numpy(), top_n), repeat),
+        "topk_append_ms": _median_ms(append, repeat),
+        "append_batch": batch,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark full-sort vs partial top-N rankings.")
+    parser.add_argument("--products", nargs="+", type=lambda s: int(float(s)), default=[1_000, 100_000])
+    parser.add_argument("--items", type=lambda s: int(float(s)), default=1_000_000)
+    parser.add_argument("--batch", type=int, default=100, help="Line items per TopK append")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", default="rankings.json")
+    args = parser.parse_args(argv)
+
+    runs = [benchmark_rankings(n, args.items, batch=args.batch, repeat=args.repeat) for n in args.products]
+    for run in runs:
+        print(json.dumps(run))
+    with open(args.output, "w") as f:
+        json.dump(runs, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/run.py
+"""
+Time and memory-profile every stage of prepare_cleaned_datasets and every
+analysis metric at several data scales, and write a JSON report.
+
+    python -m benchmarks.run --scales 1e5 1e6 --output bench.json
+    python -m benchmarks.compare baseline.json bench.json
+
+Synthetic datasets are generated on first use and cached under --data-root.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+from dataclasses import asdict
+
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.synthetic import generate_dataset
+from instrumentation import StageRecorder
+from scheduler import METRICS, run_metrics
+from transform import prepare_cleaned_datasets
+
+
+def _best(runs: list[dict]) -> dict:
+    # Keep the fastest repetition; memory figures are the same across repetitions
+    return min(runs, key=lambda stats: stats["wall_s"])
+
+
+def _stats(recorder: StageRecorder) -> dict:
+    return {event.stage: {k: v for k, v in asdict(event).items() if k not in ("stage", "started_at")}
+            for event in recorder.events}
+
+
+def benchmark_pipeline(
+    data_dir: str, memory: bool = False, workers: int = 1, backend: str = "numpy"
+) -> tuple[dict, pd.DataFrame, pd.DataFrame]:
+    """Time each stage of prepare_cleaned_datasets in order."""
+    recorder = StageRecorder(track_memory=memory)
+    product_level_df, order_level_df = prepare_cleaned_datasets(data_dir, recorder=recorder, workers=workers,
+                                                                backend=backend)
+    return _stats(recorder), product_level_df, order_level_df
+
+
+def benchmark_metrics(product_level_df: pd.DataFrame, order_level_df: pd.DataFrame, memory: bool = False) -> dict:
+    """Time each analysis metric on the unfiltered frames."""
+    recorder = StageRecorder(track_memory=memory)
+    run_metrics(list(METRICS), order_level_df, product_level_df, executor="serial", recorder=recorder)
+    return _stats(recorder)
+
+
+def dataset_dir(n_line_items: int, data_root: str) -> str:
+    """Cached synthetic dataset for the scale, generated on first use."""
+    data_dir = os.path.join(data_root, f"{n_line_items:.0e}".replace("+0", "").replace("+", ""))
+    if not os.path.exists(os.path.join(data_dir, "orders.parquet")):
+        generate_dataset(data_dir, n_line_items)
+    return data_dir
+
+
+def run_scale(
+    n_line_items: int, data_root: str, repeat: int = 1, memory: bool = False, workers: int = 1, backend: str = "numpy"
+) -> dict:
+    data_dir = dataset_dir(n_line_items, data_root)
+
+    stage_runs, metric_runs = [], []
+    for _ in range(repeat):
+        stages, product_level_df, order_level_df = benchmark_pipeline(data_dir, memory, workers, backend)
+        stage_runs.append(stages)
+        metric_runs.append(benchmark_metrics(product_level_df, order_level_df, memory))
+
+    return {
+        "line_items": n_line_items,
+        "data_dir": data_dir,
+        "pipeline_workers": workers,
+        "backend": backend,
+        "product_rows": len(product_level_df),
+        "order_rows": len(order_level_df),
+        "stages": {name: _best([run[name] for run in stage_runs]) for name in stage_runs[0]},
+        "metrics": {name: _best([run[name] for run in metric_runs]) for name in metric_runs[0]},
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark transform.py and analysis.py on synthetic data.")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1e5, 1e6],
+                        help="Line item counts to benchmark (10^5 to 10^8)")
+    parser.add_argument("--data-root", default="benchmarks/data", help="Cache folder for generated datasets")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per scale; the fastest is reported")
+    parser.add_argument("--memory", action="store_true", help="Track peak memory per stage (slower)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for prepare_cleaned_datasets")
+    parser.add_argument("--backend", choices=["numpy", "arrow"], default="numpy", help="Column storage for the pipeline")
+    parser.add_argument("--output", default="bench.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created": pd.Timestamp.now(tz="UTC").isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "pyarrow": pa.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "runs": [],
+    }
+    for scale in args.scales:
+        run = run_scale(int(scale), args.data_root, args.repeat, args.memory, args.workers, args.backend)
+        report["runs"].append(run)
+        total = sum(stats["wall_s"] for stats in run["stages"].values())
+        print(f"{int(scale):>12,} line items: pipeline {total:.2f}s, "
+              f"metrics {sum(s['wall_s'] for s in run['metrics'].values()):.2f}s")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
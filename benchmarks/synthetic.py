@@ -0,0 +1,186 @@
+# benchmarks/synthetic.py
+"""
+Synthetic orders/products parquet files shaped like the production export.
+
+    python -m benchmarks.synthetic --line-items 1000000 --output benchmarks/data/1e6
+
+Orders are written in row groups so even 10^8 line items are generated in
+bounded memory. The data mimics the quirks transform.py has to deal with:
+Pareto-distributed customer frequency, comma-separated product_items,
+cancellations, discounts, encoding-corrupted and missing country names,
+order numbers reused across customers and exact duplicate rows.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+CATEGORIES = {
+    "golf": (["golf_set", "golf_balls", "glove", "caddy", "shoes"], 180.0),
+    "tennis": (["racket", "tennis_balls", "tennis_bag", "shoes"], 120.0),
+    "football": (["ball", "jersey", "boots", "goal"], 60.0),
+    "swimming": (["goggles", "swimsuit", "cap"], 35.0),
+    "accessoires": (["bottle", "towel", "socks", "cap"], 25.0),
+    "multi_sport_bundle": (["bundle"], 420.0),
+}
+
+# (country, weight). Germany dominates; the mojibake variants are what dimensions.normalize_country repairs.
+COUNTRIES = [
+    ("Germany", 0.93),
+    ("United Kingdom", 0.012),
+    ("Afghanistan", 0.01),
+    ("Austria", 0.008),
+    ("Switzerland", 0.007),
+    ("France", 0.006),
+    ("Côte d'Ivoire", 0.002),
+    ("C√¥te d'Ivoire", 0.002),
+    ("C√¥te d&#39;Ivoire", 0.002),
+    ("√Öland Islands", 0.001),
+    (None, 0.02),
+]
+
+CANCEL_REASONS = ["customer", "inventory", "fraud", "declined", "other"]
+
+START = pd.Timestamp("2019-12-03", tz="UTC")
+END = pd.Timestamp("2021-03-08", tz="UTC")
+
+
+def generate_products(n_products: int = 500, seed: int = 0) -> pd.DataFrame:
+    """Product catalog with log-normal prices per category and a few duplicate titles."""
+    rng = np.random.default_rng(seed)
+    categories = list(CATEGORIES)
+    category = rng.choice(categories, n_products, p=[0.45, 0.15, 0.1, 0.08, 0.14, 0.08])
+    product_type = np.array([rng.choice(CATEGORIES[c][0]) for c in category])
+    base_price = np.array([CATEGORIES[c][1] for c in category])
+    price = np.round(base_price * rng.lognormal(0, 0.4, n_products), 0) - 0.01
+    title = [f"{c.capitalize()}_{t}_{i}" for i, (c, t) in enumerate(zip(category, product_type))]
+
+    products = pd.DataFrame({
+        "product_type": product_type,
+        "product_price": price,
+        "product_category": category,
+        "product_title": title,
+    })
+    # The real catalog lists some titles twice
+    return pd.concat([products, products.sample(frac=0.05, random_state=seed)], ignore_index=True)
+
+
+def _orders_chunk(rng, first_customer: int, n_customers: int, first_order: int, titles, prices) -> pa.Table:
+    span = (END - START).total_seconds()
+
+    # Pareto customer frequency: most customers order once, a long tail orders often
+    frequency = np.minimum(1 + rng.pareto(1.8, n_customers).astype(np.int64), 60)
+    customer_id = np.repeat(np.arange(first_customer, first_customer + n_customers), frequency)
+    first_seconds = np.repeat(rng.random(n_customers) * span, frequency)
+
+    # Later orders follow the first one after exponential gaps
+    order_rank = np.arange(len(customer_id)) - np.repeat(np.cumsum(frequency) - frequency, frequency)
+    gaps = rng.exponential(45 * 86400, len(customer_id)) * (order_rank > 0)
+    gap_offset = pd.Series(gaps).groupby(customer_id).cumsum().to_numpy()
+    seconds = first_seconds + gap_offset
+    keep = seconds < span
+    customer_id, first_seconds, seconds = customer_id[keep], first_seconds[keep], seconds[keep]
+    n_orders = len(customer_id)
+
+    processed_at = START + pd.to_timedelta(seconds, unit="s")
+    first_date_order = START + pd.to_timedelta(first_seconds, unit="s")
+    created_at = processed_at - pd.to_timedelta(rng.integers(5, 600, n_orders), unit="s")
+
+    # Comma-separated product titles, ~1.6 items per order
+    n_items = 1 + rng.poisson(0.6, n_orders)
+    item_index = rng.integers(0, len(titles), n_items.sum())
+    offsets = np.concatenate([[0], np.cumsum(n_items)])
+    product_items = pc.binary_join(
+        pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), pa.array(titles[item_index])), ", "
+    )
+    subtotal = np.add.reduceat(prices[item_index], offsets[:-1])
+
+    discounted = rng.random(n_orders) < 0.08
+    total_discounts = np.where(discounted, np.round(subtotal * rng.uniform(0.05, 0.3, n_orders), 2), 0.0)
+
+    cancelled = rng.random(n_orders) < 0.05
+    cancelled_at = pd.Series(processed_at + pd.to_timedelta(rng.integers(1, 72, n_orders), unit="h")).where(cancelled)
+    cancel_reason = np.where(cancelled, rng.choice(CANCEL_REASONS, n_orders), None)
+
+    names, weights = zip(*COUNTRIES)
+    country = np.array(names, dtype=object)[rng.choice(len(names), n_orders, p=np.array(weights) / sum(weights))]
+
+    order_number = np.arange(first_order, first_order + n_orders)
+    # Order numbers reused by a different customer, and exact duplicate export rows
+    reused = rng.random(n_orders) < 0.002
+    order_number[reused] = rng.integers(first_order, first_order + n_orders, reused.sum())
+
+    chunk = pd.DataFrame({
+        "order_number": order_number,
+        "customer_id": customer_id,
+        "created_at": created_at,
+        "processed_at": processed_at,
+        "cancelled_at": cancelled_at,
+        "first_date_order": first_date_order,
+        "billing_address_country": country,
+        "billing_address_zip": rng.integers(10000, 99999, n_orders).astype(str),
+        "cancel_reason": cancel_reason,
+        "product_items": product_items.to_pandas(),
+        "subtotal_price": np.round(subtotal, 2),
+        "total_discounts": total_discounts,
+    })
+    duplicates = chunk.sample(frac=0.005, random_state=int(rng.integers(1 << 31)))
+    chunk = pd.concat([chunk, duplicates]).sort_values("processed_at", kind="stable")
+    return pa.Table.from_pandas(chunk, preserve_index=False)
+
+
+def generate_orders(path: str, products: pd.DataFrame, n_line_items: int,
+                    seed: int = 0, chunk_customers: int = 200_000) -> int:
+    """Write orders.parquet with roughly n_line_items line items. Returns the line items written."""
+    rng = np.random.default_rng(seed)
+    titles = products["product_title"].to_numpy(dtype=object)
+    prices = products["product_price"].to_numpy()
+
+    written = 0
+    first_customer, first_order = 10_000, 1_000
+    writer = None
+    try:
+        while written < n_line_items:
+            # ~2.3 line items per customer on average
+            remaining_customers = max(int((n_line_items - written) / 2.3), 1)
+            table = _orders_chunk(rng, first_customer, min(chunk_customers, remaining_customers),
+                                  first_order, titles, prices)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+
+            written += int(pc.sum(pc.list_value_length(pc.split_pattern(table["product_items"], ", "))).as_py())
+            first_customer += chunk_customers
+            first_order += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def generate_dataset(output_dir: str, n_line_items: int, n_products: int = 500, seed: int = 0) -> int:
+    """Write products.parquet and orders.parquet into output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    products = generate_products(n_products, seed)
+    products.to_parquet(os.path.join(output_dir, "products.parquet"), index=False)
+    return generate_orders(os.path.join(output_dir, "orders.parquet"), products, n_line_items, seed)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic orders/products parquet files.")
+    parser.add_argument("--line-items", type=float, default=1e5, help="Approximate number of line items")
+    parser.add_argument("--products", type=int, default=500, help="Catalog size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Output folder")
+    args = parser.parse_args(argv)
+
+    written = generate_dataset(args.output, int(args.line_items), args.products, args.seed)
+    print(f"Wrote {written} line items to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# cache.py
+"""
+LRU cache of metric results keyed by filter selection.
+
+One ResultCache per process is shared by everything computing metrics in
+it (dashboard sessions and the metrics API), so a selection computed for
+one caller is served from memory to the next. Cached results are shared
+objects: callers must not modify them.
+
+The API's encoded response bodies go to a BodyCache of their own, bounded
+by bytes rather than entries, so large JSON or Arrow bodies do not evict
+the metric results the dashboard reads.
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from config import API_BODY_CACHE_MB, RESULT_CACHE_SIZE
+from scheduler import resolve_metrics, run_metrics
+
+
+def _canonical(name: str, value):
+    if name == "date_range":
+        return tuple(str(pd.Timestamp(v).date()) for v in value)
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    # Selections are sets: order and duplicates do not change the result
+    return tuple(sorted({str(v) for v in value}))
+
+
+def selection_key(granularity: str = "month", variant: str | None = None, **filters) -> tuple:
+    """
+    Hashable key of a filter selection (filters.apply_filters keywords).
+    Empty selections are dropped, as they filter nothing; variant tells
+    apart results computed differently for the same selection (e.g.
+    "approximate" for the sketch-based counts).
+    """
+    selected = tuple(sorted((name, _canonical(name, value)) for name, value in filters.items()
+                            if value is not None and len(value)))
+    return granularity, variant, selected
+
+
+class ResultCache:
+    """Thread-safe LRU of metric results, keyed by (selection key, metric name)."""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+    def lookup(self, key: tuple, names) -> dict:
+        """Cached results for the given metrics and their dependencies."""
+        found = {}
+        for name in resolve_metrics(names):
+            result = self.get((key, name))
+            if result is not None:
+                found[name] = result
+        return found
+
+    def run_metrics(self, key: tuple, names, order_df: pd.DataFrame, product_df: pd.DataFrame, **kwargs) -> dict:
+        """scheduler.run_metrics on the filtered frames of selection key, computing only uncached metrics."""
+        cached = self.lookup(key, names)
+        precomputed = {**cached, **(kwargs.pop("precomputed", None) or {})}
+        results = run_metrics(names, order_df, product_df, precomputed=precomputed, **kwargs)
+        for name, result in results.items():
+            if name not in cached:
+                self.put((key, name), result)
+        return results
+
+
+class BodyCache:
+    """Thread-safe LRU of encoded response bodies, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int = API_BODY_CACHE_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, body: bytes) -> None:
+        # A body over an eighth of the budget is served uncached rather than flushing most of the others
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= len(self._entries.pop(key))
+            self._entries[key] = body
+            self.nbytes += len(body)
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= len(self._entries.popitem(last=False)[1])
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
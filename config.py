@@ -0,0 +1,48 @@
+# config.py
+import os
+
+# How the metrics of a page are computed on each rerun: "thread", "process" or "serial"
+METRIC_EXECUTOR = os.environ.get("FITLYTICS_METRIC_EXECUTOR", "thread")
+
+# Implementation of the analysis metrics: "pandas" (analysis.py) or "duckdb" (duckdb_engine.py, needs duckdb)
+ANALYSIS_ENGINE = os.environ.get("FITLYTICS_ANALYSIS_ENGINE", "pandas")
+
+# Worker count for the metric pool (None lets concurrent.futures decide)
+METRIC_WORKERS = int(os.environ.get("FITLYTICS_METRIC_WORKERS", "0")) or None
+
+# Folder holding orders.parquet and products.parquet
+DATA_DIR = os.environ.get("FITLYTICS_DATA_DIR", "data")
+
+# Folder for the processed_at-sorted, memory-mapped copy of the cleaned frames; empty disables it
+STORE_DIR = os.environ.get("FITLYTICS_STORE_DIR", "store")
+
+# Processes used by prepare_cleaned_datasets; above 1 the orders are hash-partitioned across a pool
+PIPELINE_WORKERS = int(os.environ.get("FITLYTICS_PIPELINE_WORKERS", "1"))
+
+# Column storage for the transform pipeline: "numpy" (object strings) or "arrow" (ArrowDtype + pyarrow.compute)
+BACKEND = os.environ.get("FITLYTICS_BACKEND", "numpy")
+
+# Default for the "Profile this rerun" toggle in the dashboard sidebar
+PROFILE_RERUNS = os.environ.get("FITLYTICS_PROFILE", "") == "1"
+
+# Where cProfile dumps of profiled reruns are written
+PROFILE_DIR = os.environ.get("FITLYTICS_PROFILE_DIR", "profiles")
+
+# Metric results kept per process by the LRU result cache shared by dashboard sessions and the API
+RESULT_CACHE_SIZE = int(os.environ.get("FITLYTICS_RESULT_CACHE_SIZE", "256"))
+
+# Port of the read-only metrics API started inside the dashboard process; 0 leaves it off (see api.py)
+API_PORT = int(os.environ.get("FITLYTICS_API_PORT", "0"))
+
+# Size bound of the API's LRU of encoded response bodies (kept apart from the metric results)
+API_BODY_CACHE_MB = int(os.environ.get("FITLYTICS_API_BODY_CACHE_MB", "64"))
+
+# Threads computing API metrics; the event loop itself only parses requests and writes responses
+API_WORKERS = int(os.environ.get("FITLYTICS_API_WORKERS", "4"))
+
+# Most rows the dashboard's download button exports: Streamlit holds the whole file in memory before sending it,
+# larger selections stream from the API's /export instead
+EXPORT_MAX_ROWS = int(os.environ.get("FITLYTICS_EXPORT_MAX_ROWS", "1000000"))
+
+# Width in pixels the time-series charts are downsampled for (about two points per pixel, see downsample.py)
+CHART_WIDTH_PX = int(os.environ.get("FITLYTICS_CHART_WIDTH", "1200"))
@@ -0,0 +1,120 @@
+# customers.py
+"""
+Per-customer index behind the dashboard's customer drill-down.
+
+Built once per dataset: the rows of each cleaned frame are sorted by
+(customer_id, processed_at) and the sort is kept as a permutation of row
+positions, with each customer's start and end offset into it. A customer's
+orders and line items are then one contiguous run of the permutation, found
+by a binary search over the customer ids instead of an isin scan of the
+frame. Per-customer figures (lifetime revenue, cohort, days to the second
+order, RFM scores among all customers) are computed in the same pass and
+read by position.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis import score_rfm
+
+ORDER_HISTORY_COLUMNS = [
+    'order_number', 'processed_at', 'billing_address_country', 'order_status',
+    'gross_revenue', 'total_discounts', 'net_revenue',
+]
+LINE_ITEM_COLUMNS = [
+    'order_number', 'processed_at', 'product_title', 'product_category',
+    'product_price', 'discount_allocated', 'net_price',
+]
+
+
+def _customer_sort(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    # Positions of the rows with a customer, by customer and then date (missing dates last, as sort_values does)
+    customer = df['customer_id'].to_numpy()
+    valid = np.flatnonzero(pd.notna(customer))
+    timestamps = df['processed_at'].to_numpy(dtype='datetime64[ns]').view(np.int64)[valid]
+    timestamps = np.where(timestamps == np.iinfo(np.int64).min, np.iinfo(np.int64).max, timestamps)
+    positions = valid[np.lexsort((timestamps, customer[valid]))]
+    return positions, customer[positions]
+
+
+def _summary(order_level_df: pd.DataFrame, positions: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> pd.DataFrame:
+    # Recency, Frequency and Monetary as perform_rfm_segmentation aggregates them, scored against every customer
+    snapshot_date = order_level_df['processed_at'].max() + pd.Timedelta(days=1)
+    rfm = order_level_df.groupby('customer_id').agg(
+        Recency=('processed_at', 'max'), Frequency=('customer_id', 'count'), Monetary=('net_revenue', 'sum'),
+    ).reset_index()
+    rfm['Recency'] = (snapshot_date - rfm['Recency']).dt.days
+    rfm = score_rfm(rfm)
+
+    processed_at = order_level_df['processed_at']
+    first = processed_at.iloc[positions[starts]].reset_index(drop=True)
+    # Second order of customers with two or more; a missing date sorts last, so it only comes second when the rest do
+    has_second = ends - starts > 1
+    second = processed_at.iloc[positions[np.where(has_second, starts + 1, starts)]].reset_index(drop=True)
+    second = second.where(has_second)
+    cohort = (order_level_df['cohort_month'].iloc[positions[starts]].reset_index(drop=True)
+              if 'cohort_month' in order_level_df.columns else first.dt.tz_localize(None).dt.to_period('M'))
+
+    # Frequency and Monetary are the order count and lifetime revenue; scores fit in int8, segments in a category
+    return pd.DataFrame({
+        'customer_id': rfm['customer_id'],
+        'orders': rfm['Frequency'],
+        'lifetime_revenue': rfm['Monetary'],
+        'first_order_at': first,
+        'cohort_month': cohort,
+        'days_to_second_order': (second - first).dt.days,
+        'Recency': rfm['Recency'],
+        **{score: rfm[score].astype(np.int8) for score in ('R_Score', 'F_Score', 'M_Score', 'RFM_Score')},
+        'Segment': rfm['Segment'].astype('category'),
+    })
+
+
+class CustomerIndex:
+    """Each customer's order and line-item rows as offsets into a (customer_id, processed_at) sort of the frames."""
+
+    def __init__(self, product_level_df: pd.DataFrame, order_level_df: pd.DataFrame):
+        self.product_level_df = product_level_df
+        self.order_level_df = order_level_df
+        self.order_positions, order_keys = _customer_sort(order_level_df)
+        # The keys are sorted: each customer's run starts where the key changes
+        self.order_starts = np.flatnonzero(np.r_[True, order_keys[1:] != order_keys[:-1]]) if len(order_keys) \
+            else np.empty(0, dtype=np.int64)
+        self.order_ends = np.r_[self.order_starts[1:], len(order_keys)]
+        self.ids = order_keys[self.order_starts]
+        self.product_positions, product_keys = _customer_sort(product_level_df)
+        self.product_starts = np.searchsorted(product_keys, self.ids, side="left")
+        self.product_ends = np.searchsorted(product_keys, self.ids, side="right")
+        self.summary = _summary(order_level_df, self.order_positions, self.order_starts, self.order_ends)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.ids, self.order_positions, self.order_starts, self.order_ends,
+                  self.product_positions, self.product_starts, self.product_ends)
+        return int(sum(array.nbytes for array in arrays) + self.summary.memory_usage(deep=True).sum())
+
+    def _find(self, customers) -> np.ndarray:
+        # Index positions of the known customers among the given ids
+        customers = np.asarray(customers, dtype=self.ids.dtype)
+        found = np.minimum(np.searchsorted(self.ids, customers), len(self.ids) - 1)
+        return found[self.ids[found] == customers] if len(self.ids) else found[:0]
+
+    def order_rows(self, customers) -> np.ndarray:
+        """Ascending order-frame positions of the customers' orders; unknown ids select nothing."""
+        runs = [self.order_positions[self.order_starts[i]:self.order_ends[i]] for i in self._find(customers)]
+        return np.sort(np.concatenate(runs)) if runs else np.empty(0, dtype=np.int64)
+
+    def orders(self, customer_id) -> pd.DataFrame:
+        """The customer's order history, oldest first."""
+        i = self._find([customer_id])
+        rows = self.order_positions[self.order_starts[i[0]]:self.order_ends[i[0]]] if len(i) else []
+        return self.order_level_df.iloc[rows][ORDER_HISTORY_COLUMNS]
+
+    def line_items(self, customer_id) -> pd.DataFrame:
+        """The customer's line items, oldest order first."""
+        i = self._find([customer_id])
+        rows = self.product_positions[self.product_starts[i[0]]:self.product_ends[i[0]]] if len(i) else []
+        return self.product_level_df.iloc[rows][LINE_ITEM_COLUMNS]
+
+    def profile(self, customer_id) -> pd.Series | None:
+        """Orders, lifetime revenue, first order and cohort, days to the second order and RFM scores."""
+        i = self._find([customer_id])
+        return self.summary.iloc[i[0]] if len(i) else None
@@ -0,0 +1,98 @@
+# datastore.py
+"""
+Process-wide, immutable handle on the cleaned datasets, shared by every
+dashboard session.
+
+A session keeps only its filter selection and the row positions it selects
+(filters.filter_rows: a slice for a date range on the sorted store, an
+array of positions otherwise). The filtered frames are built from the
+shared frames for the rerun that needs them and dropped afterwards, so
+they are never held per session; with copy-on-write, nothing a session
+does to them reaches the shared frames.
+
+Memory is reported once for the shared frames and per session for its
+row positions and filtered frames, so a host needs roughly
+shared + sessions x per-session.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from customers import CustomerIndex
+from filters import filter_rows, take_rows
+from instrumentation import StageRecorder
+from lazycolumns import LazyColumns
+
+# Sessions not seen for this long are left out of the memory report
+SESSION_TTL_S = 15 * 60
+
+
+def rows_nbytes(rows: slice | np.ndarray) -> int:
+    return rows.nbytes if isinstance(rows, np.ndarray) else 0
+
+
+def frame_nbytes(df: pd.DataFrame, rows: slice | np.ndarray) -> int:
+    """Bytes a filtered frame holds of its own: none for a slice, which is a view of the shared frame."""
+    if isinstance(rows, slice):
+        return 0
+    return int(df.memory_usage(index=True).sum())
+
+
+class SharedDataset:
+    """The cleaned (product_level_df, order_level_df), loaded once per process and never modified."""
+
+    def __init__(
+        self,
+        product_level_df: pd.DataFrame,
+        order_level_df: pd.DataFrame,
+        version=None,
+        recorder: StageRecorder | None = None,
+        cold: LazyColumns | None = None,
+    ):
+        self.product_level_df = product_level_df
+        self.order_level_df = order_level_df
+        self.version = version
+        # Order columns outside the frames, loaded when first asked for (with_columns)
+        self.cold = cold
+        # Stage events of the load, for the performance panel
+        self.recorder = recorder if recorder is not None else StageRecorder()
+        # Each customer's rows as offsets into a customer sort, for the customer filter and drill-down
+        self.customers = self.recorder.run("customer_index", CustomerIndex, product_level_df, order_level_df)
+        self.nbytes = int(product_level_df.memory_usage(deep=True).sum() + order_level_df.memory_usage(deep=True).sum())
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def select(self, **filters) -> tuple[slice | np.ndarray, slice | np.ndarray]:
+        """Row positions of (products, orders) for the sidebar filters (filters.apply_filters keywords)."""
+        return filter_rows(self.product_level_df, self.order_level_df, customer_index=self.customers, **filters)
+
+    def take(self, product_rows, order_rows) -> tuple[pd.DataFrame, pd.DataFrame]:
+        return take_rows(self.product_level_df, product_rows), take_rows(self.order_level_df, order_rows)
+
+    def with_columns(self, df: pd.DataFrame, columns=None) -> pd.DataFrame:
+        """df (a shared or filtered frame) with any cold columns among columns attached."""
+        if self.cold is None:
+            return df
+        return self.cold.attach(df, [c for c in (columns or []) if c in self.cold.names])
+
+    def record_session(self, session_id: str, nbytes: int) -> None:
+        with self._lock:
+            self._sessions[session_id] = (nbytes, time.time())
+
+    def memory_report(self) -> pd.DataFrame:
+        """Bytes held by the shared frames and by each session seen within SESSION_TTL_S."""
+        cutoff = time.time() - SESSION_TTL_S
+        with self._lock:
+            sessions = {sid: nbytes for sid, (nbytes, seen) in self._sessions.items() if seen >= cutoff}
+            self._sessions = {sid: entry for sid, entry in self._sessions.items() if entry[1] >= cutoff}
+        report = pd.DataFrame(
+            [("shared", "dataset", self.nbytes)]
+            + [("shared", "customer index", self.customers.nbytes)]
+            + ([("shared", "cold columns", self.cold.nbytes)] if self.cold is not None else [])
+            + [("session", sid, nbytes) for sid, nbytes in sessions.items()],
+            columns=["scope", "id", "bytes"],
+        )
+        report["mb"] = (report["bytes"] / 2**20).round(3)
+        return report
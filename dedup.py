@@ -0,0 +1,109 @@
+# dedup.py
+"""
+Hash-partitioned deduplication of orders.
+
+All rows sharing an order_number land in the same partition, so both checks
+of transform.deduplicate_orders (order numbers reused across customers, exact
+(customer_id, order_number) duplicates) are partition-local. Partitions are
+deduplicated independently, in parallel, and the surviving rows are put back
+in their original order, which gives the same result as the single-frame
+function.
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from transform import deduplicate_orders, partition_ids
+
+DEFAULT_PARTITIONS = 16
+KEY_COLUMNS = ['order_number', 'customer_id']
+
+
+def _map(func, items, workers: int | None):
+    if workers == 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+def _dedup_partition(part: pd.DataFrame) -> pd.DataFrame:
+    # Rows arrive in their original order, so "first occurrence" means the same as globally
+    return deduplicate_orders(part)
+
+
+def deduplicate_orders_partitioned(
+    orders: pd.DataFrame, n_partitions: int = DEFAULT_PARTITIONS, workers: int | None = None
+) -> pd.DataFrame:
+    """Same result as transform.deduplicate_orders, computed per hash partition across processes."""
+    orders = orders.reset_index(drop=True)
+    orders['_row'] = np.arange(len(orders))
+    partition = partition_ids(orders['order_number'], n_partitions)
+    parts = [part for _, part in orders.groupby(partition, sort=False)]
+
+    deduped = pd.concat(_map(_dedup_partition, parts, workers), ignore_index=True)
+    deduped = deduped.sort_values('_row', kind='stable').drop(columns='_row')
+    return deduped.reset_index(drop=True)
+
+
+def spill_partitions(
+    orders_path: str,
+    spill_dir: str,
+    columns: list[str] | None = None,
+    n_partitions: int = DEFAULT_PARTITIONS,
+    batch_size: int = 500_000,
+) -> list[str]:
+    """
+    Stream orders.parquet in record batches and append each row, tagged with
+    its global position in '_row', to the spill file of its partition.
+    Returns the spill file paths (partitions that got no rows are skipped).
+    """
+    writers = {}
+    offset = 0
+    try:
+        for batch in pq.ParquetFile(orders_path).iter_batches(batch_size, columns=columns):
+            batch = batch.append_column('_row', pa.array(np.arange(offset, offset + batch.num_rows)))
+            offset += batch.num_rows
+            partition = partition_ids(batch.column('order_number').to_numpy(zero_copy_only=False), n_partitions)
+            for pid in np.unique(partition):
+                rows = batch.filter(pa.array(partition == pid))
+                if pid not in writers:
+                    writers[pid] = pq.ParquetWriter(os.path.join(spill_dir, f"part-{pid:04d}.parquet"), rows.schema)
+                writers[pid].write_batch(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return [writer.where for _, writer in sorted(writers.items())]
+
+
+def _dedup_spill_file(path: str) -> pd.DataFrame:
+    return _dedup_partition(pd.read_parquet(path))
+
+
+def deduplicate_order_file(
+    orders_path: str,
+    columns: list[str] | None = None,
+    n_partitions: int = DEFAULT_PARTITIONS,
+    workers: int | None = None,
+    batch_size: int = 500_000,
+    spill_dir: str | None = None,
+) -> pd.DataFrame:
+    """
+    Deduplicate orders.parquet without loading it whole: rows are spilled to
+    hash partitions on disk, and only one partition per worker is in memory
+    at a time. Returns the kept rows (restricted to columns, plus their
+    original position in '_row'), in original order.
+    """
+    columns = None if columns is None else list(dict.fromkeys(KEY_COLUMNS + list(columns)))
+    with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+        paths = spill_partitions(orders_path, tmp, columns, n_partitions, batch_size)
+        parts = _map(_dedup_spill_file, paths, workers)
+
+    if not parts:
+        return pd.DataFrame(columns=(columns or []) + ['_row'])
+    kept = pd.concat(parts, ignore_index=True)
+    return kept.sort_values('_row', kind='stable').reset_index(drop=True)
@@ -0,0 +1,387 @@
+# dimensions.py
+"""
+Country and product dimensions with integer keys.
+
+Country dimension: normalized country names, ISO 3166-1 alpha-3 codes and
+integer keys.
+
+Country names are repaired once per distinct value (HTML entities and UTF-8
+text that was decoded with the wrong code page, e.g. "C√¥te d'Ivoire"), not
+once per row. The cleaned frames then hold billing_address_country as a
+pandas Categorical shared by both frames: the codes are the integer country
+keys and the sorted categories are the dimension, so per-country
+aggregations are a bincount over keys.
+
+Product dimension: product_title, product_category and product_type are
+encoded the same way, with the catalog in products.parquet as the
+categories, so product_id, category_id and type_id are the codes and
+groupbys over products hash integers instead of long titles.
+"""
+import html
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+UNKNOWN = "Unknown"
+
+# Code pages that UTF-8 text is commonly mis-decoded with (cp1252 gives "Ã´" for "ô", Mac Roman "√¥").
+# Mac Roman comes last: cp1252 mojibake such as "Ã©" also round-trips through it, into a combining mark.
+_MOJIBAKE_ENCODINGS = ("cp1252", "latin-1", "mac_roman")
+
+# Country names as they appear in billing addresses -> ISO 3166-1 alpha-3
+ISO3 = {
+    "Afghanistan": "AFG",
+    "Åland Islands": "ALA",
+    "Albania": "ALB",
+    "Algeria": "DZA",
+    "American Samoa": "ASM",
+    "Andorra": "AND",
+    "Angola": "AGO",
+    "Anguilla": "AIA",
+    "Antarctica": "ATA",
+    "Antigua & Barbuda": "ATG",
+    "Argentina": "ARG",
+    "Armenia": "ARM",
+    "Aruba": "ABW",
+    "Australia": "AUS",
+    "Austria": "AUT",
+    "Azerbaijan": "AZE",
+    "Bahamas": "BHS",
+    "Bahrain": "BHR",
+    "Bangladesh": "BGD",
+    "Barbados": "BRB",
+    "Belarus": "BLR",
+    "Belgium": "BEL",
+    "Belize": "BLZ",
+    "Benin": "BEN",
+    "Bermuda": "BMU",
+    "Bhutan": "BTN",
+    "Bolivia": "BOL",
+    "Bosnia & Herzegovina": "BIH",
+    "Botswana": "BWA",
+    "Bouvet Island": "BVT",
+    "Brazil": "BRA",
+    "British Indian Ocean Territory": "IOT",
+    "British Virgin Islands": "VGB",
+    "Brunei": "BRN",
+    "Bulgaria": "BGR",
+    "Burkina Faso": "BFA",
+    "Burundi": "BDI",
+    "Cambodia": "KHM",
+    "Cameroon": "CMR",
+    "Canada": "CAN",
+    "Cape Verde": "CPV",
+    "Caribbean Netherlands": "BES",
+    "Cayman Islands": "CYM",
+    "Central African Republic": "CAF",
+    "Chad": "TCD",
+    "Chile": "CHL",
+    "China": "CHN",
+    "Christmas Island": "CXR",
+    "Cocos (Keeling) Islands": "CCK",
+    "Colombia": "COL",
+    "Comoros": "COM",
+    "Congo - Brazzaville": "COG",
+    "Congo - Kinshasa": "COD",
+    "Cook Islands": "COK",
+    "Costa Rica": "CRI",
+    "Côte d'Ivoire": "CIV",
+    "Croatia": "HRV",
+    "Cuba": "CUB",
+    "Curaçao": "CUW",
+    "Cyprus": "CYP",
+    "Czechia": "CZE",
+    "Denmark": "DNK",
+    "Djibouti": "DJI",
+    "Dominica": "DMA",
+    "Dominican Republic": "DOM",
+    "Ecuador": "ECU",
+    "Egypt": "EGY",
+    "El Salvador": "SLV",
+    "Equatorial Guinea": "GNQ",
+    "Eritrea": "ERI",
+    "Estonia": "EST",
+    "Eswatini": "SWZ",
+    "Ethiopia": "ETH",
+    "Falkland Islands": "FLK",
+    "Faroe Islands": "FRO",
+    "Fiji": "FJI",
+    "Finland": "FIN",
+    "France": "FRA",
+    "French Guiana": "GUF",
+    "French Polynesia": "PYF",
+    "French Southern Territories": "ATF",
+    "Gabon": "GAB",
+    "Gambia": "GMB",
+    "Georgia": "GEO",
+    "Germany": "DEU",
+    "Ghana": "GHA",
+    "Gibraltar": "GIB",
+    "Greece": "GRC",
+    "Greenland": "GRL",
+    "Grenada": "GRD",
+    "Guadeloupe": "GLP",
+    "Guam": "GUM",
+    "Guatemala": "GTM",
+    "Guernsey": "GGY",
+    "Guinea": "GIN",
+    "Guinea-Bissau": "GNB",
+    "Guyana": "GUY",
+    "Haiti": "HTI",
+    "Heard & McDonald Islands": "HMD",
+    "Honduras": "HND",
+    "Hong Kong SAR": "HKG",
+    "Hungary": "HUN",
+    "Iceland": "ISL",
+    "India": "IND",
+    "Indonesia": "IDN",
+    "Iran": "IRN",
+    "Iraq": "IRQ",
+    "Ireland": "IRL",
+    "Isle of Man": "IMN",
+    "Israel": "ISR",
+    "Italy": "ITA",
+    "Jamaica": "JAM",
+    "Japan": "JPN",
+    "Jersey": "JEY",
+    "Jordan": "JOR",
+    "Kazakhstan": "KAZ",
+    "Kenya": "KEN",
+    "Kiribati": "KIR",
+    "Kosovo": "XKX",
+    "Kuwait": "KWT",
+    "Kyrgyzstan": "KGZ",
+    "Laos": "LAO",
+    "Latvia": "LVA",
+    "Lebanon": "LBN",
+    "Lesotho": "LSO",
+    "Liberia": "LBR",
+    "Libya": "LBY",
+    "Liechtenstein": "LIE",
+    "Lithuania": "LTU",
+    "Luxembourg": "LUX",
+    "Macao SAR": "MAC",
+    "Madagascar": "MDG",
+    "Malawi": "MWI",
+    "Malaysia": "MYS",
+    "Maldives": "MDV",
+    "Mali": "MLI",
+    "Malta": "MLT",
+    "Marshall Islands": "MHL",
+    "Martinique": "MTQ",
+    "Mauritania": "MRT",
+    "Mauritius": "MUS",
+    "Mayotte": "MYT",
+    "Mexico": "MEX",
+    "Micronesia": "FSM",
+    "Moldova": "MDA",
+    "Monaco": "MCO",
+    "Mongolia": "MNG",
+    "Montenegro": "MNE",
+    "Montserrat": "MSR",
+    "Morocco": "MAR",
+    "Mozambique": "MOZ",
+    "Myanmar (Burma)": "MMR",
+    "Namibia": "NAM",
+    "Nauru": "NRU",
+    "Nepal": "NPL",
+    "Netherlands": "NLD",
+    "New Caledonia": "NCL",
+    "New Zealand": "NZL",
+    "Nicaragua": "NIC",
+    "Niger": "NER",
+    "Nigeria": "NGA",
+    "Niue": "NIU",
+    "Norfolk Island": "NFK",
+    "North Korea": "PRK",
+    "North Macedonia": "MKD",
+    "Northern Mariana Islands": "MNP",
+    "Norway": "NOR",
+    "Oman": "OMN",
+    "Pakistan": "PAK",
+    "Palau": "PLW",
+    "Palestinian Territories": "PSE",
+    "Panama": "PAN",
+    "Papua New Guinea": "PNG",
+    "Paraguay": "PRY",
+    "Peru": "PER",
+    "Philippines": "PHL",
+    "Pitcairn Islands": "PCN",
+    "Poland": "POL",
+    "Portugal": "PRT",
+    "Puerto Rico": "PRI",
+    "Qatar": "QAT",
+    "Réunion": "REU",
+    "Romania": "ROU",
+    "Russia": "RUS",
+    "Rwanda": "RWA",
+    "Samoa": "WSM",
+    "San Marino": "SMR",
+    "São Tomé & Príncipe": "STP",
+    "Saudi Arabia": "SAU",
+    "Senegal": "SEN",
+    "Serbia": "SRB",
+    "Seychelles": "SYC",
+    "Sierra Leone": "SLE",
+    "Singapore": "SGP",
+    "Sint Maarten": "SXM",
+    "Slovakia": "SVK",
+    "Slovenia": "SVN",
+    "Solomon Islands": "SLB",
+    "Somalia": "SOM",
+    "South Africa": "ZAF",
+    "South Georgia & South Sandwich Islands": "SGS",
+    "South Korea": "KOR",
+    "South Sudan": "SSD",
+    "Spain": "ESP",
+    "Sri Lanka": "LKA",
+    "St. Barthélemy": "BLM",
+    "St. Helena": "SHN",
+    "St. Kitts & Nevis": "KNA",
+    "St. Lucia": "LCA",
+    "St. Martin": "MAF",
+    "St. Pierre & Miquelon": "SPM",
+    "St. Vincent & Grenadines": "VCT",
+    "Sudan": "SDN",
+    "Suriname": "SUR",
+    "Svalbard & Jan Mayen": "SJM",
+    "Sweden": "SWE",
+    "Switzerland": "CHE",
+    "Syria": "SYR",
+    "Taiwan": "TWN",
+    "Tajikistan": "TJK",
+    "Tanzania": "TZA",
+    "Thailand": "THA",
+    "Timor-Leste": "TLS",
+    "Togo": "TGO",
+    "Tokelau": "TKL",
+    "Tonga": "TON",
+    "Trinidad & Tobago": "TTO",
+    "Tunisia": "TUN",
+    "Türkiye": "TUR",
+    "Turkmenistan": "TKM",
+    "Turks & Caicos Islands": "TCA",
+    "Tuvalu": "TUV",
+    "U.S. Outlying Islands": "UMI",
+    "U.S. Virgin Islands": "VIR",
+    "Uganda": "UGA",
+    "Ukraine": "UKR",
+    "United Arab Emirates": "ARE",
+    "United Kingdom": "GBR",
+    "United States": "USA",
+    "Uruguay": "URY",
+    "Uzbekistan": "UZB",
+    "Vanuatu": "VUT",
+    "Vatican City": "VAT",
+    "Venezuela": "VEN",
+    "Vietnam": "VNM",
+    "Wallis & Futuna": "WLF",
+    "Western Sahara": "ESH",
+    "Yemen": "YEM",
+    "Zambia": "ZMB",
+    "Zimbabwe": "ZWE",
+}
+
+# Other spellings seen in address data
+ISO3.update({
+    "Czech Republic": "CZE",
+    "Hong Kong": "HKG",
+    "Ivory Coast": "CIV",
+    "Macau": "MAC",
+    "Macedonia": "MKD",
+    "Myanmar": "MMR",
+    "Swaziland": "SWZ",
+    "Turkey": "TUR",
+    "UK": "GBR",
+    "USA": "USA",
+    "United States of America": "USA",
+})
+
+
+def repair_encoding(name: str, known=()) -> str:
+    """
+    Undo HTML escaping and UTF-8 text that was decoded with a single-byte
+    code page. Of the candidate repairs, a name in known wins.
+    """
+    name = html.unescape(name).strip()
+    if name.isascii():
+        return name
+    candidates = []
+    for encoding in _MOJIBAKE_ENCODINGS:
+        try:
+            repaired = name.encode(encoding).decode("utf-8")
+        except UnicodeError:
+            continue
+        # Correctly decoded text almost never re-encodes to valid UTF-8, so a round trip is a candidate repair,
+        # unless it decoded into combining marks: the bytes were mojibake from another code page
+        if repaired != name and not any(unicodedata.category(char) == "Mn" for char in repaired):
+            candidates.append(repaired)
+    return next((repaired for repaired in candidates if repaired in known), candidates[0] if candidates else name)
+
+
+def normalize_country(name) -> str:
+    if name is None or name is pd.NA or (isinstance(name, float) and np.isnan(name)):
+        return UNKNOWN
+    # Typographic apostrophes as in "Côte d’Ivoire"
+    return repair_encoding(str(name), known=ISO3).replace("\u2019", "'")
+
+
+def normalize_countries(countries: pd.Series) -> pd.Series:
+    """Repaired country names, with missing values as "Unknown"; each distinct value is repaired once."""
+    codes, uniques = pd.factorize(countries)
+    # Code -1 (missing) picks the trailing "Unknown"
+    names = np.array([normalize_country(name) for name in uniques] + [UNKNOWN], dtype=object)
+    return pd.Series(names[codes], index=countries.index, dtype=countries.dtype, name=countries.name)
+
+
+def encode_countries(*frames: pd.DataFrame, column: str = "billing_address_country") -> None:
+    """Give column one shared, sorted Categorical dtype across frames, in place."""
+    names = pd.Index(pd.concat([pd.Series(df[column].unique(), dtype=object) for df in frames]).dropna().unique())
+    dtype = pd.CategoricalDtype(names.sort_values())
+    for df in frames:
+        df[column] = df[column].astype(object).astype(dtype)
+
+
+def iso3_codes(names) -> list:
+    """ISO-3 code per country name; None for names with no code, such as "Unknown"."""
+    return [ISO3.get(name) for name in names]
+
+
+def country_dimension(country: pd.Series) -> pd.DataFrame:
+    """(country_key, country, iso3) for the Categorical country column of a cleaned frame."""
+    categories = country.cat.categories
+    return pd.DataFrame({
+        "country_key": np.arange(len(categories)),
+        "country": categories.astype(str),
+        "iso3": iso3_codes(categories),
+    })
+
+
+PRODUCT_KEYS = {"product_title": "product_id", "product_category": "category_id", "product_type": "type_id"}
+
+
+def encode_products(product_level_df: pd.DataFrame, products: pd.DataFrame | None = None) -> None:
+    """
+    Encode the product columns of product_level_df as sorted Categoricals, in
+    place. The categories are the names in products (the cleaned catalog)
+    plus any that only occur in the orders, e.g. titles missing from the
+    catalog.
+    """
+    for column in PRODUCT_KEYS:
+        names = pd.Series(product_level_df[column].unique(), dtype=object)
+        if products is not None:
+            names = pd.concat([pd.Series(products[column].unique(), dtype=object), names])
+        dtype = pd.CategoricalDtype(pd.Index(names.dropna().unique()).sort_values())
+        product_level_df[column] = product_level_df[column].astype(object).astype(dtype)
+
+
+def product_dimension(product_level_df: pd.DataFrame) -> pd.DataFrame:
+    """(product_id, product_title, category_id, product_category, type_id, product_type) per sold product."""
+    keys = pd.DataFrame({key: product_level_df[column].cat.codes for column, key in PRODUCT_KEYS.items()})
+    dimension = keys[keys["product_id"] >= 0].drop_duplicates("product_id").sort_values("product_id")
+    for column, key in PRODUCT_KEYS.items():
+        # Code -1 (missing) picks the trailing None
+        names = np.append(product_level_df[column].cat.categories.to_numpy(object), None)
+        dimension.insert(dimension.columns.get_loc(key) + 1, column, names[dimension[key].to_numpy()])
+    return dimension.reset_index(drop=True)
@@ -0,0 +1,110 @@
+# downsample.py
+"""
+Point budgets and downsampling for the time-series charts.
+
+A chart never needs more than about two points per horizontal pixel, so
+series longer than that are reduced with Largest-Triangle-Three-Buckets
+(LTTB): the first and last points are kept and each bucket in between
+keeps the point that spans the largest triangle with its neighbours, which
+preserves peaks, dips and the overall shape. Traces above WEBGL_POINTS
+render with WebGL (Scattergl) instead of SVG.
+"""
+import numpy as np
+import pandas as pd
+
+from config import CHART_WIDTH_PX
+
+POINTS_PER_PX = 2
+# Points in a figure above which line traces switch to WebGL
+WEBGL_POINTS = 1_000
+
+
+def max_points(width_px: int = CHART_WIDTH_PX) -> int:
+    """Point budget of a chart width_px wide."""
+    return POINTS_PER_PX * width_px
+
+
+def render_mode(n_points: int) -> str:
+    """plotly.express render_mode for a figure with n_points points."""
+    return "webgl" if n_points > WEBGL_POINTS else "svg"
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Positions of the n_out points LTTB keeps of the series (x ascending)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    # n_out - 2 buckets over the points between the first and the last, edges in exact integer arithmetic
+    edges = 1 + np.arange(n_out - 1, dtype=np.int64) * (n - 2) // (n_out - 2)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        # Twice the triangle area between the last kept point, each candidate and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def numeric_x(values) -> np.ndarray:
+    """
+    Sorted distinct x values as float positions that keep their spacing:
+    numbers as they are, timestamps, periods and date labels ("2020-01",
+    "2020-01-06/2020-01-12") as nanoseconds of their start. Other labels
+    have no spacing and are numbered in order.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_bool_dtype(values.dtype) or not len(values):
+        return np.arange(len(values), dtype=float)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.to_numpy(dtype=float)
+    if isinstance(values.dtype, pd.PeriodDtype) or isinstance(values.iloc[0], pd.Period):
+        values = pd.Series(pd.PeriodIndex(values).start_time)
+    elif not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        # Period labels of weeks are "start/end"
+        values = pd.to_datetime(values.astype(str).str.split("/").str[0], errors="coerce", format="mixed")
+        if values.isna().any():
+            return np.arange(len(values), dtype=float)
+    if values.dt.tz is not None:
+        values = values.dt.tz_localize(None)
+    return values.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+
+
+def downsample(
+    df: pd.DataFrame, x: str, y: str, color: str | None = None, n_points: int | None = None, stacked: bool = False
+) -> pd.DataFrame:
+    """
+    df with at most about n_points rows (default: max_points()), split evenly across the color series.
+
+    Each series is reduced on its own, except for stacked areas: there the x values are picked on the
+    stack total and kept for every series, so the stacked traces stay aligned.
+    """
+    n_points = n_points if n_points is not None else max_points()
+    if len(df) <= n_points:
+        return df
+    # Positions of the distinct x values: works for numbers, timestamps and labels like "2020-01" alike.
+    # Triangles are measured on the actual spacing of x, so gaps in a series are not squeezed out.
+    x_values, x_pos = np.unique(df[x].to_numpy(), return_inverse=True)
+    x_num = numeric_x(x_values)
+    if color is None:
+        order = np.argsort(x_pos, kind="stable")
+        return df.iloc[order[lttb_indices(x_num[x_pos[order]], df[y].to_numpy()[order], n_points)]]
+
+    per_series = max(n_points // max(df[color].nunique(), 1), 3)
+    if stacked:
+        total = np.bincount(x_pos, weights=np.nan_to_num(df[y].to_numpy(dtype=float)), minlength=len(x_values))
+        keep = lttb_indices(x_num, total, per_series)
+        return df[np.isin(x_pos, keep)]
+
+    values = df[y].to_numpy()
+    rows = []
+    for positions in df.groupby(color, observed=True, sort=False).indices.values():
+        positions = positions[np.argsort(x_pos[positions], kind="stable")]
+        rows.append(positions[lttb_indices(x_num[x_pos[positions]], values[positions], per_series)])
+    return df.iloc[np.sort(np.concatenate(rows))]
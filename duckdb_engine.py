@@ -0,0 +1,269 @@
+# duckdb_engine.py
+"""
+SQL implementations of the group-by metrics in analysis.py, run by an
+in-process DuckDB database (FITLYTICS_ANALYSIS_ENGINE=duckdb).
+
+Each function has the signature and output of its analysis.py counterpart.
+The input frame is registered as an Arrow table and aggregated by DuckDB's
+multi-threaded, vectorized engine; only the small result comes back to
+pandas. Metrics that are not plain aggregations (RFM quartiles, retention
+curves) and the per-product and per-country totals (bincounts over the
+integer dimension keys) are re-exported from analysis.py unchanged, and
+cohort metrics at a granularity other than month are delegated to
+analysis.py.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import analysis
+from analysis import (  # noqa: F401  (re-exported: no SQL version)
+    calculate_month1_churn,
+    calculate_month1_retention,
+    get_avg_price_per_category,
+    get_geo_revenue,
+    get_retention_by_discount_level,
+    get_rfm_segment_counts,
+    get_top_categories_by_units_sold,
+    get_top_products_by_revenue,
+    perform_rfm_segmentation,
+    prepare_retention_curves,
+)
+
+try:
+    import duckdb
+except ImportError as exc:
+    raise ImportError(
+        "FITLYTICS_ANALYSIS_ENGINE=duckdb needs the duckdb package: pip install duckdb"
+    ) from exc
+
+
+def _month(column: str) -> str:
+    # Month label as produced by .dt.to_period('M').astype(str), including 'NaT' for missing dates
+    return f"coalesce(strftime({column}, '%Y-%m'), 'NaT')"
+
+
+ORDER_MONTH = _month("processed_at")
+
+_database = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _connection():
+    # One in-memory database per process and one cursor per thread (connections are not thread-safe)
+    global _database
+    if not hasattr(_local, "cursor"):
+        with _lock:
+            if _database is None:
+                _database = duckdb.connect(":memory:")
+                # x / 0 gives inf/nan as in pandas instead of NULL
+                _database.execute("SET ieee_floating_point_ops = true")
+            _local.cursor = _database.cursor()
+    return _local.cursor
+
+
+def _table(df: pd.DataFrame) -> pa.Table:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type) and field.type.tz is not None:
+            # Keep the UTC wall clock; strftime/date_trunc then agree with pandas regardless of session time zone
+            table = table.set_column(i, field.name, pc.cast(table.column(i), pa.timestamp(field.type.unit)))
+        elif isinstance(df[field.name].dtype, pd.PeriodDtype):
+            # Periods are registered as their start timestamp and labelled in SQL with _month()
+            table = table.set_column(i, field.name, pa.array(df[field.name].dt.to_timestamp()))
+    return table
+
+
+def query(sql: str, **frames: pd.DataFrame) -> pd.DataFrame:
+    """Run sql with each keyword frame registered as a table of that name."""
+    con = _connection()
+    for name, df in frames.items():
+        con.register(name, _table(df))
+    try:
+        return con.execute(sql).arrow().read_all().to_pandas()
+    finally:
+        for name in frames:
+            con.unregister(name)
+
+
+def calculate_retention_matrix(order_level_df: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
+    if granularity != "month":
+        return analysis.calculate_retention_matrix(order_level_df, granularity)
+    counts = query("""
+        WITH t AS (
+            SELECT customer_id, processed_at,
+                   min(processed_at) OVER (PARTITION BY customer_id) AS first_order
+            FROM orders
+            WHERE customer_id IS NOT NULL
+        )
+        SELECT strftime(first_order, '%Y-%m') AS cohort_month,
+               strftime(processed_at, '%Y-%m') AS order_month,
+               count(DISTINCT customer_id) AS customers
+        FROM t
+        WHERE processed_at IS NOT NULL
+        GROUP BY ALL
+    """, orders=order_level_df[['customer_id', 'processed_at']])
+
+    counts['cohort_month'] = pd.PeriodIndex(counts['cohort_month'], freq='M')
+    counts['order_month'] = pd.PeriodIndex(counts['order_month'], freq='M')
+    cohort_pivot = counts.pivot_table(index='cohort_month', columns='order_month', values='customers',
+                                      aggfunc='sum', fill_value=0).astype(np.int64)
+    cohort_pivot.columns.name = 'order_month'
+
+    cohort_sizes = pd.Series({
+        cohort: cohort_pivot.loc[cohort, cohort]
+        for cohort in cohort_pivot.index
+    })
+
+    retention_matrix = cohort_pivot.divide(cohort_sizes, axis=0).round(3)
+    retention_matrix.replace([np.inf, -np.inf], np.nan, inplace=True)
+    retention_matrix.dropna(how="all", inplace=True)
+
+    return retention_matrix
+
+
+def calculate_cohort_sizes(order_level_df: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
+    if granularity != "month":
+        return analysis.calculate_cohort_sizes(order_level_df, granularity)
+    return query(f"""
+        SELECT {_month("cohort_month")} AS cohort_month, count(DISTINCT customer_id) AS n_customers
+        FROM orders
+        GROUP BY 1
+        ORDER BY cohort_month
+    """, orders=order_level_df[['cohort_month', 'customer_id']])
+
+
+def calculate_avg_revenue_by_cohort(order_level_df: pd.DataFrame, granularity: str = "month") -> pd.DataFrame:
+    if granularity != "month":
+        return analysis.calculate_avg_revenue_by_cohort(order_level_df, granularity)
+    return query(f"""
+        SELECT {_month("cohort_month")} AS cohort_month, avg(net_revenue) AS avg_revenue
+        FROM orders
+        GROUP BY 1
+        ORDER BY cohort_month
+    """, orders=order_level_df[['cohort_month', 'net_revenue']])
+
+
+def calculate_days_to_second_order(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    return query("""
+        WITH ranked AS (
+            SELECT customer_id, processed_at,
+                   row_number() OVER (PARTITION BY customer_id ORDER BY processed_at) AS rank
+            FROM orders
+            WHERE customer_id IS NOT NULL AND processed_at IS NOT NULL
+        )
+        SELECT s.customer_id,
+               CAST(floor((epoch_us(s.processed_at) - epoch_us(f.processed_at)) / 86400e6) AS BIGINT)
+                   AS days_to_second_order
+        FROM ranked s JOIN ranked f ON s.customer_id = f.customer_id AND f.rank = 1
+        WHERE s.rank = 2
+        ORDER BY s.customer_id
+    """, orders=order_level_df[['customer_id', 'processed_at']])
+
+
+def get_category_revenue_trend(product_level_df):
+    return query(f"""
+        SELECT {ORDER_MONTH} AS order_month, product_category, coalesce(sum(net_price), 0) AS net_price
+        FROM products
+        WHERE product_category IS NOT NULL
+        GROUP BY ALL
+        ORDER BY order_month, product_category
+    """, products=product_level_df[['processed_at', 'product_category', 'net_price']])
+
+
+def get_new_vs_returning_user_counts(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    return query(f"""
+        WITH t AS (
+            SELECT customer_id, processed_at,
+                   min(processed_at) OVER (PARTITION BY customer_id) AS first_order_date
+            FROM orders
+        )
+        SELECT {ORDER_MONTH} AS order_month,
+               CASE WHEN coalesce(processed_at > first_order_date, false) THEN 'Returning' ELSE 'New' END
+                   AS user_type,
+               count(DISTINCT customer_id) AS user_count
+        FROM t
+        GROUP BY ALL
+        ORDER BY order_month, user_type
+    """, orders=order_level_df[['customer_id', 'processed_at']])
+
+
+def get_monthly_net_revenue(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    return query(f"""
+        SELECT {ORDER_MONTH} AS order_month, coalesce(sum(net_revenue), 0) AS net_revenue
+        FROM orders
+        GROUP BY order_month
+        ORDER BY order_month
+    """, orders=order_level_df[['processed_at', 'net_revenue']])
+
+
+def get_discount_rate_trend(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    if 'gross_revenue' in order_level_df.columns:
+        gross, columns = 'gross_revenue', ['gross_revenue']
+    else:
+        gross, columns = '(net_revenue + total_discounts)', ['net_revenue']
+    return query(f"""
+        SELECT {ORDER_MONTH} AS order_month, avg(total_discounts / {gross}) AS discount_rate
+        FROM orders
+        GROUP BY order_month
+        ORDER BY order_month
+    """, orders=order_level_df[['processed_at', 'total_discounts', *columns]])
+
+
+def get_monthly_aov(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    monthly_aov = query(f"""
+        SELECT {ORDER_MONTH} AS order_month,
+               coalesce(sum(net_revenue), 0) AS total_revenue,
+               count(DISTINCT order_number) AS total_orders
+        FROM orders
+        GROUP BY order_month
+        ORDER BY order_month
+    """, orders=order_level_df[['processed_at', 'net_revenue', 'order_number']])
+    monthly_aov['aov'] = monthly_aov['total_revenue'] / monthly_aov['total_orders']
+    return monthly_aov
+
+
+def get_revenue_by_order_type(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    revenue_by_type = query("""
+        WITH t AS (
+            SELECT processed_at, net_revenue,
+                   min(processed_at) OVER (PARTITION BY customer_id) AS first_order_date
+            FROM orders
+        )
+        SELECT CASE WHEN coalesce(processed_at = first_order_date, false) THEN 'First Order' ELSE 'Repeat Order' END
+                   AS order_type,
+               coalesce(sum(net_revenue), 0) AS net_revenue
+        FROM t
+        GROUP BY order_type
+        ORDER BY order_type
+    """, orders=order_level_df[['customer_id', 'processed_at', 'net_revenue']])
+
+    # Rounded in pandas: DuckDB rounds halves away from zero, NumPy to even
+    total_rev = revenue_by_type['net_revenue'].sum()
+    revenue_by_type['% of Revenue'] = (revenue_by_type['net_revenue'] / total_rev * 100).round(1)
+    return revenue_by_type
+
+
+def calculate_monthly_summary_table(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    summary = query(f"""
+        SELECT {ORDER_MONTH} AS order_month,
+               count(DISTINCT order_number) AS total_orders,
+               coalesce(sum(net_revenue), 0) AS total_revenue,
+               coalesce(sum(total_discounts), 0) AS total_discounts
+        FROM orders
+        GROUP BY order_month
+        ORDER BY order_month
+    """, orders=order_level_df[['processed_at', 'order_number', 'net_revenue', 'total_discounts']])
+
+    summary['aov'] = (summary['total_revenue'] / summary['total_orders']).round(2)
+    summary['total_revenue'] = summary['total_revenue'].round(2)
+    summary['total_discounts'] = summary['total_discounts'].round(2)
+    return summary
+
+
+def calculate_monthly_category_trends(product_level_df: pd.DataFrame) -> pd.DataFrame:
+    return get_category_revenue_trend(product_level_df)
@@ -0,0 +1,113 @@
+# export.py
+"""
+Chunked CSV / Parquet export of the rows selected by the sidebar filters.
+
+The selected rows (filters.filter_rows positions) are taken from the
+cleaned frames chunk_rows at a time and encoded chunk by chunk, so memory
+stays bounded by one chunk instead of a filtered copy of the frame plus
+the whole encoded file. Parquet chunks become row groups of one file.
+"""
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def iter_chunks(
+    df: pd.DataFrame, rows: slice | np.ndarray = slice(None), columns=None, chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Iterator[pd.DataFrame]:
+    """The selected rows (and columns) of df, chunk_rows at a time; chunks of a slice are views."""
+    positions = np.arange(len(df))[rows] if isinstance(rows, slice) and rows.step not in (None, 1) else rows
+    if isinstance(positions, slice):
+        start, stop, _ = positions.indices(len(df))
+        bounds = [slice(lo, min(lo + chunk_rows, stop)) for lo in range(start, stop, chunk_rows)]
+    else:
+        bounds = [positions[lo:lo + chunk_rows] for lo in range(0, len(positions), chunk_rows)]
+    column_positions = slice(None) if not columns else [df.columns.get_loc(c) for c in columns]
+    for chunk_rows_ in bounds:
+        yield df.iloc[chunk_rows_, column_positions]
+
+
+class _Drain:
+    # Write-only file object whose written bytes are collected and handed out after each row group
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _empty(df: pd.DataFrame, columns) -> pd.DataFrame:
+    return df.iloc[:0] if not columns else df.iloc[:0][list(columns)]
+
+
+def iter_export(
+    df: pd.DataFrame,
+    rows: slice | np.ndarray = slice(None),
+    fmt: str = "csv",
+    columns=None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """Encoded file contents for the selected rows of df, one piece per chunk."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    chunks = iter_chunks(df, rows, columns, chunk_rows)
+
+    if fmt == "csv":
+        header = True
+        for chunk in chunks:
+            yield chunk.to_csv(index=False, header=header).encode()
+            header = False
+        if header:
+            yield _empty(df, columns).to_csv(index=False).encode()
+        return
+
+    import pyarrow.parquet as pq
+    # The schema of the full frame, so every row group matches and an empty selection still has columns
+    schema = pa.Schema.from_pandas(_empty(df, columns), preserve_index=False)
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.take()
+    yield sink.take()
+
+
+def write_export(
+    file,
+    df: pd.DataFrame,
+    rows: slice | np.ndarray = slice(None),
+    fmt: str = "csv",
+    columns=None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """Write the export to a binary file object (or a path) chunk by chunk; returns the bytes written."""
+    if isinstance(file, str):
+        with open(file, "wb") as f:
+            return write_export(f, df, rows, fmt, columns, chunk_rows)
+    written = 0
+    for piece in iter_export(df, rows, fmt, columns, chunk_rows):
+        file.write(piece)
+        written += len(piece)
+    return written
@@ -0,0 +1,91 @@
+# filters.py
+import numpy as np
+import pandas as pd
+
+
+def _date_rows(df: pd.DataFrame, start, end) -> slice | np.ndarray:
+    # A slice on processed_at-sorted frames (see store.py), positions otherwise
+    if df.attrs.get("sorted_by") != "processed_at":
+        return np.flatnonzero(((df['processed_at'] >= start) & (df['processed_at'] <= end)).to_numpy())
+    return slice(df['processed_at'].searchsorted(start, side="left"),
+                 df['processed_at'].searchsorted(end, side="right"))
+
+
+def _select(df: pd.DataFrame, rows: slice | np.ndarray, conditions: dict) -> slice | np.ndarray:
+    # Narrow rows to those whose column values are in the selected values; empty selections are skipped
+    conditions = {column: values for column, values in conditions.items() if values}
+    if not conditions:
+        return rows
+    subset = df.iloc[rows]
+    mask = np.ones(len(subset), dtype=bool)
+    for column, values in conditions.items():
+        mask &= subset[column].isin(values).to_numpy()
+    positions = np.arange(len(df))[rows] if isinstance(rows, slice) else rows
+    return positions[mask]
+
+
+def _within(rows: slice | np.ndarray, positions: np.ndarray, n_rows: int) -> np.ndarray:
+    # The ascending positions that rows (a step-1 slice or ascending positions) also selects
+    if isinstance(rows, slice):
+        start, stop, _ = rows.indices(n_rows)
+        return positions[(positions >= start) & (positions < stop)]
+    return np.intersect1d(rows, positions, assume_unique=True)
+
+
+def filter_rows(
+    product_level_df: pd.DataFrame,
+    order_level_df: pd.DataFrame,
+    products=None,
+    categories=None,
+    types=None,
+    countries=None,
+    statuses=None,
+    orders=None,
+    customers=None,
+    date_range=None,
+    customer_index=None,
+) -> tuple[slice | np.ndarray, slice | np.ndarray]:
+    """
+    Row positions of (product_level_df, order_level_df) selected by the
+    dashboard sidebar filters: a slice while only the date range applies to
+    a sorted frame, an array of positions otherwise. With a
+    customers.CustomerIndex of the frames, the customer filter reads the
+    customers' orders off the index instead of scanning the frame.
+    """
+    product_rows = order_rows = slice(None)
+    # Date range first: on processed_at-sorted frames it is a binary search
+    if date_range:
+        start_date, end_date = date_range
+        start_date = pd.to_datetime(start_date).tz_localize("UTC")
+        end_date = pd.to_datetime(end_date).tz_localize("UTC")
+        product_rows = _date_rows(product_level_df, start_date, end_date)
+        order_rows = _date_rows(order_level_df, start_date, end_date)
+
+    product_rows = _select(product_level_df, product_rows, {
+        'product_title': products, 'product_category': categories, 'product_type': types,
+    })
+    if customers and customer_index is not None:
+        order_rows = _within(order_rows, customer_index.order_rows(customers), len(order_level_df))
+        customers = None
+    order_rows = _select(order_level_df, order_rows, {
+        'billing_address_country': countries, 'order_status': statuses,
+        'order_number': orders, 'customer_id': customers,
+    })
+    return product_rows, order_rows
+
+
+def take_rows(df: pd.DataFrame, rows: slice | np.ndarray) -> pd.DataFrame:
+    """The selected rows of df: a zero-copy view for a slice."""
+    if isinstance(rows, slice) and rows == slice(None):
+        return df
+    return df.iloc[rows]
+
+
+def apply_filters(
+    product_level_df: pd.DataFrame,
+    order_level_df: pd.DataFrame,
+    **filters,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Apply the dashboard sidebar filters (see filter_rows). Empty selections leave a frame unfiltered."""
+    product_rows, order_rows = filter_rows(product_level_df, order_level_df, **filters)
+    return take_rows(product_level_df, product_rows), take_rows(order_level_df, order_rows)
@@ -0,0 +1,232 @@
+# instrumentation.py
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+
+@dataclass
+class StageEvent:
+    stage: str
+    started_at: float
+    wall_s: float
+    # CPU time of the whole process over the stage, so it includes other threads (and sessions) running meanwhile
+    cpu_s: float
+    rows_in: int | None
+    rows_out: int | None
+    # Python/NumPy heap peak above the level at stage start (tracemalloc), when memory is tracked
+    peak_mem_delta_mb: float | None
+    # Net bytes allocated by Arrow's memory pool (Arrow-backed strings are invisible to tracemalloc)
+    arrow_mem_delta_mb: float
+    # Grouping used by the rerun profiler: "filter", "analysis", "plot"
+    phase: str | None = None
+    # In-memory size of a frame result, or serialized JSON size of a figure, when measured
+    output_bytes: int | None = None
+
+
+def _rows(value) -> int | None:
+    if isinstance(value, tuple):
+        value = value[0]
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series)) else None
+
+
+def payload_size(value) -> int | None:
+    """Bytes held by a metric result, or bytes sent to the browser for a Plotly figure."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(value, tuple):
+        sizes = [payload_size(v) for v in value]
+        return sum(size for size in sizes if size is not None)
+    if hasattr(value, "to_plotly_json"):
+        return len(value.to_json())
+    return None
+
+
+class StageRecorder:
+    """Collects one StageEvent per call made through run()."""
+
+    def __init__(self, track_memory: bool = False, measure_output: bool = False):
+        self.track_memory = track_memory
+        self.measure_output = measure_output
+        # Tagged onto every event recorded from now on
+        self.phase = None
+        self.events: list[StageEvent] = []
+
+    def run(self, stage: str, func, *args, **kwargs):
+        """Call func(*args, **kwargs), record a StageEvent for it and return its result."""
+        frames = [a for a in args if isinstance(a, (pd.DataFrame, pd.Series))]
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+
+        arrow_before = pa.total_allocated_bytes()
+        started_at = time.time()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            result = func(*args, **kwargs)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = None
+            if self.track_memory:
+                peak = round((tracemalloc.get_traced_memory()[1] - traced_before) / 2**20, 3)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        self.events.append(StageEvent(
+            stage=stage,
+            started_at=started_at,
+            wall_s=round(wall, 6),
+            cpu_s=round(cpu, 6),
+            rows_in=len(frames[0]) if frames else None,
+            rows_out=_rows(result),
+            peak_mem_delta_mb=peak,
+            arrow_mem_delta_mb=round((pa.total_allocated_bytes() - arrow_before) / 2**20, 3),
+            phase=self.phase,
+            output_bytes=payload_size(result) if self.measure_output else None,
+        ))
+        return result
+
+    def add(self, stage: str, started_at: float, wall_s: float, result) -> None:
+        """Record a call that was timed elsewhere, e.g. a metric computed in another process."""
+        self.events.append(StageEvent(
+            stage=stage,
+            started_at=started_at,
+            wall_s=round(wall_s, 6),
+            cpu_s=0.0,
+            rows_in=None,
+            rows_out=_rows(result),
+            peak_mem_delta_mb=None,
+            arrow_mem_delta_mb=0.0,
+            phase=self.phase,
+            output_bytes=payload_size(result) if self.measure_output else None,
+        ))
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([asdict(event) for event in self.events])
+
+    def to_json(self) -> str:
+        return json.dumps([asdict(event) for event in self.events], indent=2)
+
+    def to_prometheus(self, prefix: str = "fitlytics_stage") -> str:
+        """Render the latest event of each stage in the Prometheus text exposition format."""
+        latest = {event.stage: event for event in self.events}
+        gauges = [
+            ("wall_seconds", "Wall-clock time of the stage", lambda e: e.wall_s),
+            ("cpu_seconds", "Process CPU time during the stage", lambda e: e.cpu_s),
+            ("rows_in", "Rows entering the stage", lambda e: e.rows_in),
+            ("rows_out", "Rows produced by the stage", lambda e: e.rows_out),
+            ("peak_memory_delta_bytes", "Peak Python heap growth during the stage",
+             lambda e: None if e.peak_mem_delta_mb is None else e.peak_mem_delta_mb * 2**20),
+            ("arrow_memory_delta_bytes", "Arrow memory pool growth during the stage",
+             lambda e: e.arrow_mem_delta_mb * 2**20),
+        ]
+        lines = []
+        for name, help_text, value in gauges:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for stage, event in latest.items():
+                if value(event) is not None:
+                    lines.append(f'{prefix}_{name}{{stage="{stage}"}} {value(event):g}')
+        return "\n".join(lines) + "\n"
+
+
+# cProfile is process-wide from Python 3.12 (a second profiler fails to enable) and below that only sees the
+# thread that enabled it: one rerun collects cProfile stats at a time, with its thread, while the others skip it
+_cprofile_lock = threading.Lock()
+_cprofile_owner = None
+
+
+class RerunProfiler(StageRecorder):
+    """
+    Opt-in profiler for one Streamlit rerun. Calls made through run() or
+    wrap() are recorded with their phase and output size; when disabled
+    both simply call through. Optionally collects cProfile stats for the
+    whole rerun, when no other session is collecting them (profile is
+    None otherwise).
+    """
+
+    def __init__(self, enabled: bool = False, cprofile: bool = False):
+        super().__init__(track_memory=False, measure_output=True)
+        self.enabled = enabled
+        self.profile = None
+        self.rerun_started_at = time.time()
+        if enabled and cprofile:
+            self._start_cprofile()
+
+    def _start_cprofile(self) -> None:
+        global _cprofile_owner
+        with _cprofile_lock:
+            owner = _cprofile_owner
+            if owner is not None:
+                # A rerun interrupted before stop() (Streamlit reruns in the same thread) no longer needs it
+                if owner.thread is not threading.current_thread() and owner.thread.is_alive():
+                    return
+                owner._release_cprofile()
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # Another profiling tool, such as a debugger, is active
+                return
+            self.profile, self.thread, _cprofile_owner = profile, threading.current_thread(), self
+
+    def run(self, stage: str, func, *args, **kwargs):
+        if not self.enabled:
+            return func(*args, **kwargs)
+        return super().run(stage, func, *args, **kwargs)
+
+    def add(self, stage: str, started_at: float, wall_s: float, result) -> None:
+        if self.enabled:
+            super().add(stage, started_at, wall_s, result)
+
+    def wrap(self, phase: str, stage: str, func):
+        """Return func instrumented so every call is recorded under the given phase."""
+        if not self.enabled:
+            return func
+
+        def wrapper(*args, **kwargs):
+            previous, self.phase = self.phase, phase
+            try:
+                return self.run(stage, func, *args, **kwargs)
+            finally:
+                self.phase = previous
+
+        return wrapper
+
+    def _release_cprofile(self) -> None:
+        # Called with _cprofile_lock held
+        global _cprofile_owner
+        if self.profile is not None:
+            self.profile.disable()
+        if _cprofile_owner is self:
+            _cprofile_owner = None
+
+    def stop(self) -> None:
+        with _cprofile_lock:
+            self._release_cprofile()
+
+    def timeline(self) -> pd.DataFrame:
+        """Events with their start offset from the beginning of the rerun, for the flame chart."""
+        events = self.to_frame()
+        if events.empty:
+            return events
+        events["offset_s"] = events["started_at"] - self.rerun_started_at
+        return events
+
+    def cprofile_text(self, top: int = 30) -> str:
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats("cumulative").print_stats(top)
+        return stream.getvalue()
+
+    def dump_cprofile(self, path: str) -> None:
+        self.profile.dump_stats(path)
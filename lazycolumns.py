@@ -0,0 +1,75 @@
+# lazycolumns.py
+"""
+Cold order columns, read from orders.parquet on first use.
+
+The pipeline reads only HOT_ORDER_COLUMNS, the columns the cleaned frames
+and the metrics are built from, so the others (cancel_reason, created_at,
+first_date_order, subtotal_price, billing_address_zip) are neither parsed
+at startup nor held in the shared frames. When something does ask for one
+(the export, an ad-hoc analysis), it is read from parquet together with the
+order keys, parsed as clean_orders would, and cached for later requests.
+
+Rows are matched on (customer_id, order_number), the key deduplicate_orders
+makes unique, keeping the first source row per key as it does.
+"""
+import os
+import threading
+from functools import cached_property
+
+import pandas as pd
+
+from config import DATA_DIR
+from loader import HOT_ORDER_COLUMNS
+
+ORDER_KEYS = ['customer_id', 'order_number']
+DATE_COLUMNS = ['created_at', 'first_date_order']
+
+
+class LazyColumns:
+    """The cold columns of one data folder's orders.parquet, loaded and cached per column."""
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.path = os.path.join(data_dir, "orders.parquet")
+        self._columns = {}
+        # One lock per column name, so reading one column does not hold up the others
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    @cached_property
+    def names(self) -> list[str]:
+        """Columns of orders.parquet left out of the cleaned frames (pandas index columns aside)."""
+        import pyarrow.parquet as pq
+        return [name for name in pq.read_schema(self.path).names
+                if name not in HOT_ORDER_COLUMNS and not name.startswith("__index_level_")]
+
+    @property
+    def nbytes(self) -> int:
+        # A snapshot of the loaded columns: never waits for a column being read
+        return int(sum(column.memory_usage(index=True, deep=True) for column in list(self._columns.values())))
+
+    def column(self, name: str) -> pd.Series:
+        """The cold column indexed by (customer_id, order_number), read and parsed on the first call."""
+        if name not in self.names:
+            raise KeyError(f"{name} is not a cold column of {self.path}")
+        column = self._columns.get(name)
+        if column is not None:
+            return column
+        with self._locks_lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        # One reader per column; concurrent callers for the same column wait for it rather than reading it again
+        with lock:
+            if name not in self._columns:
+                df = pd.read_parquet(self.path, columns=[*ORDER_KEYS, name]).drop_duplicates(ORDER_KEYS)
+                values = pd.to_datetime(df[name], errors='coerce') if name in DATE_COLUMNS else df[name]
+                self._columns[name] = pd.Series(values.array, index=pd.MultiIndex.from_frame(df[ORDER_KEYS]),
+                                                name=name)
+            return self._columns[name]
+
+    def attach(self, df: pd.DataFrame, columns=None) -> pd.DataFrame:
+        """df with the cold columns among columns added (a new frame); df itself when it already has them."""
+        missing = [name for name in (columns or []) if name not in df.columns]
+        if not missing:
+            return df
+        keys = pd.MultiIndex.from_arrays([df[key] for key in ORDER_KEYS])
+        return df.assign(**{name: pd.Series(self.column(name).reindex(keys).array, index=df.index)
+                            for name in missing})
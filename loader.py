@@ -1,10 +1,23 @@
 # loader.py
+import os
 import pandas as pd
+from config import BACKEND, DATA_DIR
 
-def load_orders() -> pd.DataFrame:
-    """Load orders.parquet from the data folder."""
-    return pd.read_parquet("data/orders.parquet")
+# Order columns the cleaned frames are built from; the rest are read on demand (lazycolumns.py)
+HOT_ORDER_COLUMNS = [
+    'order_number', 'customer_id', 'processed_at', 'cancelled_at',
+    'billing_address_country', 'product_items', 'total_discounts',
+]
 
-def load_products() -> pd.DataFrame:
+def _read(path: str, backend: str, columns: list[str] | None = None) -> pd.DataFrame:
+    if backend == "arrow":
+        return pd.read_parquet(path, columns=columns, dtype_backend="pyarrow")
+    return pd.read_parquet(path, columns=columns)
+
+def load_orders(data_dir: str = DATA_DIR, backend: str = BACKEND, columns: list[str] | None = None) -> pd.DataFrame:
+    """Load orders.parquet (only columns, when given) from the data folder."""
+    return _read(os.path.join(data_dir, "orders.parquet"), backend, columns)
+
+def load_products(data_dir: str = DATA_DIR, backend: str = BACKEND) -> pd.DataFrame:
     """Load products.parquet from the data folder."""
-    return pd.read_parquet("data/products.parquet")
+    return _read(os.path.join(data_dir, "products.parquet"), backend)
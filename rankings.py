@@ -0,0 +1,71 @@
+# rankings.py
+"""
+Top-N selection over aggregated arrays.
+
+top_indices picks the n largest totals with np.argpartition (linear in the
+number of keys) and sorts only those n, instead of sorting every group.
+TopK keeps running totals per key and the current top k up to date as line
+items are appended: when every appended value is non-negative, a key that
+was not touched cannot overtake one already ranked, so the new top k is
+chosen among the old top k and the touched keys only.
+"""
+import numpy as np
+import pandas as pd
+
+
+def top_indices(values: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the n largest values, largest first; ties keep position order and NaN ranks last."""
+    values = np.asarray(values, dtype=np.float64)
+    n = min(n, len(values))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    # Negate so the largest come first; NaN becomes +inf and sorts last
+    keys = np.where(np.isnan(values), np.inf, -values)
+    if n < len(values):
+        candidates = np.argpartition(keys, n - 1)[:n]
+        # argpartition may cut a run of equal values anywhere; take every tie of the n-th value instead
+        candidates = np.flatnonzero(keys <= keys[candidates].max())
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(keys[candidates], kind="stable")][:n]
+
+
+class TopK:
+    """Running per-key totals of appended line items with the k largest maintained incrementally."""
+
+    def __init__(self, k: int, name: str = "key", value: str = "total"):
+        self.k = k
+        self.name = name
+        self.value = value
+        self.names = []
+        self.codes = {}
+        self.totals = np.zeros(0, dtype=np.float64)
+        self.top = np.empty(0, dtype=np.int64)
+
+    def add(self, keys, values=None) -> None:
+        """Append line items: keys are names, values their amounts (1 each when omitted, i.e. counts)."""
+        item_codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+        values = np.ones(len(item_codes)) if values is None else np.nan_to_num(np.asarray(values, dtype=np.float64))
+        known = item_codes >= 0
+        # Only the distinct names of the batch are looked up; unseen names get the next key
+        for name in uniques:
+            if name not in self.codes:
+                self.codes[name] = len(self.names)
+                self.names.append(name)
+        if len(self.names) > len(self.totals):
+            self.totals = np.concatenate([self.totals, np.zeros(len(self.names) - len(self.totals))])
+        lookup = np.fromiter((self.codes[name] for name in uniques), dtype=np.int64, count=len(uniques))
+        codes, values = lookup[item_codes[known]], values[known]
+        np.add.at(self.totals, codes, values)
+
+        if (values < 0).any():
+            # A ranked key may have dropped below an untouched one: rank every key again
+            self.top = top_indices(self.totals, self.k)
+        else:
+            candidates = np.union1d(self.top, codes)
+            self.top = candidates[top_indices(self.totals[candidates], self.k)]
+
+    def frame(self, n: int | None = None) -> pd.DataFrame:
+        """The current top n (default k) as a (name, value) frame, largest first."""
+        top = self.top[:n]
+        return pd.DataFrame({self.name: [str(self.names[i]) for i in top], self.value: self.totals[top]})
@@ -0,0 +1,153 @@
+# report.py
+"""
+Headless batch report: computes every dashboard metric for a list of filter
+presets and writes the tables as parquet and the figures as static HTML.
+
+    python report.py --presets presets.json --output reports/2021-03-08
+
+A presets file is a JSON list of objects with a "name" and any of the
+filters.apply_filters keywords, plus an optional cohort "granularity"
+("day", "week", "month" or "quarter"), e.g.
+    [{"name": "all"},
+     {"name": "weekly-cohorts", "granularity": "week"},
+     {"name": "germany-2020", "countries": ["Germany"], "date_range": ["2020-01-01", "2020-12-31"]}]
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import visualization as viz
+from config import STORE_DIR
+from filters import apply_filters
+from scheduler import METRICS, run_metrics
+from store import load_datasets, open_store
+
+# metric name -> function building its figure from the metric result
+FIGURES = {
+    "retention_matrix": viz.plot_retention_matrix,
+    "month1_retention": viz.plot_month1_retention,
+    "retention_curves": lambda curves: viz.plot_retention_curves(*curves[:5]),
+    "month1_churn": viz.plot_month1_churn_rate,
+    "cohort_sizes": viz.plot_cohort_sizes,
+    "avg_revenue_by_cohort": viz.plot_avg_revenue_by_cohort,
+    "days_to_second_order": viz.plot_days_to_second_order_histogram,
+    "rfm_segment_counts": viz.plot_rfm_segmentation_bar,
+    "revenue_by_order_type": viz.plot_revenue_by_order_type,
+    "monthly_aov": viz.plot_monthly_aov,
+    "top_products": viz.plot_top_products_by_revenue,
+    "avg_price_per_category": viz.plot_avg_price_per_category,
+    "top_categories_by_units": viz.plot_top_categories_by_units,
+    "category_revenue_trend": viz.plot_category_revenue_trend,
+    "monthly_category_trends": viz.plot_monthly_category_trends,
+    "geo_revenue": viz.plot_geo_revenue_map,
+    "new_vs_returning": viz.plot_new_vs_returning_area,
+    "monthly_net_revenue": viz.plot_monthly_revenue_trend,
+    "discount_rate_trend": viz.plot_discount_rate_trend,
+    "monthly_summary": viz.plot_monthly_summary_table,
+    "retention_by_discount": viz.plot_retention_by_discount_level,
+}
+
+_datasets = {}
+
+
+def _init_worker(product_level_df: pd.DataFrame, order_level_df: pd.DataFrame) -> None:
+    _datasets["products"] = product_level_df
+    _datasets["orders"] = order_level_df
+
+
+def _init_store_worker(store_dir: str) -> None:
+    # Each worker maps the same files instead of unpickling its own copy of the frames
+    _init_worker(*open_store(store_dir))
+
+
+def _as_table(df: pd.DataFrame) -> pd.DataFrame:
+    # Parquet needs string column names; pivots keep their labels as a regular column
+    df = df.reset_index(drop=not any(df.index.names))
+    df.columns = [str(col) for col in df.columns]
+    # Melted pivots hold Period objects in object columns, which Arrow cannot infer
+    for col in df.columns[df.dtypes == object]:
+        if df[col].map(lambda v: isinstance(v, pd.Period)).any():
+            df[col] = df[col].astype(str)
+    return df
+
+
+def write_preset(preset: dict, output_dir: str, include_plotlyjs="cdn") -> dict:
+    """Compute all metrics for one preset and write them under output_dir/<preset name>."""
+    preset = dict(preset)
+    name = preset.pop("name")
+    granularity = preset.pop("granularity", "month")
+    target = os.path.join(output_dir, name)
+    os.makedirs(target, exist_ok=True)
+
+    filtered_product_df, filtered_order_df = apply_filters(_datasets["products"], _datasets["orders"], **preset)
+    results = run_metrics(list(METRICS), filtered_order_df, filtered_product_df, executor="serial",
+                          granularity=granularity)
+
+    manifest = {"name": name, "granularity": granularity, "filters": preset, "tables": [], "figures": [], "labels": {}}
+    for metric, result in results.items():
+        if isinstance(result, tuple):
+            # prepare_retention_curves: (avg, best, worst, best label, worst label, long)
+            avg_ret, best_curve, worst_curve, best_cohort, worst_cohort, retention_long = result
+            tables = {"avg": avg_ret, "best": best_curve, "worst": worst_curve, "long": retention_long}
+            for part, df in tables.items():
+                path = os.path.join(target, f"{metric}_{part}.parquet")
+                _as_table(df.copy()).to_parquet(path, index=False)
+                manifest["tables"].append(os.path.basename(path))
+            manifest["labels"][metric] = {"best_cohort": str(best_cohort), "worst_cohort": str(worst_cohort)}
+        else:
+            path = os.path.join(target, f"{metric}.parquet")
+            _as_table(result.copy()).to_parquet(path, index=False)
+            manifest["tables"].append(os.path.basename(path))
+
+        if metric in FIGURES:
+            path = os.path.join(target, f"{metric}.html")
+            FIGURES[metric](result).write_html(path, include_plotlyjs=include_plotlyjs)
+            manifest["figures"].append(os.path.basename(path))
+
+    with open(os.path.join(target, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, default=str)
+    return manifest
+
+
+def generate_reports(presets: list[dict], output_dir: str, jobs: int | None = None, include_plotlyjs="cdn") -> list[dict]:
+    """Prepare the cleaned datasets once and write every preset, one preset per worker process."""
+    product_level_df, order_level_df = load_datasets()
+
+    if jobs == 1:
+        _init_worker(product_level_df, order_level_df)
+        return [write_preset(preset, output_dir, include_plotlyjs) for preset in presets]
+
+    if STORE_DIR:
+        initializer, initargs = _init_store_worker, (STORE_DIR,)
+    else:
+        initializer, initargs = _init_worker, (product_level_df, order_level_df)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+        futures = [pool.submit(write_preset, preset, output_dir, include_plotlyjs) for preset in presets]
+        return [future.result() for future in futures]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Write dashboard metrics for filter presets without Streamlit.")
+    parser.add_argument("--presets", help="JSON file with a list of filter presets (default: one unfiltered preset)")
+    parser.add_argument("--output", default="reports", help="Output directory")
+    parser.add_argument("--jobs", type=int, default=None, help="Presets computed in parallel (default: CPU count)")
+    parser.add_argument("--plotlyjs", choices=["cdn", "inline"], default="cdn",
+                        help="Load plotly.js from a CDN or embed it in every HTML file")
+    args = parser.parse_args(argv)
+
+    if args.presets:
+        with open(args.presets) as f:
+            presets = json.load(f)
+    else:
+        presets = [{"name": "all"}]
+
+    include_plotlyjs = True if args.plotlyjs == "inline" else "cdn"
+    for manifest in generate_reports(presets, args.output, args.jobs, include_plotlyjs):
+        print(f"{manifest['name']}: {len(manifest['tables'])} tables, {len(manifest['figures'])} figures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# rollups.py
+"""
+Status-partitioned revenue rollups for the cancellation-aware revenue views.
+
+The cleaned frames are cut once into cells, one per (day, country, order
+status) of the orders and per (day, category, type, country, order status)
+of the line items, holding the cell's order count and revenue, discount and
+discount-rate sums. The revenue metrics for any combination of the date,
+country, status, category and type filters, and for the "all", "delivered"
+and "cancelled" views, are then sums over the selected cells: switching the
+view does not rescan the line items. The results equal the exact metrics in
+analysis.py (up to float summation order).
+
+Cells are days, so a date range is exact; the flag for orders at exactly
+midnight reproduces filter_rows' inclusive end timestamp. Rows without
+processed_at have no month in the exact metrics either and are left out.
+Order-number, customer and product filters need the line items: metrics
+under those are computed from the view's rows of the filtered frames.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis import period_codes
+from dimensions import iso3_codes
+from scheduler import run_metrics
+
+# Dashboard revenue view -> order_status it keeps (None keeps every order)
+REVENUE_VIEWS = {"all": None, "delivered": "Delivered", "cancelled": "Cancelled"}
+ORDER_DIMENSIONS = ["day", "midnight", "country", "status"]
+PRODUCT_DIMENSIONS = ["day", "midnight", "category", "type", "country", "status"]
+# Metrics served from the order and the line-item cells
+ORDER_METRICS = ("monthly_net_revenue", "monthly_aov", "discount_rate_trend", "monthly_summary")
+PRODUCT_METRICS = ("category_revenue_trend", "monthly_category_trends", "geo_revenue")
+
+
+def _time_dimensions(processed_at: pd.Series) -> dict:
+    day = period_codes(processed_at, "day")
+    timestamps = processed_at.dt.tz_localize(None) if processed_at.dt.tz is not None else processed_at
+    return {"day": day, "midnight": (timestamps == timestamps.dt.normalize()).to_numpy()}
+
+
+def _cells(dims: pd.DataFrame, dimensions: list[str], sums: dict) -> pd.DataFrame:
+    # One row per distinct dimension combination with the summed measures; the month of each day for grouping
+    cells = dims.assign(**sums).groupby(dimensions, observed=True, sort=True, dropna=False).sum().reset_index()
+    cells["month"] = cells["day"].to_numpy().astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return cells
+
+
+def order_cells(order_level_df: pd.DataFrame) -> pd.DataFrame:
+    df = order_level_df[order_level_df['processed_at'].notna()]
+    gross = df['gross_revenue'] if 'gross_revenue' in df.columns else df['net_revenue'] + df['total_discounts']
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = (df['total_discounts'] / gross).to_numpy(np.float64, na_value=np.nan)
+    dims = pd.DataFrame({
+        **_time_dimensions(df['processed_at']),
+        "country": df['billing_address_country'].array,
+        "status": df['order_status'].array,
+    })
+    return _cells(dims, ORDER_DIMENSIONS, {
+        "orders": np.ones(len(df), dtype=np.int64),
+        "net_revenue": df['net_revenue'].to_numpy(np.float64, na_value=0.0),
+        "total_discounts": df['total_discounts'].to_numpy(np.float64, na_value=0.0),
+        # discount_rate_trend averages the per-order rate, skipping orders without one (0 / 0)
+        "rate_sum": np.where(np.isnan(rate), 0.0, rate),
+        "rate_count": (~np.isnan(rate)).astype(np.int64),
+    })
+
+
+def product_cells(product_level_df: pd.DataFrame) -> pd.DataFrame:
+    df = product_level_df[product_level_df['processed_at'].notna()]
+    dims = pd.DataFrame({
+        **_time_dimensions(df['processed_at']),
+        "category": df['product_category'].array,
+        "type": df['product_type'].array,
+        "country": df['billing_address_country'].array,
+        "status": np.where(df['cancelled_at'].notna(), "Cancelled", "Delivered"),
+    })
+    return _cells(dims, PRODUCT_DIMENSIONS, {
+        "rows": np.ones(len(df), dtype=np.int64),
+        "net_price": df['net_price'].to_numpy(np.float64, na_value=0.0),
+    })
+
+
+def _months(codes) -> np.ndarray:
+    return pd.PeriodIndex.from_ordinals(codes, freq="M").astype(str).to_numpy()
+
+
+class RevenueRollups:
+    """Order and line-item revenue cells (order_cells, product_cells) answering the revenue metrics."""
+
+    def __init__(self, order_cells: pd.DataFrame, product_cells: pd.DataFrame):
+        self.order_cells = order_cells
+        self.product_cells = product_cells
+
+    @classmethod
+    def from_frames(cls, product_level_df: pd.DataFrame, order_level_df: pd.DataFrame) -> "RevenueRollups":
+        return cls(order_cells(order_level_df), product_cells(product_level_df))
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.order_cells.memory_usage(deep=True).sum() + self.product_cells.memory_usage(deep=True).sum())
+
+    @staticmethod
+    def _mask(cells: pd.DataFrame, view: str, date_range, conditions: dict) -> np.ndarray:
+        mask = np.ones(len(cells), dtype=bool)
+        if REVENUE_VIEWS[view] is not None:
+            mask &= (cells["status"] == REVENUE_VIEWS[view]).to_numpy()
+        for column, values in conditions.items():
+            if values:
+                mask &= cells[column].isin(values).to_numpy()
+        if date_range:
+            # filter_rows keeps start 00:00 <= processed_at <= end 00:00
+            first, last = period_codes(pd.Series(pd.to_datetime(list(date_range))), "day")
+            day = cells["day"].to_numpy()
+            mask &= (day >= first) & ((day < last) | ((day == last) & cells["midnight"].to_numpy()))
+        return mask
+
+    def order_mask(self, view: str = "all", countries=None, statuses=None, date_range=None) -> np.ndarray:
+        """Order cells in the view and matching the sidebar's order filters."""
+        return self._mask(self.order_cells, view, date_range, {"country": countries, "status": statuses})
+
+    def product_mask(self, view: str = "all", categories=None, types=None, date_range=None) -> np.ndarray:
+        """Line-item cells in the view and matching the sidebar's line-item filters."""
+        return self._mask(self.product_cells, view, date_range, {"category": categories, "type": types})
+
+    # Versions of the exact metrics in analysis.py over the selected cells, with the same output shapes
+
+    def order_metrics(self, mask: np.ndarray) -> dict:
+        monthly = self.order_cells[mask].groupby("month", sort=True)[
+            ["orders", "net_revenue", "total_discounts", "rate_sum", "rate_count"]].sum()
+        order_month = _months(monthly.index)
+        orders, revenue = monthly["orders"].to_numpy(), monthly["net_revenue"].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aov = revenue / orders
+            discount_rate = monthly["rate_sum"].to_numpy() / monthly["rate_count"].to_numpy()
+        return {
+            "monthly_net_revenue": pd.DataFrame({"order_month": order_month, "net_revenue": revenue}),
+            "monthly_aov": pd.DataFrame({"order_month": order_month, "total_revenue": revenue,
+                                         "total_orders": orders, "aov": aov}),
+            "discount_rate_trend": pd.DataFrame({"order_month": order_month, "discount_rate": discount_rate}),
+            "monthly_summary": pd.DataFrame({
+                "order_month": order_month,
+                "total_orders": orders,
+                "total_revenue": revenue.round(2),
+                "total_discounts": monthly["total_discounts"].to_numpy().round(2),
+                "aov": aov.round(2),
+            }),
+        }
+
+    def product_metrics(self, mask: np.ndarray) -> dict:
+        cells = self.product_cells[mask]
+        trend = cells.groupby(["month", "category"], observed=True, sort=True)["net_price"].sum().reset_index()
+        trend = pd.DataFrame({"order_month": _months(trend["month"]),
+                              "product_category": trend["category"].astype(str).to_numpy(),
+                              "net_price": trend["net_price"].to_numpy()})
+        # Countries in category order, like get_geo_revenue
+        geo = cells.groupby("country", observed=True, sort=True)["net_price"].sum()
+        country = geo.index.astype(str)
+        return {
+            "category_revenue_trend": trend,
+            "monthly_category_trends": trend.copy(),
+            "geo_revenue": pd.DataFrame({"country": country, "iso3": iso3_codes(country),
+                                         "revenue": geo.to_numpy()}),
+        }
+
+
+def view_rows(df: pd.DataFrame, view: str) -> pd.DataFrame:
+    """The rows of an order- or line-item-level frame in the revenue view."""
+    status = REVENUE_VIEWS[view]
+    if status is None:
+        return df
+    if 'order_status' in df.columns:
+        return df[df['order_status'] == status]
+    return df[df['cancelled_at'].notna() == (status == "Cancelled")]
+
+
+def revenue_metrics(
+    rollups: RevenueRollups,
+    view: str,
+    order_df: pd.DataFrame,
+    product_df: pd.DataFrame,
+    products=None,
+    categories=None,
+    types=None,
+    countries=None,
+    statuses=None,
+    orders=None,
+    customers=None,
+    date_range=None,
+) -> dict:
+    """
+    Revenue metrics in the view for the sidebar filters (filters.apply_filters
+    keywords), for run_metrics(precomputed=...). order_df and product_df are
+    the filtered frames: they are only read for the metrics the cells cannot
+    answer, and only when the view is not "all" (run_metrics computes those
+    from the filtered frames as usual).
+    """
+    results = {}
+    order_side = not (orders or customers)
+    product_side = not products
+    if order_side:
+        results.update(rollups.order_metrics(rollups.order_mask(view, countries, statuses, date_range)))
+    if product_side:
+        results.update(rollups.product_metrics(rollups.product_mask(view, categories, types, date_range)))
+    if view != "all":
+        rest = [name for name in (*ORDER_METRICS, *PRODUCT_METRICS) if name not in results]
+        if rest:
+            results.update(run_metrics(rest, view_rows(order_df, view), view_rows(product_df, view),
+                                       executor="serial"))
+    return results
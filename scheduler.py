@@ -0,0 +1,253 @@
+# scheduler.py
+import atexit
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import resource_tracker, shared_memory
+from typing import NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+
+from config import ANALYSIS_ENGINE, METRIC_EXECUTOR, METRIC_WORKERS
+from instrumentation import StageRecorder
+
+if ANALYSIS_ENGINE == "duckdb":
+    import duckdb_engine as analysis
+elif ANALYSIS_ENGINE == "pandas":
+    import analysis
+else:
+    raise ValueError(f"Unknown analysis engine: {ANALYSIS_ENGINE}")
+
+
+def _month1_churn(retention_curves: tuple) -> pd.DataFrame:
+    # prepare_retention_curves returns the long retention frame as its last element
+    return analysis.calculate_month1_churn(retention_curves[-1])
+
+
+# name -> (function, inputs). Inputs are "orders", "products" or other metric names.
+METRICS = {
+    "retention_matrix": (analysis.calculate_retention_matrix, ("orders",)),
+    "month1_retention": (analysis.calculate_month1_retention, ("retention_matrix",)),
+    "retention_curves": (analysis.prepare_retention_curves, ("retention_matrix",)),
+    "month1_churn": (_month1_churn, ("retention_curves",)),
+    "cohort_sizes": (analysis.calculate_cohort_sizes, ("orders",)),
+    "avg_revenue_by_cohort": (analysis.calculate_avg_revenue_by_cohort, ("orders",)),
+    "days_to_second_order": (analysis.calculate_days_to_second_order, ("orders",)),
+    "rfm": (analysis.perform_rfm_segmentation, ("orders",)),
+    "rfm_segment_counts": (analysis.get_rfm_segment_counts, ("rfm",)),
+    "revenue_by_order_type": (analysis.get_revenue_by_order_type, ("orders",)),
+    "monthly_aov": (analysis.get_monthly_aov, ("orders",)),
+    "top_products": (analysis.get_top_products_by_revenue, ("products",)),
+    "avg_price_per_category": (analysis.get_avg_price_per_category, ("products",)),
+    "top_categories_by_units": (analysis.get_top_categories_by_units_sold, ("products",)),
+    "category_revenue_trend": (analysis.get_category_revenue_trend, ("products",)),
+    "monthly_category_trends": (analysis.calculate_monthly_category_trends, ("products",)),
+    "geo_revenue": (analysis.get_geo_revenue, ("products",)),
+    "new_vs_returning": (analysis.get_new_vs_returning_user_counts, ("orders",)),
+    "monthly_net_revenue": (analysis.get_monthly_net_revenue, ("orders",)),
+    "discount_rate_trend": (analysis.get_discount_rate_trend, ("orders",)),
+    "monthly_summary": (analysis.calculate_monthly_summary_table, ("orders",)),
+    "retention_by_discount": (analysis.get_retention_by_discount_level, ("orders",)),
+}
+
+FRAMES = ("orders", "products")
+
+# Metrics that bucket customers into cohorts and take a granularity ("day", "week", "month", "quarter");
+# month1_retention, retention_curves and month1_churn follow the granularity of the matrix they get
+COHORT_METRICS = ("retention_matrix", "cohort_sizes", "avg_revenue_by_cohort", "retention_by_discount")
+
+
+def _metric(name: str, granularity: str):
+    func, inputs = METRICS[name]
+    if name in COHORT_METRICS and granularity != "month":
+        func = partial(func, granularity=granularity)
+    return func, inputs
+
+
+def resolve_metrics(names) -> list[str]:
+    """Return the requested metrics plus everything they depend on, dependencies first."""
+    ordered = []
+
+    def visit(name):
+        if name in FRAMES or name in ordered:
+            return
+        if name not in METRICS:
+            raise KeyError(f"Unknown metric: {name}")
+        for dep in METRICS[name][1]:
+            visit(dep)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return ordered
+
+
+class _SharedFrame(NamedTuple):
+    name: str
+    size: int
+
+
+def _share_frame(df: pd.DataFrame) -> tuple[shared_memory.SharedMemory, _SharedFrame]:
+    # Serialize once into a shared memory block so workers read it instead of unpickling a copy
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    buf = sink.getvalue()
+
+    shm = shared_memory.SharedMemory(create=True, size=max(buf.size, 1))
+    shm.buf[:buf.size] = memoryview(buf).cast("B")
+    return shm, _SharedFrame(shm.name, buf.size)
+
+
+_attached = {}
+_register_lock = threading.Lock()
+
+
+def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+    # Fallback for Python < 3.13, which has no track flag and registers every attachment with the resource
+    # tracker; the tracker then unlinks (or warns about) the parent's block. The registration is skipped by
+    # swapping out resource_tracker.register for the duration of the attach, under a lock so no other
+    # thread of the worker registers a block of its own meanwhile. Unregistering afterwards is no
+    # substitute: workers share the parent's tracker, so that would drop the parent's own registration.
+    with _register_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _attach_frame(ref: _SharedFrame) -> pd.DataFrame:
+    # Workers keep their attachment open: to_pandas can hand out zero-copy views of the block
+    if ref.name not in _attached:
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=ref.name, track=False)
+        else:
+            shm = _attach_untracked(ref.name)
+        reader = pa.ipc.open_stream(pa.py_buffer(shm.buf)[:ref.size])
+        _attached[ref.name] = (shm, reader.read_all().to_pandas())
+    return _attached[ref.name][1]
+
+
+def _run_in_worker(func, args, blocks: frozenset = frozenset()):
+    # Workers outlive a run: let go of the blocks of earlier runs (the parent has unlinked them)
+    for name in [name for name in _attached if name not in blocks]:
+        del _attached[name]
+    args = [_attach_frame(a) if isinstance(a, _SharedFrame) else a for a in args]
+    return func(*args)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _process_pool(max_workers: int | None) -> ProcessPoolExecutor:
+    # One pool per process and worker count, reused by every run so a rerun does not pay worker start-up
+    with _pools_lock:
+        if max_workers not in _pools:
+            _pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers)
+        return _pools[max_workers]
+
+
+@atexit.register
+def _shutdown_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
+
+
+def run_metrics(
+    names,
+    order_df: pd.DataFrame,
+    product_df: pd.DataFrame,
+    executor: str = METRIC_EXECUTOR,
+    max_workers: int | None = METRIC_WORKERS,
+    recorder: StageRecorder | None = None,
+    granularity: str = "month",
+    precomputed: dict | None = None,
+) -> dict:
+    """
+    Compute the given metrics (and their dependencies) concurrently.
+    A metric is submitted as soon as all of its inputs are available, so the
+    wall-clock time approaches that of the slowest dependency chain.
+    When a recorder is given, every metric call is recorded as one event.
+    granularity sets the cohort period of the COHORT_METRICS.
+    precomputed maps metric names to results obtained elsewhere (e.g. from
+    sketches.py); they are not recomputed and their dependents use them.
+    Returns a dict of metric name -> result.
+    """
+    wanted = resolve_metrics(names)
+    precomputed = precomputed or {}
+    order = [name for name in wanted if name not in precomputed]
+    frames = {"orders": order_df, "products": product_df}
+
+    if executor == "serial":
+        results = {**frames, **precomputed}
+        for name in order:
+            func, inputs = _metric(name, granularity)
+            args = [results[i] for i in inputs]
+            results[name] = recorder.run(name, func, *args) if recorder is not None else func(*args)
+        return {name: results[name] for name in wanted}
+
+    blocks = []
+    if executor == "process":
+        pool = _process_pool(max_workers)
+        for key in FRAMES:
+            if any(key in METRICS[name][1] for name in order):
+                shm, ref = _share_frame(frames[key])
+                blocks.append(shm)
+                frames[key] = ref
+    elif executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+        raise ValueError(f"Unknown executor: {executor}")
+
+    results = {**frames, **precomputed}
+    pending = list(order)
+    running = {}
+    submitted_at = {}
+    block_names = frozenset(shm.name for shm in blocks)
+    try:
+        while pending or running:
+            for name in [n for n in pending if all(i in results for i in METRICS[n][1])]:
+                func, inputs = _metric(name, granularity)
+                args = [results[i] for i in inputs]
+                if executor == "process":
+                    future = pool.submit(_run_in_worker, func, args, block_names)
+                elif recorder is not None:
+                    future = pool.submit(recorder.run, name, func, *args)
+                else:
+                    future = pool.submit(func, *args)
+                running[future] = name
+                submitted_at[name] = (time.time(), time.perf_counter())
+                pending.remove(name)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+                if executor == "process" and recorder is not None:
+                    # Timed from the parent: includes the hand-off to and from the worker
+                    started_at, started = submitted_at[name]
+                    recorder.add(name, started_at, time.perf_counter() - started, results[name])
+    except BrokenProcessPool:
+        # A worker died: the next run starts a fresh pool
+        with _pools_lock:
+            if _pools.get(max_workers) is pool:
+                del _pools[max_workers]
+        raise
+    finally:
+        if executor == "thread":
+            pool.shutdown()
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    return {name: results[name] for name in wanted}
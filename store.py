@@ -0,0 +1,125 @@
+# store.py
+"""
+Time-sorted, memory-mapped copy of the cleaned datasets.
+
+prepare_cleaned_datasets runs once; its two frames are written, sorted by
+processed_at, as uncompressed Arrow IPC (Feather v2) files. Every dashboard
+process then memory-maps the same files, so the column buffers live once in
+the OS page cache instead of once per worker, and a date range is two
+binary searches and a zero-copy row slice instead of a boolean scan.
+
+The store also holds the revenue rollups (rollups.py) built from the same
+frames, so the cancellation-aware revenue views are ready without a scan.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+from config import BACKEND, DATA_DIR, STORE_DIR
+from instrumentation import StageRecorder
+from rollups import RevenueRollups
+from transform import prepare_cleaned_datasets
+
+FILES = {"product_level": "product_level.arrow", "order_level": "order_level.arrow"}
+ROLLUP_FILES = {"order_cells": "order_rollup.arrow", "product_cells": "product_rollup.arrow"}
+SOURCES = ("orders.parquet", "products.parquet")
+SORT_KEY = "processed_at"
+# Bumped whenever the pipeline's output columns change, so stores written by older code are rebuilt
+FORMAT_VERSION = b"7"
+
+
+def _write_table(df: pd.DataFrame, path: str, sort_key: str | None = SORT_KEY, backend: str = BACKEND) -> None:
+    # NaT first: it is the smallest int64 timestamp, so the column stays sorted for searchsorted
+    if sort_key is not None:
+        df = df.sort_values(sort_key, kind="stable", na_position="first").reset_index(drop=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # The column storage the frames were built with is part of the format: pandas reads the dtypes back as written
+    table = table.replace_schema_metadata({**table.schema.metadata, b"fitlytics_store_version": FORMAT_VERSION,
+                                           b"fitlytics_store_backend": backend.encode()})
+    # Written beside the target and renamed, so processes mapping the old file never see a partial one
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def write_store(
+    product_level_df: pd.DataFrame, order_level_df: pd.DataFrame, store_dir: str = STORE_DIR, backend: str = BACKEND
+) -> None:
+    os.makedirs(store_dir, exist_ok=True)
+    _write_table(product_level_df, os.path.join(store_dir, FILES["product_level"]), backend=backend)
+    _write_table(order_level_df, os.path.join(store_dir, FILES["order_level"]), backend=backend)
+    rollups = RevenueRollups.from_frames(product_level_df, order_level_df)
+    for name, filename in ROLLUP_FILES.items():
+        _write_table(getattr(rollups, name), os.path.join(store_dir, filename), sort_key=None, backend=backend)
+
+
+def _read_table(path: str) -> pd.DataFrame:
+    # The table's buffers point into the mapping; split_blocks keeps to_pandas from consolidating (copying) them
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    df = table.to_pandas(split_blocks=True)
+    df.attrs["sorted_by"] = SORT_KEY
+    return df
+
+
+def open_store(store_dir: str = STORE_DIR) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Memory-map the stored (product_level_df, order_level_df), both sorted by processed_at."""
+    return (_read_table(os.path.join(store_dir, FILES["product_level"])),
+            _read_table(os.path.join(store_dir, FILES["order_level"])))
+
+
+def _is_current(path: str, backend: str) -> bool:
+    # Written by this format version from frames built with this backend
+    with pa.memory_map(path, "r") as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return (metadata.get(b"fitlytics_store_version") == FORMAT_VERSION
+            and metadata.get(b"fitlytics_store_backend") == backend.encode())
+
+
+def load_rollups(
+    product_level_df: pd.DataFrame, order_level_df: pd.DataFrame, store_dir: str = STORE_DIR, backend: str = BACKEND
+) -> RevenueRollups:
+    """The revenue rollups of the store, or built from the frames when there is no current store."""
+    paths = [os.path.join(store_dir, filename) for filename in ROLLUP_FILES.values()] if store_dir else []
+    if not paths or not all(os.path.exists(path) and _is_current(path, backend) for path in paths):
+        return RevenueRollups.from_frames(product_level_df, order_level_df)
+    return RevenueRollups(*(pa.ipc.open_file(pa.memory_map(path, "r")).read_all().to_pandas() for path in paths))
+
+
+def is_fresh(data_dir: str = DATA_DIR, store_dir: str = STORE_DIR, backend: str = BACKEND) -> bool:
+    """
+    True when the store exists, has the current format, was built with the
+    given backend and is newer than the parquet files it was built from.
+    """
+    stored = [os.path.join(store_dir, name) for name in (*FILES.values(), *ROLLUP_FILES.values())]
+    if not all(os.path.exists(path) for path in stored):
+        return False
+    if not all(_is_current(path, backend) for path in stored):
+        return False
+    sources = [os.path.join(data_dir, name) for name in SOURCES]
+    return min(os.path.getmtime(p) for p in stored) >= max(os.path.getmtime(p) for p in sources)
+
+
+def source_version(data_dir: str = DATA_DIR) -> tuple:
+    """(mtime, size) of each source parquet file: changes whenever the cleaned datasets would."""
+    stats = [os.stat(os.path.join(data_dir, name)) for name in SOURCES]
+    return tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+
+def load_datasets(
+    data_dir: str = DATA_DIR, store_dir: str = STORE_DIR, recorder: StageRecorder | None = None, backend: str = BACKEND
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (product_level_df, order_level_df) from the memory-mapped store, building
+    it first when missing or stale. An empty store_dir skips the store and
+    returns prepare_cleaned_datasets' in-memory frames.
+    """
+    if not store_dir:
+        return prepare_cleaned_datasets(data_dir, recorder=recorder, backend=backend)
+    if not is_fresh(data_dir, store_dir, backend):
+        write_store(*prepare_cleaned_datasets(data_dir, recorder=recorder, backend=backend), store_dir, backend)
+    if recorder is not None:
+        return recorder.run("open_store", open_store, store_dir)
+    return open_store(store_dir)
+
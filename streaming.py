@@ -0,0 +1,159 @@
+# streaming.py
+"""
+Out-of-core variant of prepare_cleaned_datasets for order histories that do
+not fit in memory.
+
+    python streaming.py --data-dir data --output processed --batch-size 500000
+
+orders.parquet is read in record batches. A first pass over the key columns
+only builds the cross-chunk state: which rows survive deduplication (found
+per hash partition by dedup.py) and each customer's first order date. The
+second pass cleans, explodes and allocates discounts one batch at a time
+(orders are self-contained) and appends the product-level and order-level
+rows to parquet files, so peak memory is one batch plus that state.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import DATA_DIR
+from dedup import DEFAULT_PARTITIONS, deduplicate_order_file
+from dimensions import encode_countries, encode_products
+from instrumentation import StageRecorder
+from loader import HOT_ORDER_COLUMNS, load_products
+from transform import (
+    add_customer_columns,
+    clean_orders,
+    clean_products,
+    create_order_level_df,
+    create_product_level_df,
+    enrich_orders_with_products,
+)
+
+DEFAULT_BATCH_SIZE = 500_000
+
+
+def scan_order_keys(
+    orders_path: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    n_partitions: int = DEFAULT_PARTITIONS,
+    workers: int | None = None,
+) -> tuple[np.ndarray, pd.Series]:
+    """
+    First pass over order_number, customer_id and processed_at.
+    Returns the sorted positions of the rows deduplicate_orders would keep,
+    and customer_id -> first processed_at over those rows.
+    """
+    keys = deduplicate_order_file(orders_path, ['processed_at'], n_partitions, workers, batch_size)
+
+    keys['processed_at'] = pd.to_datetime(keys['processed_at'], errors='coerce')
+    first_order_dates = keys[keys['order_number'].notna()].groupby('customer_id')['processed_at'].min()
+    return keys['_row'].to_numpy(), first_order_dates
+
+
+def _append(writers: dict, name: str, path: str, df: pd.DataFrame) -> None:
+    if name not in writers:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        writers[name] = pq.ParquetWriter(path, table.schema)
+    else:
+        # Cast to the first batch's schema so all-null columns keep their type
+        table = pa.Table.from_pandas(df, schema=writers[name].schema, preserve_index=False)
+    writers[name].write_table(table)
+
+
+def process_order_batches(
+    orders_path: str,
+    products: pd.DataFrame,
+    keep_rows: np.ndarray,
+    first_order_dates: pd.Series,
+    output_dir: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """Second pass: run the per-order stages batch by batch and append the results. Returns row counts."""
+    writers = {}
+    counts = {"orders": 0, "product_level": 0, "order_level": 0}
+    offset = 0
+    try:
+        for batch in pq.ParquetFile(orders_path).iter_batches(batch_size, columns=HOT_ORDER_COLUMNS):
+            orders = batch.to_pandas()
+            lo, hi = np.searchsorted(keep_rows, [offset, offset + len(orders)])
+            keep = np.zeros(len(orders), dtype=bool)
+            keep[keep_rows[lo:hi] - offset] = True
+            offset += len(orders)
+            counts["orders"] += len(orders)
+
+            orders = clean_orders(orders[keep]).reset_index(drop=True)
+            if orders.empty:
+                continue
+            enriched = enrich_orders_with_products(orders, products)
+            product_level_df = create_product_level_df(enriched)
+            order_level_df = create_order_level_df(product_level_df)
+            order_level_df = add_customer_columns(order_level_df, first_order_dates)
+
+            _append(writers, "product_level", os.path.join(output_dir, "product_level.parquet"), product_level_df)
+            _append(writers, "order_level", os.path.join(output_dir, "order_level.parquet"), order_level_df)
+            counts["product_level"] += len(product_level_df)
+            counts["order_level"] += len(order_level_df)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def prepare_cleaned_datasets_chunked(
+    data_dir: str = DATA_DIR,
+    output_dir: str = "processed",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    recorder: StageRecorder | None = None,
+    n_partitions: int = DEFAULT_PARTITIONS,
+    workers: int | None = None,
+) -> dict:
+    """
+    Streaming equivalent of transform.prepare_cleaned_datasets. Writes
+    product_level.parquet and order_level.parquet into output_dir and returns
+    their row counts. Rows match the in-memory pipeline; order-level rows are
+    sorted by order_number within each batch rather than globally.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    orders_path = os.path.join(data_dir, "orders.parquet")
+    stage = recorder.run if recorder is not None else (lambda name, func, *args: func(*args))
+
+    products = stage("clean_products", clean_products, load_products(data_dir, "numpy"))
+    keep_rows, first_order_dates = stage("scan_order_keys", scan_order_keys,
+                                         orders_path, batch_size, n_partitions, workers)
+    return stage("process_order_batches", process_order_batches,
+                 orders_path, products, keep_rows, first_order_dates, output_dir, batch_size)
+
+
+def load_processed_datasets(output_dir: str = "processed") -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Read the output of prepare_cleaned_datasets_chunked back as (product_level_df, order_level_df)."""
+    product_level_df = pd.read_parquet(os.path.join(output_dir, "product_level.parquet"))
+    order_level_df = pd.read_parquet(os.path.join(output_dir, "order_level.parquet"))
+    encode_countries(product_level_df, order_level_df)
+    encode_products(product_level_df)
+    return product_level_df, order_level_df
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the transform pipeline over orders.parquet in batches.")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output", default="processed", help="Folder for product_level/order_level parquet files")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Orders per record batch")
+    parser.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS, help="Hash partitions for deduplication")
+    parser.add_argument("--workers", type=int, default=None, help="Processes deduplicating partitions")
+    args = parser.parse_args(argv)
+
+    recorder = StageRecorder()
+    counts = prepare_cleaned_datasets_chunked(args.data_dir, args.output, args.batch_size, recorder,
+                                              args.partitions, args.workers)
+    for event in recorder.events:
+        print(f"{event.stage:<22} {event.wall_s:>8.2f}s")
+    print(f"{counts['orders']} orders -> {counts['product_level']} product rows, {counts['order_level']} order rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# tests/conftest.py
+import pytest
+
+from benchmarks.synthetic import generate_dataset
+from transform import prepare_cleaned_datasets
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory) -> str:
+    """A small synthetic data folder (orders.parquet, products.parquet), shared by the whole run."""
+    path = tmp_path_factory.mktemp("data")
+    generate_dataset(str(path), n_line_items=20_000, n_products=100)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def cleaned(data_dir) -> tuple:
+    """(product_level_df, order_level_df) of the synthetic data, as the pipeline builds them."""
+    return prepare_cleaned_datasets(data_dir)
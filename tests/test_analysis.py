@@ -0,0 +1,41 @@
+# tests/test_analysis.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import _quartile_scores, perform_rfm_segmentation
+
+
+def test_quartile_scores_match_qcut_without_ties():
+    values = pd.Series(np.random.default_rng(0).normal(size=101))
+    expected = pd.qcut(values, 4, labels=[4, 3, 2, 1]).astype(int)
+    pd.testing.assert_series_equal(_quartile_scores(values, [4, 3, 2, 1]), expected)
+
+
+def test_quartile_scores_with_tied_values():
+    # Three of the quartile edges are 10: qcut raises on the duplicate edges, the scores keep the two bins left
+    values = pd.Series([10.0] * 6 + [20.0, 30.0])
+    with pytest.raises(ValueError):
+        pd.qcut(values, 4, labels=[1, 2, 3, 4])
+
+    scores = _quartile_scores(values, [1, 2, 3, 4])
+    assert scores.tolist() == [1] * 6 + [2, 2]
+    assert _quartile_scores(values, [4, 3, 2, 1]).tolist() == [4] * 6 + [3, 3]
+
+
+def test_quartile_scores_with_one_distinct_value():
+    assert _quartile_scores(pd.Series([5.0, 5.0, 5.0]), [4, 3, 2, 1]).tolist() == [4, 4, 4]
+
+
+def test_rfm_segmentation_with_tied_monetary_values():
+    # Every customer spent the same: one Monetary level instead of a ValueError
+    orders = pd.DataFrame({
+        "customer_id": [1, 2, 3, 4, 5, 5],
+        "order_number": [1, 2, 3, 4, 5, 6],
+        "processed_at": pd.to_datetime(["2020-01-01", "2020-02-01", "2020-03-01", "2020-04-01",
+                                        "2020-05-01", "2020-06-01"], utc=True),
+        "net_revenue": [50.0, 50.0, 50.0, 50.0, 25.0, 25.0],
+    })
+    rfm = perform_rfm_segmentation(orders)
+    assert rfm["M_Score"].tolist() == [1] * 5
+    assert sorted(rfm["R_Score"].unique()) == [1, 2, 3, 4]
@@ -0,0 +1,61 @@
+# tests/test_arrow_backend.py
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from arrow_backend import clean_orders_arrow
+from loader import HOT_ORDER_COLUMNS, load_orders
+from transform import clean_orders, prepare_cleaned_datasets
+
+
+@pytest.fixture(scope="module")
+def chunked_orders(data_dir) -> pd.DataFrame:
+    # Concatenating Arrow-backed frames keeps each piece as its own chunk, as reading several row groups does
+    orders = load_orders(data_dir, "arrow", HOT_ORDER_COLUMNS)
+    bounds = [0, len(orders) // 3, 2 * len(orders) // 3, len(orders)]
+    return pd.concat([orders.iloc[lo:hi] for lo, hi in zip(bounds, bounds[1:])], ignore_index=True)
+
+
+@pytest.fixture(scope="module")
+def row_group_dir(data_dir, tmp_path_factory) -> str:
+    # The same data with orders.parquet split into several row groups, which the arrow backend reads as chunks
+    path = tmp_path_factory.mktemp("row_groups")
+    table = pq.read_table(os.path.join(data_dir, "orders.parquet"))
+    pq.write_table(table, os.path.join(path, "orders.parquet"), row_group_size=4_000)
+    shutil.copy(os.path.join(data_dir, "products.parquet"), path)
+    return str(path)
+
+
+def _numpy_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    # The arrow backend keeps numbers and strings as ArrowDtype; compare values, not storage
+    df = df.copy()
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.ArrowDtype):
+            df[col] = df[col].astype(str if pa.types.is_string(dtype.pyarrow_dtype) else dtype.numpy_dtype)
+    return df
+
+
+def test_clean_orders_arrow_on_chunked_countries(data_dir, chunked_orders):
+    countries = pa.array(chunked_orders["billing_address_country"])
+    assert isinstance(countries, pa.ChunkedArray) and countries.num_chunks == 3
+
+    got = clean_orders_arrow(chunked_orders)["billing_address_country"]
+    expected = clean_orders(load_orders(data_dir, "numpy", HOT_ORDER_COLUMNS))["billing_address_country"]
+    pd.testing.assert_series_equal(got.astype(str), expected.astype(str))
+
+
+@pytest.mark.parametrize("source", ["data_dir", "row_group_dir"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_arrow_backend_matches_numpy(request, cleaned, source, workers):
+    source_dir = request.getfixturevalue(source)
+    if source == "row_group_dir":
+        assert pq.ParquetFile(os.path.join(source_dir, "orders.parquet")).num_row_groups > 1
+
+    product_level_df, order_level_df = prepare_cleaned_datasets(source_dir, workers=workers, backend="arrow")
+    pd.testing.assert_frame_equal(_numpy_dtypes(product_level_df), cleaned[0])
+    pd.testing.assert_frame_equal(_numpy_dtypes(order_level_df), cleaned[1])
@@ -0,0 +1,73 @@
+# tests/test_customers.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import store
+from analysis import calculate_days_to_second_order, perform_rfm_segmentation
+from customers import CustomerIndex
+from filters import filter_rows
+
+
+@pytest.fixture(scope="module", params=["frames", "store"])
+def frames(request, cleaned, tmp_path_factory) -> tuple:
+    # The pipeline's frames, and the processed_at-sorted store where date filters are row slices
+    if request.param == "frames":
+        return cleaned
+    store_dir = str(tmp_path_factory.mktemp("store"))
+    store.write_store(*cleaned, store_dir)
+    return store.open_store(store_dir)
+
+
+@pytest.fixture(scope="module")
+def index(frames) -> CustomerIndex:
+    return CustomerIndex(*frames)
+
+
+def test_summary_matches_rfm_segmentation(frames, index):
+    rfm = perform_rfm_segmentation(frames[1])
+    summary = index.summary
+    np.testing.assert_array_equal(summary["customer_id"], rfm["customer_id"])
+    expected = rfm.drop(columns="customer_id").rename(columns={"Frequency": "orders", "Monetary": "lifetime_revenue"})
+    pd.testing.assert_frame_equal(summary[expected.columns].astype({"Segment": str}), expected, check_dtype=False)
+
+
+def test_days_to_second_order_match(frames, index):
+    expected = calculate_days_to_second_order(frames[1]).set_index("customer_id")["days_to_second_order"]
+    got = index.summary.set_index("customer_id")["days_to_second_order"].dropna()
+    pd.testing.assert_series_equal(got.sort_index().astype(int), expected.sort_index().astype(int), check_names=False)
+
+
+def test_customer_history(frames, index):
+    product_level_df, order_level_df = frames
+    customer = index.ids[len(index.ids) // 2]
+    history = order_level_df[order_level_df["customer_id"] == customer].sort_values("processed_at", kind="stable")
+    assert index.orders(customer)["order_number"].tolist() == history["order_number"].tolist()
+    assert index.profile(customer)["lifetime_revenue"] == pytest.approx(history["net_revenue"].sum())
+    assert sorted(index.line_items(customer)["order_number"]) == \
+        sorted(product_level_df.loc[product_level_df["customer_id"] == customer, "order_number"])
+
+
+def test_unknown_customers(index):
+    assert index.profile(-1) is None
+    assert index.orders(-1).empty and index.line_items(-1).empty
+    assert len(index.order_rows([])) == 0 and len(index.order_rows([-1])) == 0
+
+
+def _positions(rows, n: int) -> np.ndarray:
+    return np.arange(n)[rows] if isinstance(rows, slice) else np.asarray(rows)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_filter_rows_with_index_matches_scan(frames, index, seed):
+    product_level_df, order_level_df = frames
+    rng = np.random.default_rng(seed)
+    selection = {"customers": [*rng.choice(index.ids, rng.integers(1, 5)), *([12345678901] if seed % 4 == 0 else [])]}
+    if seed % 2:
+        selection["date_range"] = ("2020-03-01", "2020-11-30")
+    if seed % 3 == 0:
+        selection["statuses"] = ["Delivered"]
+    scanned = filter_rows(product_level_df, order_level_df, **selection)
+    indexed = filter_rows(product_level_df, order_level_df, customer_index=index, **selection)
+    for rows, other, df in zip(scanned, indexed, frames):
+        np.testing.assert_array_equal(_positions(rows, len(df)), _positions(other, len(df)))
@@ -0,0 +1,36 @@
+# tests/test_dedup.py
+import os
+
+import pandas as pd
+import pytest
+
+from dedup import deduplicate_order_file, deduplicate_orders_partitioned
+from loader import load_orders
+from transform import deduplicate_orders
+
+
+@pytest.fixture(scope="module")
+def orders(data_dir) -> pd.DataFrame:
+    return load_orders(data_dir, "numpy")
+
+
+@pytest.fixture(scope="module")
+def expected(orders) -> pd.DataFrame:
+    return deduplicate_orders(orders)
+
+
+def test_synthetic_orders_have_duplicates(orders, expected):
+    assert len(expected) < len(orders)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("n_partitions", [1, 4, 16])
+def test_partitioned_matches_single_frame(orders, expected, n_partitions, workers):
+    pd.testing.assert_frame_equal(deduplicate_orders_partitioned(orders, n_partitions, workers), expected)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_spilled_file_matches_single_frame(data_dir, orders, expected, workers):
+    kept = deduplicate_order_file(os.path.join(data_dir, "orders.parquet"), None, 4, workers, batch_size=3_000)
+    pd.testing.assert_frame_equal(kept.drop(columns="_row"), expected[kept.columns.drop("_row")])
+    pd.testing.assert_frame_equal(orders.iloc[kept["_row"]].reset_index(drop=True), expected)
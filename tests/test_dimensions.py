@@ -0,0 +1,55 @@
+# tests/test_dimensions.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from dimensions import ISO3, UNKNOWN, normalize_countries, normalize_country, repair_encoding
+
+ACCENTED = [name for name in ISO3 if not name.isascii()]
+
+
+def _mojibake(name: str) -> list[str]:
+    # The name's UTF-8 bytes read back with each code page that can decode them
+    variants = []
+    for encoding in ("cp1252", "latin-1", "mac_roman"):
+        try:
+            variants.append(name.encode("utf-8").decode(encoding))
+        except UnicodeError:
+            pass
+    return variants
+
+
+@pytest.mark.parametrize("name", ACCENTED)
+def test_mojibake_round_trips_to_iso3_name(name):
+    variants = _mojibake(name)
+    assert variants
+    for variant in variants:
+        assert normalize_country(variant) == name
+        assert normalize_country(variant.replace("'", "&#39;")) == name
+
+
+@pytest.mark.parametrize("name", list(ISO3))
+def test_correct_names_are_unchanged(name):
+    assert normalize_country(name) == name
+
+
+@pytest.mark.parametrize("broken, fixed", [
+    ("CÃ´te d'Ivoire", "Côte d'Ivoire"),
+    ("CuraÃ§ao", "Curaçao"),
+    ("RÃ©union", "Réunion"),
+    ("St. BarthÃ©lemy", "St. Barthélemy"),
+    ("C√¥te d&#39;Ivoire", "Côte d'Ivoire"),
+    ("Côte d’Ivoire", "Côte d'Ivoire"),
+])
+def test_known_variants(broken, fixed):
+    assert normalize_country(broken) == fixed
+
+
+def test_repair_keeps_text_that_is_not_mojibake():
+    assert repair_encoding("Zürich") == "Zürich"
+    assert repair_encoding("  Germany ") == "Germany"
+
+
+def test_missing_countries_are_unknown_and_empty_names_are_kept():
+    countries = pd.Series(["Germany", None, "", "CÃ´te d'Ivoire", np.nan], dtype=object)
+    assert normalize_countries(countries).tolist() == ["Germany", UNKNOWN, "", "Côte d'Ivoire", UNKNOWN]
@@ -0,0 +1,70 @@
+# tests/test_downsample.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample, lttb_indices, numeric_x
+
+
+def _reference_lttb(x, y, n_out) -> list[int]:
+    # Largest-Triangle-Three-Buckets as published (Steinarsson, 2013), one point at a time
+    n = len(x)
+    selected, a = [0], 0
+    for i in range(n_out - 2):
+        # Bucket i starts at floor(i * (n - 2) / (n_out - 2)) + 1
+        lo, hi = i * (n - 2) // (n_out - 2) + 1, (i + 1) * (n - 2) // (n_out - 2) + 1
+        next_lo, next_hi = hi, min((i + 2) * (n - 2) // (n_out - 2) + 1, n)
+        avg_x = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+        avg_y = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+        areas = [abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) for j in range(lo, hi)]
+        a = lo + int(np.argmax(areas))
+        selected.append(a)
+    return selected + [n - 1]
+
+
+@pytest.mark.parametrize("n, n_out", [(1000, 50), (997, 3), (500, 499), (20, 7)])
+def test_lttb_matches_reference(n, n_out):
+    rng = np.random.default_rng(n)
+    # Irregular spacing: triangles depend on the actual x
+    x = np.cumsum(rng.exponential(1.0, n))
+    y = rng.normal(size=n).cumsum()
+    assert lttb_indices(x, y, n_out).tolist() == _reference_lttb(x.tolist(), y.tolist(), n_out)
+
+
+def test_lttb_keeps_short_series_and_spikes():
+    assert lttb_indices(np.arange(10), np.zeros(10), 10).tolist() == list(range(10))
+    y = np.zeros(10_000)
+    y[4321] = 100
+    kept = lttb_indices(np.arange(10_000), y, 100)
+    assert len(kept) == 100 and kept[0] == 0 and kept[-1] == 9_999 and 4321 in kept
+
+
+def test_numeric_x_keeps_date_spacing():
+    months = numeric_x(np.array(["2020-01", "2020-02", "2020-06"], dtype=object))
+    np.testing.assert_allclose(np.diff(months) / 86_400e9, [31, 121])
+    weeks = numeric_x(pd.period_range("2020-01-06", periods=3, freq="W").astype(str).to_numpy())
+    np.testing.assert_allclose(np.diff(weeks) / 86_400e9, [7, 7])
+    np.testing.assert_array_equal(numeric_x(np.array(["High", "Low"], dtype=object)), [0, 1])
+
+
+def test_downsample_uses_timestamps_as_x():
+    rng = np.random.default_rng(0)
+    # Daily points with a three-month gap in the middle
+    days = pd.date_range("2020-01-01", "2021-12-31", freq="D")
+    days = days[(days < "2020-09-01") | (days >= "2020-12-01")]
+    df = pd.DataFrame({"order_month": days.strftime("%Y-%m-%d"), "net_revenue": rng.gamma(2.0, 100.0, len(days))})
+    out = downsample(df.sample(frac=1, random_state=0), "order_month", "net_revenue", n_points=60)
+
+    x = days.to_numpy().astype(np.int64).astype(float)
+    expected = df.iloc[_reference_lttb(x.tolist(), df["net_revenue"].tolist(), 60)]
+    pd.testing.assert_frame_equal(out, expected)
+
+
+def test_stacked_series_keep_the_same_x():
+    rng = np.random.default_rng(1)
+    x = np.arange(2_000)
+    df = pd.DataFrame({"period_number": np.tile(x, 3), "user_type": np.repeat(["a", "b", "c"], len(x)),
+                       "user_count": rng.poisson(50, 3 * len(x))})
+    out = downsample(df, "period_number", "user_count", color="user_type", n_points=300, stacked=True)
+    kept = out.groupby("user_type")["period_number"].apply(lambda s: tuple(sorted(s)))
+    assert kept.nunique() == 1 and len(kept.iloc[0]) == 100
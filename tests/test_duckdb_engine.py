@@ -0,0 +1,45 @@
+# tests/test_duckdb_engine.py
+import pandas as pd
+import pytest
+
+import analysis
+from scheduler import METRICS, _month1_churn, resolve_metrics
+
+pytest.importorskip("duckdb")
+import duckdb_engine  # noqa: E402
+
+
+def _function(engine, name: str):
+    func = METRICS[name][0]
+    if func is _month1_churn:
+        return lambda retention_curves: engine.calculate_month1_churn(retention_curves[-1])
+    return getattr(engine, func.__name__)
+
+
+@pytest.fixture(scope="module")
+def pandas_results(cleaned) -> dict:
+    product_level_df, order_level_df = cleaned
+    results = {"orders": order_level_df, "products": product_level_df}
+    for name in resolve_metrics(METRICS):
+        results[name] = _function(analysis, name)(*[results[i] for i in METRICS[name][1]])
+    return results
+
+
+def _assert_same(got, expected):
+    if isinstance(expected, tuple):
+        assert isinstance(got, tuple) and len(got) == len(expected)
+        for g, e in zip(got, expected):
+            _assert_same(g, e)
+    elif isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(got, expected)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(got, expected)
+    else:
+        assert got == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("name", list(METRICS))
+def test_duckdb_matches_pandas(pandas_results, name):
+    # Inputs come from the pandas results, so only this metric's implementation differs
+    inputs = [pandas_results[i] for i in METRICS[name][1]]
+    _assert_same(_function(duckdb_engine, name)(*inputs), pandas_results[name])
@@ -0,0 +1,35 @@
+# tests/test_lazycolumns.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from lazycolumns import ORDER_KEYS, LazyColumns
+
+
+def test_attach_matches_first_source_row_per_order(cleaned, data_dir):
+    order_level_df = cleaned[1]
+    cold = LazyColumns(data_dir)
+    attached = cold.attach(order_level_df, ["cancel_reason", "created_at"])
+    source = pd.read_parquet(f"{data_dir}/orders.parquet", columns=[*ORDER_KEYS, "cancel_reason", "created_at"])
+    expected = order_level_df[ORDER_KEYS].merge(source.drop_duplicates(ORDER_KEYS), on=ORDER_KEYS, how="left")
+    assert attached["cancel_reason"].tolist() == expected["cancel_reason"].tolist()
+    pd.testing.assert_series_equal(attached["created_at"].reset_index(drop=True),
+                                   pd.to_datetime(expected["created_at"], errors="coerce"), check_names=False)
+    assert cold.attach(order_level_df, ["net_revenue"]) is order_level_df
+
+
+def test_columns_load_once_and_independently(data_dir):
+    cold = LazyColumns(data_dir)
+    with ThreadPoolExecutor(8) as pool:
+        columns = list(pool.map(cold.column, ["cancel_reason"] * 8))
+    assert all(column is columns[0] for column in columns)
+
+    # While one column is being read, other columns and nbytes do not wait for it
+    busy = cold._locks.setdefault("created_at", threading.Lock())
+    with busy:
+        done = threading.Event()
+        thread = threading.Thread(target=lambda: (cold.column("subtotal_price"), cold.nbytes, done.set()))
+        thread.start()
+        assert done.wait(timeout=30)
+    assert cold.nbytes > 0
@@ -0,0 +1,53 @@
+# tests/test_rankings.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+from rankings import TopK, top_indices
+
+
+def _sorted_top(values, n) -> np.ndarray:
+    # What the full sort returned: stable descending order, NaN last
+    return pd.Series(values, dtype=np.float64).sort_values(ascending=False, kind="stable").index[:n].to_numpy()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_indices_matches_full_sort(seed):
+    rng = np.random.default_rng(seed)
+    size = int(rng.integers(0, 60))
+    # Few distinct values, so ties straddle the cut
+    values = rng.integers(0, 6, size).astype(np.float64)
+    if size and seed % 2:
+        values[rng.integers(0, size, 3)] = np.nan
+    for n in (0, 1, 3, 10, size, size + 5):
+        np.testing.assert_array_equal(top_indices(values, n), _sorted_top(values, n))
+
+
+def test_top_k_matches_recomputed_totals():
+    rng = np.random.default_rng(0)
+    top, keys, values = TopK(10, "product_title", "net_price"), [], []
+    for batch in range(60):
+        batch_keys = rng.choice([f"p{i}" for i in range(200)], 40)
+        batch_values = rng.exponential(10, 40)
+        if batch % 20 == 7:
+            # A refund: a ranked key can fall behind untouched ones
+            batch_values[0] = -500
+        top.add(batch_keys, batch_values)
+        keys.extend(batch_keys)
+        values.extend(batch_values)
+        expected = pd.Series(values).groupby(pd.Series(keys)).sum().nlargest(10)
+        np.testing.assert_allclose(top.frame()["net_price"].to_numpy(), expected.to_numpy())
+
+
+def test_rankings_match_sorted_aggregations(cleaned):
+    product_level_df = cleaned[0]
+    expected = (product_level_df.groupby("product_title", observed=True)["net_price"].sum()
+                .sort_values(ascending=False, kind="stable").head(10))
+    top_products = analysis.get_top_products_by_revenue(product_level_df)
+    np.testing.assert_allclose(top_products["net_price"].to_numpy(), expected.to_numpy())
+    assert set(top_products["product_title"].astype(str)) == set(expected.index.astype(str))
+
+    units = product_level_df.groupby("product_category", observed=True).size().sort_values(ascending=False)
+    top_categories = analysis.get_top_categories_by_units_sold(product_level_df, top_n=3)
+    np.testing.assert_array_equal(top_categories["units_sold"].to_numpy(), units.to_numpy()[:3])
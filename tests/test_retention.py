@@ -0,0 +1,70 @@
+# tests/test_retention.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+from analysis import GRANULARITIES, calculate_retention_matrix, prepare_retention_curves, retention_offsets
+
+
+def _melted_curves(retention_matrix: pd.DataFrame) -> tuple:
+    # The curves as they were computed before the offset array: a full melt, then groupbys and masks
+    n_cohorts, n_periods = retention_matrix.shape
+    cohorts = retention_matrix.index.take(np.tile(np.arange(n_cohorts), n_periods))
+    periods = retention_matrix.columns.take(np.repeat(np.arange(n_periods), n_cohorts))
+    long = pd.DataFrame({
+        'cohort_month': cohorts,
+        'order_month': periods,
+        'retention': retention_matrix.to_numpy().ravel(order='F'),
+        'cohort_month_ts': cohorts.to_timestamp(),
+        'order_month_ts': periods.to_timestamp(),
+        'month_offset': periods.asi8 - cohorts.asi8,
+    })
+    long = long[long['month_offset'] >= 0].copy()
+    avg = long.groupby('month_offset')['retention'].mean().reset_index()
+    avg['retention'] = (avg['retention'] * 100).round(2)
+    month1 = long[long['month_offset'] == 1]
+    best = month1.loc[month1['retention'].idxmax(), 'cohort_month']
+    worst = month1.loc[month1['retention'].idxmin(), 'cohort_month']
+    curves = []
+    for cohort in (best, worst):
+        curve = long[long['cohort_month'] == cohort].copy()
+        curve['retention'] = (curve['retention'] * 100).round(2)
+        curves.append(curve)
+    return avg, *curves, best, worst, long
+
+
+def test_offsets_keep_calendar_gaps():
+    # Cohorts 2020-01 and 2020-02; no orders at all in 2020-03
+    matrix = pd.DataFrame(
+        [[1.0, 0.5, 0.2], [np.nan, 1.0, 0.3]],
+        index=pd.PeriodIndex(["2020-01", "2020-02"], freq="M", name="cohort_month"),
+        columns=pd.PeriodIndex(["2020-01", "2020-02", "2020-04"], freq="M", name="order_month"),
+    )
+    rates, columns = retention_offsets(matrix)
+    np.testing.assert_array_equal(columns, [[0, 1, -1, 2], [1, -1, 2, -1]])
+    np.testing.assert_array_equal(rates, [[1.0, 0.5, np.nan, 0.2], [1.0, np.nan, 0.3, np.nan]])
+    np.testing.assert_array_equal(analysis.calculate_month1_retention(matrix)['month_1_retention'], [50.0, np.nan])
+
+
+@pytest.mark.parametrize("granularity", list(GRANULARITIES))
+def test_offsets_match_calendar_cells(cleaned, granularity):
+    matrix = calculate_retention_matrix(cleaned[1], granularity)
+    rates, columns = retention_offsets(matrix)
+    # Every calendar cell at or after its cohort's start, by its period ordinals
+    cohort_pos, column_pos = np.nonzero(matrix.columns.asi8[None, :] >= matrix.index.asi8[:, None])
+    offsets = matrix.columns.asi8[column_pos] - matrix.index.asi8[cohort_pos]
+    np.testing.assert_array_equal(columns[cohort_pos, offsets], column_pos)
+    np.testing.assert_array_equal(rates[cohort_pos, offsets], matrix.to_numpy(dtype=float)[cohort_pos, column_pos])
+    assert (columns >= 0).sum() == len(cohort_pos)
+
+
+@pytest.mark.parametrize("granularity", list(GRANULARITIES))
+def test_curves_match_melted_matrix(cleaned, granularity):
+    matrix = calculate_retention_matrix(cleaned[1], granularity)
+    got, expected = prepare_retention_curves(matrix), _melted_curves(matrix)
+    for a, b in zip(got, expected):
+        if isinstance(a, pd.DataFrame):
+            pd.testing.assert_frame_equal(a, b, check_index_type=False)
+        else:
+            assert a == b
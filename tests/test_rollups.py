@@ -0,0 +1,66 @@
+# tests/test_rollups.py
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import store
+from filters import apply_filters
+from rollups import ORDER_METRICS, PRODUCT_METRICS, REVENUE_VIEWS, RevenueRollups, revenue_metrics, view_rows
+from scheduler import run_metrics
+
+
+@pytest.fixture(scope="module")
+def rollups(cleaned):
+    return RevenueRollups.from_frames(*cleaned)
+
+
+def _selections(product_level_df, order_level_df) -> list[dict]:
+    countries = list(order_level_df['billing_address_country'].value_counts().index[:2])
+    categories = list(product_level_df['product_category'].value_counts().index[:2].astype(str))
+    return [
+        {},
+        {"countries": countries},
+        {"statuses": ["Cancelled"]},
+        {"categories": categories},
+        {"types": [str(product_level_df['product_type'].iloc[0])]},
+        # Dates that cut months in half, and a single day
+        {"date_range": (dt.date(2020, 1, 15), dt.date(2020, 7, 3))},
+        {"date_range": (dt.date(2020, 3, 1), dt.date(2020, 3, 1))},
+        {"countries": countries, "categories": categories, "date_range": (dt.date(2020, 2, 2), dt.date(2020, 11, 30))},
+        # Filters the rollups do not cover fall back to the exact metrics
+        {"orders": list(order_level_df['order_number'].iloc[:50])},
+        {"products": [str(product_level_df['product_title'].iloc[0])]},
+    ]
+
+
+def _assert_same(got: pd.DataFrame, expected: pd.DataFrame) -> None:
+    assert list(got.columns) == list(expected.columns)
+    assert len(got) == len(expected)
+    for column in got.columns:
+        a, b = got[column].reset_index(drop=True), expected[column].reset_index(drop=True)
+        if a.dtype.kind in "fi" and b.dtype.kind in "fi":
+            np.testing.assert_allclose(a.astype(float), b.astype(float), rtol=1e-9, atol=1e-6, err_msg=column)
+        else:
+            assert a.astype(str).tolist() == b.astype(str).tolist(), column
+
+
+@pytest.mark.parametrize("view", list(REVENUE_VIEWS))
+def test_rollups_match_exact_metrics(cleaned, rollups, view):
+    names = list(ORDER_METRICS + PRODUCT_METRICS)
+    for selection in _selections(*cleaned):
+        product_df, order_df = apply_filters(*cleaned, **selection)
+        got = revenue_metrics(rollups, view, order_df, product_df, **selection)
+        if not selection:
+            assert set(got) == set(names)
+        expected = run_metrics(names, view_rows(order_df, view), view_rows(product_df, view), executor="serial")
+        for name, result in got.items():
+            _assert_same(result, expected[name])
+
+
+def test_stored_rollups_match_built_ones(cleaned, rollups, data_dir, tmp_path):
+    store.write_store(*cleaned, str(tmp_path))
+    stored = store.load_rollups(*cleaned, store_dir=str(tmp_path))
+    pd.testing.assert_frame_equal(stored.order_cells, rollups.order_cells)
+    pd.testing.assert_frame_equal(stored.product_cells, rollups.product_cells)
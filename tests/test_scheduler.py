@@ -0,0 +1,29 @@
+# tests/test_scheduler.py
+import pandas as pd
+import pytest
+
+import scheduler
+from scheduler import METRICS, run_metrics
+
+
+def _assert_same(a, b) -> None:
+    if isinstance(a, tuple):
+        for x, y in zip(a, b):
+            _assert_same(x, y)
+    elif isinstance(a, pd.DataFrame):
+        pd.testing.assert_frame_equal(a, b)
+    else:
+        assert a == b
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_executors_match_serial(cleaned, executor):
+    product_level_df, order_level_df = cleaned
+    expected = run_metrics(list(METRICS), order_level_df, product_level_df, executor="serial")
+    # Twice: the second process run reuses the pool and its workers
+    for _ in range(2):
+        results = run_metrics(list(METRICS), order_level_df, product_level_df, executor=executor, max_workers=2)
+        for name in METRICS:
+            _assert_same(results[name], expected[name])
+    if executor == "process":
+        assert list(scheduler._pools) == [2]
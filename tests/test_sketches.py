@@ -0,0 +1,57 @@
+# tests/test_sketches.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis
+from filters import apply_filters
+from sketches import CustomerSketches, estimate, hll_registers, relative_error
+
+# Estimates are checked against four standard errors, so a correct sketch fails about once in 16,000 runs
+TOLERANCE = 4 * relative_error()
+
+
+@pytest.fixture(scope="module")
+def sketches(cleaned):
+    return CustomerSketches(cleaned[1])
+
+
+def _estimate(values, precision: int = 14) -> float:
+    register, rank = hll_registers(values, precision)
+    registers = np.zeros(2 ** precision, dtype=np.uint8)
+    np.maximum.at(registers, register, rank)
+    return float(estimate(registers[None, :])[0])
+
+
+@pytest.mark.parametrize("n", [100, 10_000, 200_000])
+def test_estimate_within_standard_error(n):
+    values = np.random.default_rng(n).choice(10**9, size=n, replace=False)
+    assert _estimate(np.concatenate([values, values[: n // 2]])) == pytest.approx(n, rel=TOLERANCE)
+
+
+def test_count_customers_matches_nunique(cleaned, sketches):
+    order_level_df = cleaned[1]
+    mask = np.ones(len(sketches.cells), dtype=bool)
+    assert sketches.count_customers(mask) == pytest.approx(order_level_df['customer_id'].nunique(), rel=TOLERANCE)
+
+    country = order_level_df['billing_address_country'].value_counts().index[0]
+    _, filtered = apply_filters(*cleaned, countries=[country], statuses=["Delivered"])
+    assert sketches.count_customers(sketches.cell_mask(countries=[country], statuses=["Delivered"])) == \
+        pytest.approx(filtered['customer_id'].nunique(), rel=TOLERANCE)
+
+
+def test_cohort_sizes_match_exact(cleaned, sketches):
+    exact = analysis.calculate_cohort_sizes(cleaned[1])
+    approx = sketches.cohort_sizes(np.ones(len(sketches.cells), dtype=bool))
+    merged = exact.merge(approx, on="cohort_month", suffixes=("", "_approx"), validate="one_to_one")
+    assert len(merged) == len(exact)
+    np.testing.assert_allclose(merged["n_customers_approx"], merged["n_customers"], rtol=TOLERANCE)
+
+
+def test_retention_matrix_matches_exact(cleaned, sketches):
+    exact = analysis.calculate_retention_matrix(cleaned[1])
+    approx = sketches.retention_matrix(np.ones(len(sketches.cells), dtype=bool))
+    pd.testing.assert_index_equal(approx.index, exact.index)
+    # Retention is a ratio of two estimates, each within the tolerance
+    np.testing.assert_allclose(approx.reindex(columns=exact.columns).to_numpy(dtype=float),
+                               exact.to_numpy(dtype=float), rtol=2 * TOLERANCE, atol=1e-3)
@@ -0,0 +1,26 @@
+# tests/test_streaming.py
+import pandas as pd
+import pytest
+
+from streaming import load_processed_datasets, prepare_cleaned_datasets_chunked
+from transform import prepare_cleaned_datasets
+
+
+@pytest.fixture(scope="module")
+def single_pass(data_dir) -> tuple:
+    return prepare_cleaned_datasets(data_dir, workers=1)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_streamed_output_matches_single_pass(data_dir, single_pass, tmp_path, workers):
+    # Batches far smaller than the file, so orders, duplicates and customers span batch boundaries
+    counts = prepare_cleaned_datasets_chunked(data_dir, str(tmp_path), batch_size=3_000, n_partitions=4,
+                                              workers=workers)
+    product_level_df, order_level_df = load_processed_datasets(str(tmp_path))
+
+    assert counts["product_level"] == len(single_pass[0])
+    assert counts["order_level"] == len(single_pass[1])
+    pd.testing.assert_frame_equal(product_level_df, single_pass[0])
+    # Order-level rows are sorted per batch only
+    order_level_df = order_level_df.sort_values("order_number").reset_index(drop=True)
+    pd.testing.assert_frame_equal(order_level_df, single_pass[1])
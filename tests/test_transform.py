@@ -0,0 +1,22 @@
+# tests/test_transform.py
+import pandas as pd
+import pytest
+
+from transform import prepare_cleaned_datasets
+
+
+@pytest.fixture(scope="module", params=["numpy", "arrow"])
+def backend(request) -> str:
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def single_pass(data_dir, backend) -> tuple:
+    return prepare_cleaned_datasets(data_dir, workers=1, backend=backend)
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_partitioned_pipeline_matches_single_pass(data_dir, backend, single_pass, workers):
+    product_level_df, order_level_df = prepare_cleaned_datasets(data_dir, workers=workers, backend=backend)
+    pd.testing.assert_frame_equal(product_level_df, single_pass[0])
+    pd.testing.assert_frame_equal(order_level_df, single_pass[1])
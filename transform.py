@@ -2,35 +2,40 @@
 
 import pandas as pd
 import numpy as np
-from loader import load_orders, load_products
+from concurrent.futures import ProcessPoolExecutor
+from loader import HOT_ORDER_COLUMNS, load_orders, load_products
+from config import BACKEND, DATA_DIR, PIPELINE_WORKERS
+from instrumentation import StageRecorder
+from dimensions import encode_countries, encode_products, normalize_countries
+from arrow_backend import (
+    clean_orders_arrow,
+    create_order_level_df_arrow,
+    enrich_orders_with_products_arrow,
+    to_numpy_temporal,
+)
 
 def clean_orders(orders: pd.DataFrame) -> pd.DataFrame:
     orders = orders.copy()
 
-    # Fill missing countries
-    orders['billing_address_country'] = orders['billing_address_country'].fillna('Unknown')
-
-    # Fix corrupted encoding for Côte d'Ivoire
-    # Fix corrupted encoding for Côte d'Ivoire (multiple variants)
-    orders['billing_address_country'] = orders['billing_address_country'].replace({
-    "C√¥te d'Ivoire": "Côte d'Ivoire",
-    "C√¥te d&#39;Ivoire": "Côte d'Ivoire"
-})
+    # Fill missing countries and repair corrupted encodings (e.g. Côte d'Ivoire variants)
+    orders['billing_address_country'] = normalize_countries(orders['billing_address_country'])
 
     # Drop ZIP code column
     if 'billing_address_zip' in orders.columns:
         orders.drop(columns=['billing_address_zip'], inplace=True)
 
-    # Convert date columns
+    # Convert date columns (those loaded: the pipeline reads only HOT_ORDER_COLUMNS)
     date_cols = ['created_at', 'processed_at', 'cancelled_at', 'first_date_order']
     for col in date_cols:
-        orders[col] = pd.to_datetime(orders[col], errors='coerce')
+        if col in orders.columns:
+            orders[col] = pd.to_datetime(orders[col], errors='coerce')
 
     # Add cancellation flag
     orders['is_cancelled'] = orders['cancelled_at'].notnull()
 
     # Add month column
-    orders['order_month'] = orders['created_at'].dt.tz_localize(None).dt.to_period('M')
+    if 'created_at' in orders.columns:
+        orders['order_month'] = orders['created_at'].dt.tz_localize(None).dt.to_period('M')
 
     return orders
 
@@ -80,7 +85,7 @@ def create_product_level_df(enriched: pd.DataFrame) -> pd.DataFrame:
 
     product_level_df = df[[
         'order_number', 'customer_id', 'processed_at', 'billing_address_country',
-        'cancelled_at', 'cancel_reason', 'product_title', 'product_category',
+        'cancelled_at', 'product_title', 'product_category',
         'product_type', 'product_price', 'discount_allocated', 'net_price'
     ]]
 
@@ -95,7 +100,6 @@ def create_order_level_df(product_level_df: pd.DataFrame) -> pd.DataFrame:
         'processed_at': 'first',
         'billing_address_country': 'first',
         'cancelled_at': 'first',
-        'cancel_reason': 'first',
         'discount_allocated': 'sum',
         'product_price': 'sum',
         'net_price': 'sum'
@@ -129,26 +133,110 @@ def run_sanity_checks(product_level_df: pd.DataFrame, order_level_df: pd.DataFra
     print(f"Discount Mismatch Rows: {discount_mismatches}")
 
 
-def prepare_cleaned_datasets() -> tuple[pd.DataFrame, pd.DataFrame]:
-    orders = load_orders()
-    products = load_products()
-
-    orders = clean_orders(orders)
-    orders = deduplicate_orders(orders)
-    products = clean_products(products)
-
-    enriched = enrich_orders_with_products(orders, products)
-
-    product_level_df = create_product_level_df(enriched)
-    order_level_df = create_order_level_df(product_level_df)
-
-    # Add cohort_month for cohort-level analyses
-    order_level_df['cohort_month'] = order_level_df.groupby('customer_id')['processed_at'].transform('min').dt.to_period('M')
+def add_customer_columns(order_level_df: pd.DataFrame, first_order_dates: pd.Series | None = None) -> pd.DataFrame:
+    # Add first_order_at and cohort_month for cohort-level analyses
+    # first_order_dates (customer_id -> first processed_at) is passed when the frame holds only part of the orders
+    if first_order_dates is None:
+        first_order = order_level_df.groupby('customer_id')['processed_at'].transform('min')
+    else:
+        first_order = order_level_df['customer_id'].map(first_order_dates)
+    order_level_df['first_order_at'] = first_order
+    order_level_df['cohort_month'] = first_order.dt.to_period('M')
     # Calculate discount rate
     if 'total_discounts' in order_level_df.columns and 'subtotal_price' in order_level_df.columns:
            order_level_df['discount_rate'] = order_level_df['total_discounts'] / order_level_df['subtotal_price']
     else:
            order_level_df['discount_rate'] = 0  
 
+    return order_level_df
+
+
+def partition_ids(order_numbers, n_partitions: int) -> np.ndarray:
+    """Stable partition id per order number (the same in every process and run)."""
+    values = np.asarray(order_numbers)
+    if values.dtype.kind in "iuf":
+        # A batch with a missing order number arrives as float: hash every numeric batch as float
+        values = values.astype(np.float64)
+    return (pd.util.hash_array(values) % np.uint64(n_partitions)).astype(np.int64)
+
 
-    return product_level_df, order_level_df
\ No newline at end of file
+def _transform_partition(
+    orders: pd.DataFrame, products: pd.DataFrame, backend: str = "numpy"
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Every row of an order is in this partition, so dedup and discount allocation are partition-local
+    orders = (clean_orders_arrow if backend == "arrow" else clean_orders)(orders)
+    orders = deduplicate_orders(orders)
+    enriched = (enrich_orders_with_products_arrow if backend == "arrow" else enrich_orders_with_products)(orders, products)
+
+    product_level_df = create_product_level_df(enriched)
+    order_level_df = (create_order_level_df_arrow if backend == "arrow" else create_order_level_df)(product_level_df)
+    # Remember each product row's source position so the global row order can be restored
+    product_level_df.index = enriched['_row'].to_numpy()
+    return product_level_df, order_level_df
+
+
+def transform_partitions(
+    orders: pd.DataFrame, products: pd.DataFrame, workers: int, n_partitions: int | None = None,
+    backend: str = "numpy",
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    clean -> dedup -> enrich -> product level -> order level per hash(order_number)
+    partition on a process pool. Same rows and row order as running the stages on
+    the whole frame.
+    """
+    n_partitions = n_partitions or workers * 2
+    orders = orders.reset_index(drop=True)
+    orders['_row'] = np.arange(len(orders))
+    partition = partition_ids(orders['order_number'], n_partitions)
+    parts = [part for _, part in orders.groupby(partition, sort=False)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_transform_partition, parts, [products] * len(parts), [backend] * len(parts)))
+
+    product_level_df = pd.concat([r[0] for r in results]).sort_index(kind='stable').reset_index(drop=True)
+    order_level_df = pd.concat([r[1] for r in results]).sort_values('order_number').reset_index(drop=True)
+    return product_level_df, order_level_df
+
+
+def _call(stage: str, func, *args):
+    return func(*args)
+
+
+def prepare_cleaned_datasets(
+    data_dir: str = DATA_DIR,
+    recorder: StageRecorder | None = None,
+    workers: int = PIPELINE_WORKERS,
+    backend: str = BACKEND,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Each step goes through the recorder (when given) so slow stages show up per name
+    stage = recorder.run if recorder is not None else _call
+    arrow = backend == "arrow"
+
+    orders = stage("load_orders", load_orders, data_dir, backend, HOT_ORDER_COLUMNS)
+    products = stage("load_products", load_products, data_dir, backend)
+
+    if workers > 1:
+        products = stage("clean_products", clean_products, products)
+        product_level_df, order_level_df = stage("transform_partitions", transform_partitions,
+                                                 orders, products, workers, None, backend)
+    else:
+        orders = stage("clean_orders", clean_orders_arrow if arrow else clean_orders, orders)
+        orders = stage("deduplicate_orders", deduplicate_orders, orders)
+        products = stage("clean_products", clean_products, products)
+
+        enriched = stage("enrich_orders_with_products",
+                         enrich_orders_with_products_arrow if arrow else enrich_orders_with_products, orders, products)
+
+        product_level_df = stage("create_product_level_df", create_product_level_df, enriched)
+        order_level_df = stage("create_order_level_df",
+                               create_order_level_df_arrow if arrow else create_order_level_df, product_level_df)
+
+    if arrow:
+        # Strings and numbers stay Arrow; timestamps go to datetime64 for the Period-based analyses
+        product_level_df = to_numpy_temporal(product_level_df)
+        order_level_df = to_numpy_temporal(order_level_df)
+    order_level_df = stage("add_customer_columns", add_customer_columns, order_level_df)
+    stage("encode_countries", encode_countries, product_level_df, order_level_df)
+    stage("encode_products", encode_products, product_level_df, products)
+
+    return product_level_df, order_level_df
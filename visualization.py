@@ -1,36 +1,39 @@
 # visualization.py
-import plotly.express as px
+# plotly is imported inside the plot functions: plotly.express and its dependencies take about 0.1 s
+# to import, which processes that never draw a chart (metrics API, store builds) should not pay
 import pandas as pd
-import streamlit as st  
-import plotly.graph_objects as go
+import numpy as np
 
-def plot_retention_matrix(retention_matrix: pd.DataFrame) -> None:
+from downsample import WEBGL_POINTS, downsample, max_points, render_mode
+
+def plot_retention_matrix(retention_matrix: pd.DataFrame):
     """
     Visualize a retention matrix as a heatmap with upper triangle only,
     values as float retention rates (e.g., 0.45), and dark color scale.
     """
+    import plotly.express as px
     matrix = retention_matrix.copy()
     matrix.index = matrix.index.astype(str)
     matrix.columns = matrix.columns.astype(str)
     matrix = matrix.loc[:, (matrix != 0).any(axis=0)]
 
-    # Zero out lower triangle (below diagonal)
-    for i in range(matrix.shape[0]):
-        for j in range(matrix.shape[1]):
-            if j < i:
-                matrix.iloc[i, j] = np.nan  # Hide value from heatmap
+    # Hide the lower triangle (below diagonal) from the heatmap
+    values = matrix.to_numpy(dtype=float, copy=True)
+    values[np.tril_indices(values.shape[0], -1, values.shape[1])] = np.nan
+    matrix = pd.DataFrame(values, index=matrix.index, columns=matrix.columns)
 
     fig = px.imshow(
         matrix,
         labels=dict(x="Order Month", y="Cohort Month", color="Retention Rate"),
-        text_auto=".2f",
+        # Cell labels are unreadable (and heavy) on daily/weekly matrices
+        text_auto=".2f" if matrix.size <= 2500 else False,
         color_continuous_scale="Cividis"  # Use a darker color scheme
     )
     fig.update_layout(title="Customer Retention by Cohort", height=600)
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
-
-def plot_month1_retention(month_1_df: pd.DataFrame) -> None:
+def plot_month1_retention(month_1_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(
         month_1_df,
         x='cohort_month',
@@ -46,12 +49,17 @@ def plot_month1_retention(month_1_df: pd.DataFrame) -> None:
         xaxis_tickangle=-45,
         height=500
     )
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def plot_retention_curves(avg_ret, best, worst, best_label, worst_label) -> None:
+def plot_retention_curves(avg_ret, best, worst, best_label, worst_label):
+    import plotly.graph_objects as go
+    # Daily cohorts give long curves: downsample each to a third of the chart's points, WebGL above the threshold
+    avg_ret, best, worst = (downsample(curve, 'month_offset', 'retention', n_points=max_points() // 3)
+                            for curve in (avg_ret, best, worst))
+    Scatter = go.Scattergl if len(avg_ret) + len(best) + len(worst) > WEBGL_POINTS else go.Scatter
     fig = go.Figure()
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=avg_ret['month_offset'],
         y=avg_ret['retention'],
         mode='lines+markers',
@@ -60,7 +68,7 @@ def plot_retention_curves(avg_ret, best, worst, best_label, worst_label) -> None
         marker=dict(symbol='circle')
     ))
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=best['month_offset'],
         y=best['retention'],
         mode='lines+markers+text',
@@ -71,7 +79,7 @@ def plot_retention_curves(avg_ret, best, worst, best_label, worst_label) -> None
         marker=dict(size=8)
     ))
 
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=worst['month_offset'],
         y=worst['retention'],
         mode='lines+markers+text',
@@ -89,29 +97,31 @@ def plot_retention_curves(avg_ret, best, worst, best_label, worst_label) -> None
         height=600,
         legend=dict(x=0.01, y=0.99)
     )
+    return fig
 
-    st.plotly_chart(fig, use_container_width=True)
-
-def plot_cohort_sizes(cohort_sizes_df: pd.DataFrame) -> None:
+def plot_cohort_sizes(cohort_sizes_df: pd.DataFrame):
+        import plotly.express as px
         fig = px.bar(cohort_sizes_df, x='cohort_month', y='n_customers',
                  title='Number of Customers per Cohort',
                  labels={'n_customers': 'Customer Count', 'cohort_month': 'Cohort Month'},
                  text='n_customers')
         fig.update_traces(marker_color='steelblue', textposition='outside')
         fig.update_layout(xaxis_tickangle=-45, showlegend=False)
-        st.plotly_chart(fig, use_container_width=True)
+        return fig
 
 
-def plot_avg_revenue_by_cohort(revenue_df: pd.DataFrame) -> None:
+def plot_avg_revenue_by_cohort(revenue_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(revenue_df, x='cohort_month', y='avg_revenue',
                  title='Average Revenue per User by Cohort',
                  labels={'avg_revenue': 'Avg Revenue per Customer', 'cohort_month': 'Cohort Month'},
                  text='avg_revenue')
     fig.update_traces(marker_color='mediumseagreen', textposition='outside')
     fig.update_layout(xaxis_tickangle=-45, showlegend=False)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 def plot_days_to_second_order_histogram(df: pd.DataFrame):
+    import plotly.express as px
     fig = px.histogram(
         df,
         x='days_to_second_order',
@@ -120,10 +130,10 @@ def plot_days_to_second_order_histogram(df: pd.DataFrame):
         labels={'days_to_second_order': 'Days to Second Order'}
     )
     fig.update_layout(bargap=0.1)
-    st.plotly_chart(fig)
     return fig
 
 def plot_top_products_by_revenue(top_products_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(
         top_products_df,
         x="product_title",
@@ -136,8 +146,9 @@ def plot_top_products_by_revenue(top_products_df: pd.DataFrame):
     return fig
 
 def plot_category_revenue_trend(category_trend_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.area(
-        category_trend_df,
+        downsample(category_trend_df, "order_month", "net_price", color="product_category", stacked=True),
         x="order_month",
         y="net_price",
         color="product_category",
@@ -148,6 +159,7 @@ def plot_category_revenue_trend(category_trend_df: pd.DataFrame):
     return fig
 
 def plot_avg_price_per_category(avg_price_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(
         avg_price_df,
         x="product_category",
@@ -160,6 +172,7 @@ def plot_avg_price_per_category(avg_price_df: pd.DataFrame):
     return fig
 
 def plot_top_categories_by_units(units_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(
         units_df,
         x="product_category",
@@ -173,10 +186,11 @@ def plot_top_categories_by_units(units_df: pd.DataFrame):
 
 
 def plot_geo_revenue_map(df: pd.DataFrame):
+    import plotly.express as px
     fig = px.choropleth(
-        df,
-        locations="country",
-        locationmode="country names",
+        df.dropna(subset=["iso3"]),
+        locations="iso3",
+        locationmode="ISO-3",
         color="revenue",
         hover_name="country",
         color_continuous_scale="Greens",
@@ -188,8 +202,9 @@ def plot_geo_revenue_map(df: pd.DataFrame):
 
 
 def plot_new_vs_returning_area(user_counts_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.area(
-        user_counts_df,
+        downsample(user_counts_df, 'order_month', 'user_count', color='user_type', stacked=True),
         x='order_month',
         y='user_count',
         color='user_type',
@@ -200,10 +215,13 @@ def plot_new_vs_returning_area(user_counts_df: pd.DataFrame):
     return fig
 
 def plot_monthly_revenue_trend(monthly_revenue_df: pd.DataFrame):
+    import plotly.express as px
+    monthly_revenue_df = downsample(monthly_revenue_df, 'order_month', 'net_revenue')
     fig = px.line(
         monthly_revenue_df,
         x='order_month',
         y='net_revenue',
+        render_mode=render_mode(len(monthly_revenue_df)),
         title="Monthly Net Revenue Trend",
         markers=True,
         labels={'order_month': 'Month', 'net_revenue': 'Net Revenue (€)'}
@@ -213,10 +231,13 @@ def plot_monthly_revenue_trend(monthly_revenue_df: pd.DataFrame):
 
 
 def plot_discount_rate_trend(discount_rate_df: pd.DataFrame):
+    import plotly.express as px
+    discount_rate_df = downsample(discount_rate_df, 'order_month', 'discount_rate')
     fig = px.line(
         discount_rate_df,
         x='order_month',
         y='discount_rate',
+        render_mode=render_mode(len(discount_rate_df)),
         title="Discount Rate Trends Over Time",
         markers=True,
         labels={'order_month': 'Month', 'discount_rate': 'Avg. Discount Rate'}
@@ -225,10 +246,13 @@ def plot_discount_rate_trend(discount_rate_df: pd.DataFrame):
     return fig
 
 def plot_monthly_aov(monthly_aov_df: pd.DataFrame):
+    import plotly.express as px
+    monthly_aov_df = downsample(monthly_aov_df, 'order_month', 'aov')
     fig = px.line(
         monthly_aov_df,
         x='order_month',
         y='aov',
+        render_mode=render_mode(len(monthly_aov_df)),
         title="Average Order Value (AOV) Over Time",
         markers=True,
         labels={'order_month': 'Month', 'aov': 'Average Order Value (€)'}
@@ -238,6 +262,7 @@ def plot_monthly_aov(monthly_aov_df: pd.DataFrame):
 
 
 def plot_revenue_by_order_type(revenue_by_type_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(
         revenue_by_type_df,
         x='order_type',
@@ -255,6 +280,7 @@ def plot_revenue_by_order_type(revenue_by_type_df: pd.DataFrame):
     return fig
 
 def plot_monthly_summary_table(monthly_summary_df: pd.DataFrame):
+    import plotly.graph_objects as go
     fig = go.Figure(data=[go.Table(
         header=dict(values=list(monthly_summary_df.columns),
                     fill_color='slategray',  
@@ -268,11 +294,15 @@ def plot_monthly_summary_table(monthly_summary_df: pd.DataFrame):
     return fig
 
 def plot_monthly_category_trends(monthly_category_trends_df: pd.DataFrame):
+    import plotly.express as px
+    monthly_category_trends_df = downsample(monthly_category_trends_df, 'order_month', 'net_price',
+                                            color='product_category')
     fig = px.line(
         monthly_category_trends_df,
         x='order_month',
         y='net_price',
         color='product_category',
+        render_mode=render_mode(len(monthly_category_trends_df)),
         title=' Monthly Revenue Trends by Product Category',
         labels={'net_price': 'Revenue (€)', 'order_month': 'Order Month'},
         markers=True
@@ -281,6 +311,7 @@ def plot_monthly_category_trends(monthly_category_trends_df: pd.DataFrame):
     return fig
 
 def plot_month1_churn_rate(month1_ret_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(
         month1_ret_df,
         x='cohort_month',
@@ -303,6 +334,7 @@ def plot_month1_churn_rate(month1_ret_df: pd.DataFrame):
     return fig
 
 def plot_rfm_segmentation_bar(segment_counts_df: pd.DataFrame):
+    import plotly.express as px
     fig = px.bar(
         segment_counts_df,
         x='Segment',
@@ -319,11 +351,14 @@ def plot_rfm_segmentation_bar(segment_counts_df: pd.DataFrame):
     return fig
 
 def plot_retention_by_discount_level(df):
+    import plotly.express as px
+    df = downsample(df, 'period_number', 'retention_rate', color='discount_level')
     fig = px.line(
         df,
         x='period_number',
         y='retention_rate',
         color='discount_level',
+        render_mode=render_mode(len(df)),
         markers=True,
         title='Retention Curves: High vs Low Discount Cohorts',
         labels={
@@ -332,4 +367,26 @@ def plot_retention_by_discount_level(df):
         }
     )
     fig.update_layout(yaxis_tickformat=".1%", legend_title="Discount Level")
+    return fig
+
+def plot_rerun_profile(timeline_df: pd.DataFrame):
+    """
+    Flame-style view of one rerun: one bar per recorded call, placed at its
+    start offset and as long as its wall time, colored by phase.
+    """
+    import plotly.express as px
+    df = timeline_df.sort_values('offset_s')
+    fig = px.bar(
+        df,
+        x='wall_s',
+        y='stage',
+        base='offset_s',
+        color='phase',
+        orientation='h',
+        hover_data={'output_bytes': ':,', 'rows_out': True, 'offset_s': ':.3f'},
+        title='Rerun Time Breakdown',
+        labels={'wall_s': 'Seconds', 'stage': '', 'phase': 'Phase', 'output_bytes': 'Output Bytes'}
+    )
+    fig.update_yaxes(categoryorder='array', categoryarray=df['stage'].tolist()[::-1])
+    fig.update_layout(height=max(300, 22 * len(df)), xaxis_title='Seconds since rerun start')
     return fig
\ No newline at end of file